@@ -7,12 +7,24 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import logging
 import statistics
+from services.paper_text import PaperTextCache
+from services.pipeline_context import MemoKey, PipelineMemo, active_memo, memo_scope
+
+DRAFT_FULL_TEXT: MemoKey[str] = MemoKey('analytics.draft_full_text')
+REFERENCE_COUNT: MemoKey[int] = MemoKey('analytics.reference_count')
 
 class AnalyticsAgent:
     """Agent responsible for analyzing research papers and generating insights."""
     
-    def __init__(self):
+    def __init__(self, text_cache: Optional[PaperTextCache] = None, memo: Optional[PipelineMemo] = None):
         self.logger = logging.getLogger(__name__)
+        self.text_cache = text_cache or PaperTextCache()
+        self.shared_memo = memo  # the pipeline's memo, shared with its other agents
+
+    @property
+    def memo(self) -> PipelineMemo:
+        """Memo of the current call: the pipeline's when shared, else one per call."""
+        return active_memo()
     
     async def analyze_paper(self, paper_draft: Dict[str, Any], source_papers: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -25,25 +37,63 @@ class AnalyticsAgent:
         Returns:
             Analytics data and insights
         """
-        try:
-            self.logger.info("Starting paper analytics")
-            
-            analytics = {
-                'paper_metrics': await self._calculate_paper_metrics(paper_draft),
-                'content_analysis': await self._analyze_content(paper_draft),
-                'source_analysis': await self._analyze_sources(source_papers),
-                'quality_indicators': await self._assess_quality(paper_draft, source_papers),
-                'trend_analysis': await self._analyze_trends(source_papers),
-                'recommendations': await self._generate_recommendations(paper_draft, source_papers)
-            }
-            
-            self.logger.info("Paper analytics completed successfully")
-            return analytics
-            
-        except Exception as e:
-            self.logger.error(f"Error in paper analytics: {str(e)}")
-            return {'error': str(e)}
-    
+        with memo_scope(self.shared_memo):
+            try:
+                self.logger.info("Starting paper analytics")
+                
+                analytics = {
+                    'paper_metrics': await self._calculate_paper_metrics(paper_draft),
+                    'content_analysis': await self._analyze_content(paper_draft),
+                    'source_analysis': await self._analyze_sources(source_papers),
+                    'quality_indicators': await self._assess_quality(paper_draft, source_papers),
+                    'trend_analysis': await self._analyze_trends(source_papers),
+                    'recommendations': await self._generate_recommendations(paper_draft, source_papers)
+                }
+                
+                self.logger.info("Paper analytics completed successfully")
+                return analytics
+                
+            except Exception as e:
+                self.logger.error(f"Error in paper analytics: {str(e)}")
+                return {'error': str(e)}
+
+    async def update_section_analytics(self, paper_draft: Dict[str, Any], section_name: str,
+                                       source_papers: List[Dict[str, Any]], analytics: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Refresh analytics after one section of the draft changed.
+
+        Only the draft-dependent parts are recomputed; source and trend
+        analysis depend on the source papers alone and are kept.
+
+        Args:
+            paper_draft: Draft with the updated section
+            section_name: Name of the section that changed
+            source_papers: Source papers used for generation
+            analytics: Previous analytics of the draft
+
+        Returns:
+            Updated analytics data
+        """
+        with memo_scope(self.shared_memo):
+            try:
+                self.memo.invalidate(DRAFT_FULL_TEXT, scope=paper_draft)
+                if section_name == 'references':
+                    self.memo.invalidate(REFERENCE_COUNT, scope=paper_draft)
+
+                if not analytics or 'error' in analytics:
+                    return await self.analyze_paper(paper_draft, source_papers)
+
+                updated = dict(analytics)
+                updated['paper_metrics'] = await self._calculate_paper_metrics(paper_draft)
+                updated['content_analysis'] = await self._analyze_content(paper_draft)
+                updated['quality_indicators'] = await self._assess_quality(paper_draft, source_papers)
+                updated['recommendations'] = await self._generate_recommendations(paper_draft, source_papers)
+                return updated
+
+            except Exception as e:
+                self.logger.error(f"Error updating section analytics: {str(e)}")
+                return analytics
+
     async def _calculate_paper_metrics(self, paper_draft: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate various metrics for the paper."""
         try:
@@ -74,13 +124,7 @@ class AnalyticsAgent:
             metrics['readability_score'] = await self._calculate_readability(paper_draft)
             
             # Citation density
-            references_section = sections.get('references', '')
-            if isinstance(references_section, dict):
-                references_content = str(references_section.get('content', ''))
-            else:
-                references_content = str(references_section)
-            
-            references_count = len(references_content.split('\n')) if references_content else 0
+            references_count = self._get_reference_count(paper_draft)
             metrics['citation_density'] = references_count / max(word_count / 1000, 1)  # Citations per 1000 words
             
             return metrics
@@ -95,15 +139,7 @@ class AnalyticsAgent:
             content_analysis = {}
             
             # Extract text content
-            full_text = str(paper_draft.get('abstract', ''))
-            sections = paper_draft.get('sections', {})
-            
-            for section_content in sections.values():
-                if isinstance(section_content, dict):
-                    content = str(section_content.get('content', ''))
-                    full_text += ' ' + content
-                elif isinstance(section_content, str):
-                    full_text += ' ' + section_content
+            full_text = self._get_full_text(paper_draft)
             
             # Keyword analysis
             keywords = await self._extract_keywords(full_text)
@@ -241,7 +277,7 @@ class AnalyticsAgent:
             # Methodological trends
             methodologies = []
             for paper in source_papers:
-                abstract = paper.get('abstract', '').lower()
+                abstract = self.text_cache.for_paper(paper).lower_abstract
                 if 'experiment' in abstract:
                     methodologies.append('experimental')
                 elif 'computational' in abstract or 'model' in abstract:
@@ -308,13 +344,7 @@ class AnalyticsAgent:
                 recommendations.append("Include more recent sources to ensure current relevance")
             
             # Citation density
-            references_section = sections.get('references', '')
-            if isinstance(references_section, dict):
-                references_content = str(references_section.get('content', ''))
-            else:
-                references_content = str(references_section)
-            
-            citation_count = len(references_content.split('\n')) if references_content else 0
+            citation_count = self._get_reference_count(paper_draft)
             citation_density = citation_count / max(word_count / 1000, 1)
             
             if citation_density < 10:
@@ -329,15 +359,35 @@ class AnalyticsAgent:
             return ["Error generating recommendations"]
     
     # Helper methods for analysis
+    def _get_full_text(self, paper_draft: Dict[str, Any]) -> str:
+        """Abstract plus all section text of the draft, built once per draft."""
+        def build() -> str:
+            full_text = str(paper_draft.get('abstract', ''))
+            for section_content in paper_draft.get('sections', {}).values():
+                if isinstance(section_content, dict):
+                    full_text += ' ' + str(section_content.get('content', ''))
+                elif isinstance(section_content, str):
+                    full_text += ' ' + section_content
+            return full_text
+        
+        return self.memo.get_or_compute(DRAFT_FULL_TEXT, build, scope=paper_draft)
+    
+    def _get_reference_count(self, paper_draft: Dict[str, Any]) -> int:
+        """Number of lines in the references section, parsed once per draft."""
+        def count() -> int:
+            references_section = paper_draft.get('sections', {}).get('references', '')
+            if isinstance(references_section, dict):
+                references_content = str(references_section.get('content', ''))
+            else:
+                references_content = str(references_section)
+            return len(references_content.split('\n')) if references_content else 0
+        
+        return self.memo.get_or_compute(REFERENCE_COUNT, count, scope=paper_draft)
+    
     async def _calculate_readability(self, paper_draft: Dict[str, Any]) -> float:
         """Calculate a simplified readability score."""
         # Simplified Flesch Reading Ease approximation
-        full_text = paper_draft.get('abstract', '')
-        sections = paper_draft.get('sections', {})
-        
-        for section_content in sections.values():
-            if isinstance(section_content, str):
-                full_text += ' ' + section_content
+        full_text = self._get_full_text(paper_draft)
         
         words = full_text.split()
         sentences = full_text.split('.')
@@ -357,18 +407,13 @@ class AnalyticsAgent:
     
     async def _extract_keywords(self, text: str) -> List[str]:
         """Extract keywords from text."""
-        # Simple keyword extraction
-        words = text.lower().split()
+        # Simple keyword extraction over the shared term frequencies
+        term_freq = self.text_cache.for_text(text).term_freq
         
         # Filter common words
         stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can'}
         
-        filtered_words = [word for word in words if word not in stop_words and len(word) > 3]
-        
-        # Count word frequency
-        word_counts = {}
-        for word in filtered_words:
-            word_counts[word] = word_counts.get(word, 0) + 1
+        word_counts = {word: count for word, count in term_freq.items() if word not in stop_words and len(word) > 3}
         
         # Return top keywords
         top_keywords = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[:10]
@@ -396,12 +441,13 @@ class AnalyticsAgent:
         positive_words = ['good', 'great', 'excellent', 'positive', 'success', 'improve', 'benefit', 'effective']
         negative_words = ['bad', 'poor', 'negative', 'failure', 'problem', 'issue', 'limitation', 'weak']
         
-        words = text.lower().split()
+        paper_text = self.text_cache.for_text(text)
+        term_freq = paper_text.term_freq
         
-        positive_count = sum(1 for word in words if word in positive_words)
-        negative_count = sum(1 for word in words if word in negative_words)
+        positive_count = sum(term_freq[word] for word in positive_words)
+        negative_count = sum(term_freq[word] for word in negative_words)
         
-        total_words = len(words)
+        total_words = len(paper_text.tokens)
         
         if total_words == 0:
             return {'positive': 0.5, 'negative': 0.5, 'neutral': 0.5}
@@ -435,13 +481,13 @@ class AnalyticsAgent:
         # Simplified academic tone assessment
         academic_words = ['research', 'study', 'analysis', 'findings', 'results', 'conclusion', 'methodology', 'literature', 'review', 'investigation']
         
-        words = text.lower().split()
-        academic_word_count = sum(1 for word in words if word in academic_words)
+        paper_text = self.text_cache.for_text(text)
+        academic_word_count = sum(paper_text.term_freq[word] for word in academic_words)
         
-        if len(words) == 0:
+        if len(paper_text.tokens) == 0:
             return 0.5
         
-        return min(academic_word_count / len(words) * 10, 1.0)
+        return min(academic_word_count / len(paper_text.tokens) * 10, 1.0)
     
     async def _assess_completeness(self, paper_draft: Dict[str, Any]) -> float:
         """Assess the completeness of the paper."""
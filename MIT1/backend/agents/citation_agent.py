@@ -6,9 +6,14 @@ import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import logging
-import re
 import os
 from dotenv import load_dotenv
+from services.paper_text import PaperTextCache
+from services.citation_placeholders import CitationReplacer, PLACEHOLDER_PATTERN
+from services.citation_formatter import DEFAULT_STYLES, get_citation_formatter
+from services.reference_list import ReferenceList
+from services.keyword_network import KeywordNetwork, build_keyword_network
+from services.citation_graph import CitationGraph, build_citation_graph, citation_graph_enabled
 
 # Load environment variables
 load_dotenv('.env')
@@ -16,23 +21,23 @@ load_dotenv('.env')
 class CitationAgent:
     """Agent responsible for generating and managing citations."""
     
-    def __init__(self):
+    def __init__(self, text_cache: Optional[PaperTextCache] = None):
         self.logger = logging.getLogger(__name__)
-        self.citation_styles = {
-            'apa': self._format_apa,
-            'mla': self._format_mla,
-            'chicago': self._format_chicago,
-            'ieee': self._format_ieee
-        }
-        self.citation_placeholder_pattern = r'\[(\d+(?:,\s*\d+)*)\]'
+        self.text_cache = text_cache or PaperTextCache()
+        self.formatter = get_citation_formatter()
+        self.citation_styles = list(DEFAULT_STYLES)
+        self.citation_placeholder_pattern = PLACEHOLDER_PATTERN.pattern
     
-    async def generate_citations(self, papers: List[Dict[str, Any]], summaries: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_citations(self, papers: List[Dict[str, Any]], summaries: Dict[str, Any],
+                                 citation_style: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate citations for the provided papers.
         
         Args:
             papers: List of research papers
             summaries: Paper summaries
+            citation_style: Style the request uses; only that style is formatted
+                (all styles when omitted)
             
         Returns:
             Dictionary containing formatted citations
@@ -40,12 +45,17 @@ class CitationAgent:
         try:
             self.logger.info(f"Generating citations for {len(papers)} papers")
             
+            styles = [self.formatter.resolve_style(citation_style)] if citation_style else list(self.citation_styles)
             citations = {
-                'formatted_citations': await self._generate_formatted_citations(papers),
-                'in_text_citations': await self._generate_in_text_citations(papers, summaries),
-                'bibliography': await self._generate_bibliography(papers),
+                'formatted_citations': await self._generate_formatted_citations(papers, styles),
+                'in_text_citations': await self._generate_in_text_citations(papers, summaries, styles[0]),
+                'bibliography': await self._generate_bibliography(papers, styles[0]),
+                # The numbered reference list every consumer of this pipeline reads
+                'references': ReferenceList.from_papers(papers, styles[0]).entries,
                 'citation_network': await self._build_citation_network(papers)
             }
+            if citation_style:
+                citations['citation_style'] = styles[0]
             
             self.logger.info("Citation generation completed successfully")
             return citations
@@ -68,120 +78,58 @@ class CitationAgent:
             Text with placeholders replaced by citations
         """
         try:
-            # Find all citation placeholders
-            placeholders = re.findall(self.citation_placeholder_pattern, text)
-            
-            if not placeholders:
-                return text
-            
-            # Replace placeholders with citations
-            def replace_placeholder(match):
-                placeholder_content = match.group(1)
-                
-                # Handle multiple citations like "1, 2, 3"
-                citation_nums = [num.strip() for num in placeholder_content.split(',')]
-                citation_texts = []
-                
-                for citation_num in citation_nums:
-                    try:
-                        placeholder_idx = int(citation_num) - 1  # Convert to 0-based index
-                        
-                        if placeholder_idx < len(papers):
-                            paper = papers[placeholder_idx]
-                            
-                            # Generate in-text citation based on style
-                            if citation_style == 'apa':
-                                authors = paper.get('authors', ['Unknown'])
-                                year = paper.get('year', 'n.d.')
-                                if len(authors) == 1:
-                                    citation_text = f"{authors[0].split()[-1] if authors[0] else 'Unknown'}, {year}"
-                                elif len(authors) == 2:
-                                    last_names = [a.split()[-1] if a else 'Unknown' for a in authors[:2]]
-                                    citation_text = f"{' & '.join(last_names)}, {year}"
-                                else:
-                                    first_author = authors[0].split()[-1] if authors[0] else 'Unknown'
-                                    citation_text = f"{first_author} et al., {year}"
-                            
-                            elif citation_style == 'mla':
-                                authors = paper.get('authors', ['Unknown'])
-                                if len(authors) >= 1:
-                                    first_author = authors[0].split()[-1] if authors[0] else 'Unknown'
-                                    citation_text = first_author
-                                else:
-                                    citation_text = "Unknown"
-                            
-                            elif citation_style == 'chicago':
-                                authors = paper.get('authors', ['Unknown'])
-                                year = paper.get('year', 'n.d.')
-                                if len(authors) >= 1:
-                                    first_author = authors[0].split()[-1] if authors[0] else 'Unknown'
-                                    citation_text = f"{first_author} {year}"
-                                else:
-                                    citation_text = f"Unknown {year}"
-                            
-                            elif citation_style == 'ieee':
-                                citation_text = citation_num
-                            
-                            else:
-                                # Default to APA style
-                                authors = paper.get('authors', ['Unknown'])
-                                year = paper.get('year', 'n.d.')
-                                first_author = authors[0].split()[-1] if authors and authors[0] else 'Unknown'
-                                citation_text = f"{first_author}, {year}"
-                            
-                            citation_texts.append(citation_text)
-                        else:
-                            # If we don't have enough papers, keep the number
-                            citation_texts.append(citation_num)
-                    except (ValueError, IndexError):
-                        citation_texts.append(citation_num)
-                
-                # Format the final citation
-                if citation_style == 'ieee':
-                    return f"[{', '.join(citation_texts)}]"
-                else:
-                    return f"({'; '.join(citation_texts)})"
-            
-            result_text = re.sub(self.citation_placeholder_pattern, replace_placeholder, text)
-            
-            return result_text
+            return CitationReplacer(papers, citation_style).replace(text)[0]
             
         except Exception as e:
             self.logger.error(f"Error replacing citation placeholders: {str(e)}")
             return text
     
-    def _format_citation(self, paper: Dict[str, Any], style: str) -> str:
-        """Format a single paper citation in the specified style."""
-        if style in self.citation_styles:
-            return self.citation_styles[style](paper)
-        else:
-            return self._format_apa(paper)  # Default to APA
-    
-    async def _generate_formatted_citations(self, papers: List[Dict[str, Any]]) -> Dict[str, List[str]]:
-        """Generate citations in multiple formats."""
-        formatted_citations = {}
+    async def replace_citations_in_draft(self, draft: Dict[str, Any], papers: List[Dict[str, Any]],
+                                         citation_style: str = 'apa',
+                                         sections: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Replace the citation placeholders of every section of a draft in one pass.
         
-        for style_name, style_function in self.citation_styles.items():
-            formatted_citations[style_name] = []
-            
-            for paper in papers:
-                try:
-                    citation = style_function(paper)
-                    formatted_citations[style_name].append(citation)
-                except Exception as e:
-                    self.logger.error(f"Error formatting {style_name} citation: {str(e)}")
-                    continue
+        Each cited paper's in-text citation is formatted once and reused for
+        all of its placeholders in the draft.
         
-        return formatted_citations
+        Args:
+            draft: Paper draft (abstract and 'sections'), updated in place
+            papers: List of papers to use for citations
+            citation_style: Citation style (apa, mla, chicago, ieee)
+            sections: Top-level section fields to replace instead, for flat drafts
+            
+        Returns:
+            Number of placeholders replaced per section
+        """
+        try:
+            replacements = CitationReplacer(papers, citation_style).replace_draft(draft, sections)
+            self.logger.info(f"Replaced {sum(replacements.values())} citation placeholders "
+                             f"in {len(replacements)} sections")
+            return replacements
+            
+        except Exception as e:
+            self.logger.error(f"Error replacing citation placeholders in draft: {str(e)}")
+            return {}
     
-    async def _generate_in_text_citations(self, papers: List[Dict[str, Any]], summaries: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _format_citation(self, paper: Dict[str, Any], style: str) -> str:
+        """Format a single paper citation in the specified style (APA when unknown)."""
+        return self.formatter.format(paper, style)
+    
+    async def _generate_formatted_citations(self, papers: List[Dict[str, Any]],
+                                            styles: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """Generate citations in the requested formats (all formats by default)."""
+        return {style: self.formatter.format_many(papers, style) for style in (styles or self.citation_styles)}
+    
+    async def _generate_in_text_citations(self, papers: List[Dict[str, Any]], summaries: Dict[str, Any],
+                                          citation_style: str = 'apa') -> List[Dict[str, Any]]:
         """Generate in-text citations with context."""
         in_text_citations = []
         
-        for paper in papers:
+        for number, paper in enumerate(papers, 1):
             try:
                 # Find where this paper should be cited based on summaries
-                citation_contexts = await self._find_citation_contexts(paper, summaries)
+                citation_contexts = await self._find_citation_contexts(paper, summaries, number, citation_style)
                 
                 for context in citation_contexts:
                     in_text_citations.append({
@@ -198,7 +146,7 @@ class CitationAgent:
         
         return in_text_citations
     
-    async def _generate_bibliography(self, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def _generate_bibliography(self, papers: List[Dict[str, Any]], citation_style: str = 'apa') -> List[Dict[str, Any]]:
         """Generate a comprehensive bibliography."""
         bibliography = []
         
@@ -208,6 +156,7 @@ class CitationAgent:
                     'id': paper.get('id', ''),
                     'title': paper.get('title', ''),
                     'authors': paper.get('authors', []),
+                    'year': paper.get('year', ''),
                     'publication_date': paper.get('published_date', ''),
                     'journal': paper.get('journal', ''),
                     'volume': paper.get('volume', ''),
@@ -217,7 +166,8 @@ class CitationAgent:
                     'url': paper.get('url', ''),
                     'abstract': paper.get('abstract', ''),
                     'keywords': paper.get('keywords', []),
-                    'relevance_score': paper.get('relevance_score', 0.0)
+                    'relevance_score': paper.get('relevance_score', 0.0),
+                    'formatted_citation': self.formatter.format(paper, citation_style)
                 }
                 
                 bibliography.append(bib_entry)
@@ -253,15 +203,31 @@ class CitationAgent:
                 }
                 citation_network['nodes'].append(node)
             
-            # Find connections between papers (simplified)
-            edges = await self._find_paper_connections(papers)
-            citation_network['edges'] = edges
+            # Find connections between papers (shared keywords)
+            network = build_keyword_network(papers)
+            citation_network['edges'] = network.edges(papers)
+            
+            # Real citation links (references and citing works) of the papers
+            graph = await self._fetch_citation_graph(papers)
+            if graph is not None:
+                citation_network['citation_edges'] = [
+                    {'source': papers[citing].get('id', ''), 'target': papers[cited].get('id', ''),
+                     'source_index': citing, 'target_index': cited, 'type': 'cites'}
+                    for citing, cited in graph.paper_edges()
+                ]
             
             # Identify central papers
-            citation_network['central_papers'] = await self._identify_central_papers(papers)
+            citation_network['central_papers'] = await self._identify_central_papers(papers, graph)
             
             # Calculate network statistics
-            citation_network['network_stats'] = await self._calculate_network_stats(citation_network)
+            citation_network['network_stats'] = await self._calculate_network_stats(citation_network, network)
+            if graph is not None:
+                citation_network['network_stats']['citation_graph'] = {
+                    'nodes': graph.size,
+                    'edges': graph.edge_count,
+                    'linked_papers': sum(1 for node in graph.paper_nodes if node is not None),
+                    'edges_between_papers': len(citation_network['citation_edges'])
+                }
             
             return citation_network
             
@@ -269,209 +235,76 @@ class CitationAgent:
             self.logger.error(f"Error building citation network: {str(e)}")
             return {'error': str(e)}
     
-    def _format_apa(self, paper: Dict[str, Any]) -> str:
-        """Format citation in APA style."""
-        authors = paper.get('authors', [])
-        title = paper.get('title', '')
-        journal = paper.get('journal', '')
-        year = paper.get('year', '')
-        volume = paper.get('volume', '')
-        pages = paper.get('pages', '')
-        doi = paper.get('doi', '')
-        url = paper.get('url', '')
-        
-        # Format authors safely
-        if not authors or len(authors) == 0:
-            author_str = "Unknown Author"
-        elif len(authors) == 1:
-            author_str = authors[0] if authors[0] else "Unknown Author"
-        elif len(authors) <= 7:
-            valid_authors = [a for a in authors if a]  # Filter out empty authors
-            if len(valid_authors) >= 2:
-                author_str = ', '.join(valid_authors[:-1]) + ', & ' + valid_authors[-1]
-            elif len(valid_authors) == 1:
-                author_str = valid_authors[0]
-            else:
-                author_str = "Unknown Author"
-        else:
-            valid_authors = [a for a in authors if a]  # Filter out empty authors
-            if len(valid_authors) >= 6:
-                author_str = ', '.join(valid_authors[:6]) + ', ... ' + valid_authors[-1]
-            elif len(valid_authors) > 0:
-                author_str = ', '.join(valid_authors[:3]) + ' et al.'
-            else:
-                author_str = "Unknown Author"
-        
-        # Build citation
-        citation = f"{author_str} ({year}). {title}. "
-        
-        if journal:
-            citation += f"{journal}"
-            if volume:
-                citation += f", {volume}"
-            if pages:
-                citation += f", {pages}"
-        
-        # Add DOI or URL link
-        if doi:
-            citation += f". https://doi.org/{doi}"
-        elif url:
-            citation += f". Retrieved from {url}"
-        
-        return citation
-    
-    def _format_mla(self, paper: Dict[str, Any]) -> str:
-        """Format citation in MLA style."""
-        authors = paper.get('authors', [])
-        title = paper.get('title', '')
-        journal = paper.get('journal', '')
-        year = paper.get('year', '')
-        volume = paper.get('volume', '')
-        pages = paper.get('pages', '')
-        url = paper.get('url', '')
-        
-        # Format authors
-        if len(authors) == 1:
-            author_str = authors[0]
-        else:
-            author_str = ', '.join(authors[:-1]) + ', and ' + authors[-1]
-        
-        # Build citation
-        citation = f"{author_str}. \"{title}.\" "
-        
-        if journal:
-            citation += f"{journal}"
-            if volume:
-                citation += f", vol. {volume}"
-            if pages:
-                citation += f", {year}, pp. {pages}"
-            else:
-                citation += f", {year}"
-        
-        # Add URL if available
-        if url:
-            citation += f". Web. {url}"
-        
-        return citation
-    
-    def _format_chicago(self, paper: Dict[str, Any]) -> str:
-        """Format citation in Chicago style."""
-        authors = paper.get('authors', [])
-        title = paper.get('title', '')
-        journal = paper.get('journal', '')
-        year = paper.get('year', '')
-        volume = paper.get('volume', '')
-        pages = paper.get('pages', '')
-        doi = paper.get('doi', '')
-        url = paper.get('url', '')
-        
-        # Format authors
-        if len(authors) == 1:
-            author_str = authors[0]
-        else:
-            author_str = ', '.join(authors[:-1]) + ', and ' + authors[-1]
-        
-        # Build citation
-        citation = f"{author_str}. \"{title}.\" "
-        
-        if journal:
-            citation += f"{journal}"
-            if volume:
-                citation += f" {volume}"
-            if pages:
-                citation += f", no. {paper.get('issue', '')} ({year}): {pages}"
-            else:
-                citation += f" ({year})"
-        
-        # Add DOI or URL link
-        if doi:
-            citation += f". https://doi.org/{doi}"
-        elif url:
-            citation += f". {url}"
-        
-        return citation
-    
-    def _format_ieee(self, paper: Dict[str, Any]) -> str:
-        """Format citation in IEEE style."""
-        authors = paper.get('authors', [])
-        title = paper.get('title', '')
-        journal = paper.get('journal', '')
-        year = paper.get('year', '')
-        volume = paper.get('volume', '')
-        pages = paper.get('pages', '')
-        doi = paper.get('doi', '')
-        url = paper.get('url', '')
-        
-        # Format authors
-        if len(authors) == 1:
-            author_str = authors[0]
-        elif len(authors) <= 6:
-            author_str = ', '.join(authors)
-        else:
-            author_str = ', '.join(authors[:3]) + ' et al.'
-        
-        # Build citation
-        citation = f"{author_str}, \"{title},\" "
-        
-        if journal:
-            citation += f"{journal}"
-            if volume:
-                citation += f", vol. {volume}"
-            if pages:
-                citation += f", pp. {pages}"
-            citation += f", {year}"
-        
-        # Add DOI or URL link
-        if doi:
-            citation += f", doi: {doi}"
-        elif url:
-            citation += f". [Online]. Available: {url}"
-        
-        return citation
-    
-    async def _find_citation_contexts(self, paper: Dict[str, Any], summaries: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async def _find_citation_contexts(self, paper: Dict[str, Any], summaries: Dict[str, Any],
+                                      number: int = 1, citation_style: str = 'apa') -> List[Dict[str, Any]]:
         """Find contexts where this paper should be cited."""
         contexts = []
         
         # Simple context matching based on keywords
-        paper_keywords = paper.get('keywords', [])
-        paper_title = paper.get('title', '').lower()
+        paper_keywords = [keyword.lower() for keyword in paper.get('keywords', [])]
+        if not paper_keywords:
+            return contexts
+        
+        citation = self.formatter.in_text(paper, str(number), citation_style)
+        citation_text = f"[{citation}]" if citation_style == 'ieee' else f"({citation})"
         
         # Check individual summaries for relevant contexts
         individual_summaries = summaries.get('individual_summaries', [])
         
         for summary in individual_summaries:
-            if any(keyword.lower() in summary.get('summary', '').lower() for keyword in paper_keywords):
+            summary_text = self.text_cache.for_text(summary.get('summary', '')).lower_text
+            if any(keyword in summary_text for keyword in paper_keywords):
                 contexts.append({
                     'context': summary.get('summary', ''),
-                    'citation_text': f"({paper.get('authors', ['Unknown'])[0]}, {paper.get('year', '')})",
+                    'citation_text': citation_text,
                     'relevance_score': 0.8
                 })
         
         return contexts
     
     async def _find_paper_connections(self, papers: List[Dict[str, Any]]) -> List[Dict[str, str]]:
-        """Find connections between papers."""
-        edges = []
+        """Find connections between papers (pairs sharing at least two keywords)."""
+        return build_keyword_network(papers).edges(papers)
+    
+    async def _fetch_citation_graph(self, papers: List[Dict[str, Any]]) -> Optional[CitationGraph]:
+        """Citation graph of the papers and their one-hop neighbours (None when unavailable)."""
+        if not papers or not citation_graph_enabled():
+            return None
+        try:
+            timeout = float(os.getenv('CITATION_GRAPH_TIMEOUT', '15'))
+            graph = await asyncio.wait_for(build_citation_graph(papers), timeout=timeout)
+            if graph is not None:
+                self.logger.info(f"Citation graph: {graph.size} nodes, {graph.edge_count} edges")
+            return graph
+        except Exception as e:
+            self.logger.warning(f"Error building citation graph: {str(e) or type(e).__name__}")
+            return None
+    
+    async def _identify_central_papers(self, papers: List[Dict[str, Any]],
+                                       graph: Optional[CitationGraph] = None) -> List[Dict[str, Any]]:
+        """
+        Identify central papers in the citation network.
         
-        # Simple connection based on shared keywords
-        for i, paper1 in enumerate(papers):
-            for j, paper2 in enumerate(papers[i+1:], i+1):
-                keywords1 = set(paper1.get('keywords', []))
-                keywords2 = set(paper2.get('keywords', []))
-                
-                # If papers share significant keywords, create an edge
-                if len(keywords1.intersection(keywords2)) >= 2:
-                    edges.append({
-                        'source': paper1.get('id', ''),
-                        'target': paper2.get('id', ''),
-                        'weight': len(keywords1.intersection(keywords2))
-                    })
+        Papers are ranked by PageRank over the citation graph when it has
+        edges (HITS hub and authority scores are reported alongside), and
+        by relevance score and citation count otherwise.
+        """
+        if graph is not None and graph.edge_count:
+            pagerank = graph.pagerank()
+            hubs, authorities = graph.hits()
+            scored = []
+            for index, paper in enumerate(papers):
+                node = graph.paper_nodes[index]
+                scored.append({
+                    **paper,
+                    'pagerank': float(pagerank[node]) if node is not None else 0.0,
+                    'hub_score': float(hubs[node]) if node is not None else 0.0,
+                    'authority_score': float(authorities[node]) if node is not None else 0.0
+                })
+            scored.sort(key=lambda x: (x['pagerank'], x.get('relevance_score', 0.0), x.get('citations_count', 0)),
+                        reverse=True)
+            return scored[:5]  # Top 5 central papers
         
-        return edges
-    
-    async def _identify_central_papers(self, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Identify central papers in the citation network."""
         # Sort by relevance score and citation count
         central_papers = sorted(
             papers,
@@ -481,8 +314,9 @@ class CitationAgent:
         
         return central_papers[:5]  # Top 5 central papers
     
-    async def _calculate_network_stats(self, citation_network: Dict[str, Any]) -> Dict[str, Any]:
-        """Calculate network statistics."""
+    async def _calculate_network_stats(self, citation_network: Dict[str, Any],
+                                       network: Optional[KeywordNetwork] = None) -> Dict[str, Any]:
+        """Calculate network statistics (from the network's degree counts when given)."""
         nodes = citation_network.get('nodes', [])
         edges = citation_network.get('edges', [])
         
@@ -496,23 +330,32 @@ class CitationAgent:
         
         if nodes:
             # Find most connected paper
-            connection_counts = {}
-            for edge in edges:
-                source = edge.get('source', '')
-                target = edge.get('target', '')
-                connection_counts[source] = connection_counts.get(source, 0) + 1
-                connection_counts[target] = connection_counts.get(target, 0) + 1
-            
-            if connection_counts:
-                most_connected_id = max(connection_counts, key=connection_counts.get)
-                most_connected_paper = next(
-                    (node for node in nodes if node['id'] == most_connected_id),
-                    {}
-                )
-                stats['most_connected_paper'] = most_connected_paper.get('title', '')
+            if network is not None and network.size == len(nodes):
+                most_connected = network.most_connected()
+                if most_connected is not None:
+                    stats['most_connected_paper'] = nodes[most_connected].get('title', '')
+            else:
+                stats['most_connected_paper'] = self._most_connected_title(nodes, edges)
             
             # Calculate network density
             max_possible_edges = len(nodes) * (len(nodes) - 1) / 2
             stats['network_density'] = len(edges) / max_possible_edges if max_possible_edges > 0 else 0
         
         return stats
+    
+    def _most_connected_title(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> str:
+        """Title of the node with the most edges, counted from an edge list."""
+        connection_counts = {}
+        for edge in edges:
+            source = edge.get('source', '')
+            target = edge.get('target', '')
+            connection_counts[source] = connection_counts.get(source, 0) + 1
+            connection_counts[target] = connection_counts.get(target, 0) + 1
+        
+        if not connection_counts:
+            return ''
+        most_connected_id = max(connection_counts, key=connection_counts.get)
+        for node in nodes:
+            if node['id'] == most_connected_id:
+                return node.get('title', '')
+        return ''
@@ -3,21 +3,124 @@ Paper generator agent for creating research paper drafts.
 """
 
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Awaitable, Tuple
 from datetime import datetime
+from contextvars import ContextVar
+from graphlib import TopologicalSorter
 import logging
 import os
 import json
 import re
-from openai import AsyncOpenAI
+from services.llm_cache import get_llm_cache, cache_scope, LLMResponseCache
+from services.batch_generation import current_recorder
+from services.llm_scheduler import get_llm_scheduler, estimate_request_tokens, llm_configured
+from services.prompt_context import PromptContextBuilder
+from services.passage_index import PassageIndex
+from services.section_templates import SectionTemplates, get_section_templates, build_context
+from services.reference_list import ReferenceList
+
+SYSTEM_PROMPT = "You are an expert academic writer specializing in research paper generation. Always include citation placeholders [1], [2], [3], etc. where references should appear. Use proper academic tone and structure."
+
+# Sections that must be written after others, because their prompts read the
+# earlier text; every other section is independent
+SECTION_DEPENDENCIES = {
+    'abstract': '*',  # summarizes the whole body
+    'discussion': ['results']  # interprets the results
+}
+
+# Short template-backed sections written together in one structured LLM call
+UTILITY_SECTIONS = ('objectives', 'limitations', 'future_work', 'ethical_considerations', 'appendix')
+
+# Sections that get their own LLM call in medium and long drafts
+LLM_SECTIONS = ('abstract', 'introduction', 'literature_review', 'discussion')
+
+# What a batched call is asked to write for each section, and its completion token budget
+SECTION_BATCH_SPECS = {
+    'introduction': ("400-500 words covering background, problem statement, objectives and paper structure", 700),
+    'literature_review': ("600-800 words organized by themes, synthesizing findings and identifying gaps", 1100),
+    'objectives': ("3-4 numbered research objectives, 80-120 words in total", 200),
+    'limitations': ("80-120 words on limitations of data, scope and evaluation", 200),
+    'future_work': ("3-4 numbered future research directions, 100-150 words in total", 250),
+    'ethical_considerations': ("80-120 words on privacy, fairness, transparency and misuse risks", 200),
+    'appendix': ("50-80 words describing supplementary material for reproducibility", 120)
+}
+
+# Terms added to the topic when retrieving evidence passages for a section
+SECTION_EVIDENCE_QUERIES = {
+    'abstract': 'results findings contribution improvement',
+    'introduction': 'importance challenges problem motivation',
+    'literature_review': 'methods approaches prior work comparison findings',
+    'discussion': 'implications interpretation comparison limitations',
+    'batch': 'objectives limitations future directions ethical risks'
+}
+
+# Event queue of an active streaming consumer, and the section the current task is writing
+_stream_queue: ContextVar[Optional[asyncio.Queue]] = ContextVar('draft_stream_queue', default=None)
+_current_section: ContextVar[Optional[str]] = ContextVar('draft_current_section', default=None)
+# Research context shared by the section prompts of the draft being generated
+_prompt_context: ContextVar[Optional[PromptContextBuilder]] = ContextVar('draft_prompt_context', default=None)
+# Set while building the instant template draft of progressive mode
+_llm_disabled: ContextVar[bool] = ContextVar('draft_llm_disabled', default=False)
+# Sections of the draft written so far, read by the prompts of dependent sections
+_draft_sections: ContextVar[Optional[Dict[str, Any]]] = ContextVar('draft_sections', default=None)
+# Whether an LLM call of the current section task returned text (a one-item list, set per task)
+_llm_wrote: ContextVar[Optional[List[bool]]] = ContextVar('draft_llm_wrote', default=None)
+
+SECTION_COMPLETE = '__section__'
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+STREAM_RESULT = '__result__'
+
+async def stream_generation_events(operation: Awaitable[Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Run an operation that generates a draft and yield its events as they happen.
+    
+    The operation can be generate_draft itself or anything that calls it (such
+    as a supervised pipeline); LLM calls made inside it stream their tokens.
+    
+    Yields:
+        (section, delta) for every streamed chunk of text,
+        (SECTION_COMPLETE, section) when a section is finished, and finally
+        (STREAM_RESULT, result) with the operation's return value
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    token = _stream_queue.set(queue)
+    try:
+        # The task copies the current context, so it sees the queue
+        task = asyncio.ensure_future(operation)
+    finally:
+        _stream_queue.reset(token)
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield event
+        yield STREAM_RESULT, task.result()
+    finally:
+        if not task.done():
+            task.cancel()
 
 class PaperGeneratorAgent:
     """Agent responsible for generating research paper drafts."""
     
-    def __init__(self):
+    def __init__(self, passage_index: Optional[PassageIndex] = None):
         self.logger = logging.getLogger(__name__)
-        self.openai_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        # Source passages that section prompts retrieve their evidence from
+        self.passage_index = passage_index
+        self.evidence_passages = int(os.getenv('PROMPT_EVIDENCE_PASSAGES', '4'))
+        self._template_context: Optional[Tuple[Dict[str, Any], str, Dict[str, Any]]] = None
+        # Requests from every agent go through one shared client, rate limits and queue
+        self.llm_scheduler = get_llm_scheduler()
+        self.openai_client = self.llm_scheduler.client
         self.llm_model = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+        # Caps concurrent LLM requests of this draft when independent sections run in parallel
+        self.llm_semaphore = asyncio.Semaphore(int(os.getenv('LLM_CONCURRENCY', '4')))
+        self.llm_temperature = 0.7
+        use_cache = os.getenv('LLM_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.llm_cache = get_llm_cache() if use_cache else None
         self.sections = {
             'abstract': self._generate_abstract,
             'introduction': self._generate_introduction,
@@ -73,37 +176,48 @@ class PaperGeneratorAgent:
                 }
             }
             
-            # Generate sections
-            for section_name in paper_structure:
-                if section_name in self.sections:
-                    try:
-                        section_content = await self.sections[section_name](
-                            topic, summaries, citations, requirements
-                        )
-                        # Ensure we have a proper section structure
-                        if isinstance(section_content, str):
-                            paper_draft['sections'][section_name] = {
-                                'title': section_name.replace('_', ' ').title(),
-                                'content': section_content,
-                                'word_count': len(section_content.split())
-                            }
-                        else:
-                            paper_draft['sections'][section_name] = section_content
-                    except Exception as e:
-                        self.logger.error(f"Error generating {section_name}: {str(e)}")
-                        paper_draft['sections'][section_name] = {
-                            'title': section_name.replace('_', ' ').title(),
-                            'content': f"Content for {section_name.replace('_', ' ')} will be generated based on the research findings and analysis.",
-                            'word_count': 20
-                        }
+            # Progressive mode returns the template draft at once; LLM text is
+            # filled in later through upgrade_sections
+            progressive = bool(requirements.get('progressive'))
+            if progressive:
+                paper_draft['metadata']['progressive'] = True
+                paper_draft['metadata']['upgrade_sections'] = (
+                    self.llm_backed_sections(paper_structure, requirements) if self.llm_available else []
+                )
+            
+            # Generate sections, running independent ones concurrently; the cache
+            # mode ('use', 'bypass' or 'refresh') applies to every LLM call below
+            prompt_context = PromptContextBuilder(topic, summaries, model=self.llm_model)
+            context_token = _prompt_context.set(prompt_context)
+            disabled_token = _llm_disabled.set(progressive)
+            try:
+                with cache_scope(requirements.get('llm_cache')) as cache_stats:
+                    paper_draft['sections'] = await self._generate_sections(
+                        paper_structure, topic, summaries, citations, requirements
+                    )
+            finally:
+                _llm_disabled.reset(disabled_token)
+                _prompt_context.reset(context_token)
+            
+            for section in paper_draft['sections'].values():
+                if isinstance(section, dict):
+                    section.setdefault('version', 1)
+            
+            if self.llm_cache is not None:
+                paper_draft['metadata']['llm_cache'] = cache_stats.to_dict()
+            paper_draft['metadata']['prompt_context'] = prompt_context.stats()
             
             # Calculate word count
             paper_draft['metadata']['word_count'] = self._calculate_word_count(paper_draft)
             
-            # Generate abstract last (after all sections are complete)
-            paper_draft['abstract'] = await self._generate_abstract(
-                topic, summaries, citations, requirements
-            )
+            # Reuse the abstract section's text when the structure has one
+            abstract_section = paper_draft['sections'].get('abstract')
+            if isinstance(abstract_section, dict):
+                paper_draft['abstract'] = abstract_section.get('content', '')
+            else:
+                paper_draft['abstract'] = await self._generate_abstract(
+                    topic, summaries, citations, requirements
+                )
             
             self.logger.info("Paper generation completed successfully")
             return paper_draft
@@ -112,85 +226,280 @@ class PaperGeneratorAgent:
             self.logger.error(f"Error in paper generation: {str(e)}")
             return {'error': str(e)}
     
-    def _determine_paper_structure(self, requirements: Dict[str, Any]) -> List[str]:
-        """Determine the structure of the paper based on requirements."""
-        paper_type = requirements.get('type', 'research_paper')
-        length = requirements.get('length', 'medium')
+    async def generate_draft_stream(self, topic: str, summaries: Dict[str, Any],
+                                    citations: Dict[str, Any], requirements: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Generate a draft, streaming section text as the LLM produces it.
+        
+        Yields:
+            (section, delta) text chunks, (SECTION_COMPLETE, section) when a
+            section is done, and finally ('__draft__', draft)
+        """
+        async for event, payload in stream_generation_events(
+            self.generate_draft(topic, summaries, citations, requirements)
+        ):
+            yield ('__draft__' if event == STREAM_RESULT else event), payload
+
+    @property
+    def llm_available(self) -> bool:
+        """Whether a usable OpenAI API key (or custom endpoint) is configured."""
+        return llm_configured()
+
+    def llm_backed_sections(self, paper_structure: List[str], requirements: Dict[str, Any]) -> List[str]:
+        """Sections of a structure whose text comes from the LLM when it is available."""
+        batched = self._batched_sections(paper_structure, requirements)
+        return [name for name in paper_structure if name in LLM_SECTIONS or name in batched]
+
+    async def upgrade_sections(self, section_names: List[str], topic: str, summaries: Dict[str, Any],
+                               citations: Dict[str, Any], requirements: Dict[str, Any],
+                               sections: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Generate sections with the LLM, yielding each one as soon as it is done.
+
+        Used to upgrade the template sections of a progressive draft; `sections`
+        are the draft's current sections, read by dependent prompts.
+
+        Yields:
+            (section_name, section) pairs in completion order
+        """
+        requirements = {**requirements, 'progressive': False}
+        prompt_context = PromptContextBuilder(topic, summaries, model=self.llm_model)
+        context_token = _prompt_context.set(prompt_context)
+        try:
+            with cache_scope(requirements.get('llm_cache')):
+                async for event, payload in stream_generation_events(
+                    self._generate_sections(section_names, topic, summaries, citations, requirements, sections)
+                ):
+                    if event == SECTION_COMPLETE:
+                        section = dict(payload)
+                        yield section.pop('name'), section
+        finally:
+            _prompt_context.reset(context_token)
+
+    async def regenerate_section(self, section_name: str, topic: str, summaries: Dict[str, Any],
+                                 citations: Dict[str, Any], requirements: Dict[str, Any],
+                                 sections: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Generate a single section again from a finished pipeline's artifacts.
+
+        Unless requirements['llm_cache'] says otherwise, the cached completion is
+        skipped (and replaced) so the section actually changes.
+
+        Args:
+            section_name: Name of the section to regenerate
+            topic: Research topic
+            summaries: Paper summaries
+            citations: Citation data
+            requirements: Paper requirements
+            sections: The draft's current sections, read by dependent prompts
+
+        Returns:
+            The new section ({'title', 'content', 'word_count', ...})
+        """
+        if not self.has_section(section_name, requirements):
+            raise ValueError(f"Unknown section: {section_name}")
+
+        prompt_context = PromptContextBuilder(topic, summaries, model=self.llm_model)
+        context_token = _prompt_context.set(prompt_context)
+        sections_token = _draft_sections.set(dict(sections or {}))
+        try:
+            with cache_scope(requirements.get('llm_cache', 'refresh')):
+                # Run as a task so the section label stays out of the caller's context
+                return await asyncio.create_task(
+                    self._generate_section(section_name, topic, summaries, citations, requirements)
+                )
+        finally:
+            _draft_sections.reset(sections_token)
+            _prompt_context.reset(context_token)
+
+    async def _generate_sections(self, paper_structure: List[str], topic: str, summaries: Dict[str, Any],
+                               citations: Dict[str, Any], requirements: Dict[str, Any],
+                               sections: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Generate sections as a dependency graph.
+        
+        Each section starts as soon as the sections it depends on are done, so
+        a draft takes as long as its critical path rather than the sum of all
+        sections; the LLM semaphore bounds how many calls run at once. Batched
+        sections share one structured LLM call, started up front. Dependent
+        sections read the text written before them (and `sections`, existing
+        text of sections not regenerated here) through _draft_sections.
+        
+        Returns:
+            Sections keyed by name, in paper_structure order
+        """
+        names = [name for name in paper_structure if self.has_section(name, requirements)]
+        sorter = TopologicalSorter(self._section_dependency_graph(names))
+        sorter.prepare()
+        
+        batch_names = self._batched_sections(names, requirements)
+        batch = None
+        if batch_names:
+            batch = asyncio.create_task(self._generate_section_batch(batch_names, topic, summaries))
+        
+        # Section tasks copy the context, so they all see this dict as it fills up
+        generated: Dict[str, Any] = dict(sections or {})
+        for name in names:
+            generated.setdefault(name, None)  # keeps the body digest in paper order
+        sections_token = _draft_sections.set(generated)
+        running: Dict[asyncio.Task, str] = {}
+        
+        try:
+            while sorter.is_active():
+                for name in sorter.get_ready():
+                    task = asyncio.create_task(self._generate_section(
+                        name, topic, summaries, citations, requirements,
+                        batch=batch if name in batch_names else None
+                    ))
+                    running[task] = name
+                
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    generated[name] = task.result()
+                    sorter.done(name)
+        finally:
+            _draft_sections.reset(sections_token)
         
-        if paper_type == 'review_paper':
-            structure = [
-                'abstract',
-                'introduction',
-                'background',
-                'problem_statement',
-                'objectives',
-                'literature_review',
-                'methodology',
-                'experiments',
-                'results',
-                'evaluation',
-                'discussion',
-                'applications',
-                'conclusion',
-                'limitations',
-                'future_work',
-                'ethical_considerations',
-                'references',
-                'appendix'
-            ]
-        elif paper_type == 'methodology_paper':
-            structure = [
-                'abstract',
-                'introduction',
-                'background',
-                'problem_statement',
-                'objectives',
-                'literature_review',
-                'methodology',
-                'experiments',
-                'results',
-                'evaluation',
-                'discussion',
-                'applications',
-                'conclusion',
-                'limitations',
-                'future_work',
-                'ethical_considerations',
-                'references',
-                'appendix'
-            ]
-        else:  # research_paper
-            structure = [
-                'abstract',
-                'introduction',
-                'background',
-                'problem_statement',
-                'objectives',
-                'literature_review',
-                'methodology',
-                'experiments',
-                'results',
-                'evaluation',
-                'discussion',
-                'applications',
-                'conclusion',
-                'limitations',
-                'future_work',
-                'ethical_considerations',
-                'references',
-                'appendix'
-            ]
+        return {name: generated[name] for name in names}
+    
+    def _section_dependency_graph(self, names: List[str]) -> Dict[str, List[str]]:
+        """Dependencies of each section, restricted to the sections being generated."""
+        graph = {}
+        for name in names:
+            dependencies = SECTION_DEPENDENCIES.get(name, [])
+            if dependencies == '*':
+                dependencies = [other for other in names if other != name and SECTION_DEPENDENCIES.get(other) != '*']
+            graph[name] = [dependency for dependency in dependencies if dependency in names]
+        return graph
+    
+    def _batched_sections(self, names: List[str], requirements: Dict[str, Any]) -> List[str]:
+        """Sections to write in one structured call: utility sections, plus the LLM sections of short drafts."""
+        enabled = requirements.get('section_batching')
+        if enabled is None:
+            enabled = os.getenv('LLM_SECTION_BATCHING', 'true').lower() in ('1', 'true', 'yes')
+        if not enabled:
+            return []
         
-        # Adjust based on length
-        if length == 'short':
-            # Remove methodology and results for short papers
-            structure = [s for s in structure if s not in ['methodology', 'results', 'experiments', 'evaluation', 'applications', 'appendix']]
-        elif length == 'long':
-            # Ensure extensive coverage for long papers
-            # Keep full structure as defined above
-            pass
+        batchable = UTILITY_SECTIONS + (LLM_SECTIONS if requirements.get('length') == 'short' else ())
+        # The batch starts up front, so sections that read earlier sections get their own call
+        batch = [name for name in names if name in batchable and name not in SECTION_DEPENDENCIES]
+        return batch if len(batch) >= 2 else []
+    
+    async def _generate_section_batch(self, section_names: List[str], topic: str,
+                                      summaries: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Write several sections in one LLM call with a JSON response.
+        
+        Returns:
+            Section text keyed by name; sections missing from the response (or
+            all of them, if it cannot be parsed) are left to their own methods
+        """
+        try:
+            extras = [self._evidence('batch', topic)]
+            if 'literature_review' in section_names:
+                extras.append(('Thematic summary', summaries.get('thematic_summary', '')))
+            context = self._prompt_context(topic, summaries).context_for('batch', extras=extras)
+            specs = "\n".join(f'- "{name}": {SECTION_BATCH_SPECS[name][0]}' for name in section_names)
+            max_tokens = sum(SECTION_BATCH_SPECS[name][1] for name in section_names) + 50
+            
+            prompt = f"""{context}
+
+Write the following sections of a research paper on "{topic}":
+{specs}
+
+Requirements:
+- Use citation placeholders [1], [2], [3], etc. where references should appear
+- Maintain formal academic tone
+- Do not repeat the section headings inside the text
+
+Respond with a JSON object mapping each section name above to its text, e.g. {{"{section_names[0]}": "..."}}"""
+
+            response = await self._generate_with_llm(
+                prompt, max_tokens=max_tokens, response_format={"type": "json_object"}
+            )
+            if not response:
+                return {}
+            
+            parsed = json.loads(response)
+            if isinstance(parsed.get('sections'), dict):
+                parsed = parsed['sections']
+            return {
+                name: parsed[name].strip() for name in section_names
+                if isinstance(parsed.get(name), str) and parsed[name].strip()
+            }
+            
+        except Exception as e:
+            self.logger.warning(f"Error generating section batch, using per-section generation: {str(e)}")
+            return {}
+    
+    async def _generate_section(self, section_name: str, topic: str, summaries: Dict[str, Any],
+                              citations: Dict[str, Any], requirements: Dict[str, Any],
+                              batch: Optional[Awaitable[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """Generate one section, falling back to placeholder content on error."""
+        # Each section runs in its own task, so this only labels this section's LLM calls
+        _current_section.set(section_name)
+        llm_wrote = [False]
+        _llm_wrote.set(llm_wrote)
+        try:
+            # Batched sections take their text from the shared call when it produced it
+            section_content = (await batch).get(section_name) if batch is not None else None
+            llm_wrote[0] = bool(section_content)
+            if not section_content and batch is not None and current_recorder() is not None:
+                # The shared call is queued in a bulk batch file; don't queue this section's own prompt too
+                _llm_disabled.set(True)
+            if not section_content and section_name in self.sections:
+                section_content = await self.sections[section_name](
+                    topic, summaries, citations, requirements
+                )
+            elif not section_content:
+                # Custom sections of a template set have no method of their own
+                section_content = self._render_template(section_name, topic, summaries, requirements)
+            # Ensure we have a proper section structure
+            if isinstance(section_content, str):
+                section = {
+                    'title': section_name.replace('_', ' ').title(),
+                    'content': section_content,
+                    'word_count': len(section_content.split())
+                }
+            else:
+                section = section_content
+        except Exception as e:
+            self.logger.error(f"Error generating {section_name}: {str(e)}")
+            section = {
+                'title': section_name.replace('_', ' ').title(),
+                'content': f"Content for {section_name.replace('_', ' ')} will be generated based on the research findings and analysis.",
+                'word_count': 20
+            }
+            llm_wrote[0] = False
+        # 'llm' only when the text came from a completion, not a template fallback
+        section.setdefault('source', 'llm' if llm_wrote[0] else 'template')
         
-        return structure
+        queue = _stream_queue.get()
+        if queue is not None:
+            queue.put_nowait((SECTION_COMPLETE, {'name': section_name, **section}))
+        return section
+    
+    def _determine_paper_structure(self, requirements: Dict[str, Any]) -> List[str]:
+        """Determine the structure of the paper from its template set and length."""
+        return self._section_templates(requirements).structure_for(requirements.get('length', 'medium'))
+    
+    def _section_templates(self, requirements: Dict[str, Any]) -> SectionTemplates:
+        """Template set of a draft: requirements['template'] (ID, name or inline set) or the default."""
+        return get_section_templates(requirements.get('template'))
+    
+    def _render_template(self, section_name: str, topic: str, summaries: Dict[str, Any],
+                         requirements: Dict[str, Any]) -> str:
+        """Fallback text of a section from the draft's template set."""
+        # The render context is built once per draft and shared by its sections
+        cached = self._template_context
+        if cached is None or cached[0] is not summaries or cached[1] != topic:
+            cached = self._template_context = (summaries, topic, build_context(topic, summaries))
+        return self._section_templates(requirements).render(section_name, cached[2])
+    
+    def has_section(self, section_name: str, requirements: Dict[str, Any]) -> bool:
+        """Whether a section can be generated: it has a method or a template."""
+        return section_name in self.sections or self._section_templates(requirements).has(section_name)
     
     async def _generate_title(self, topic: str, summaries: Dict[str, Any]) -> str:
         """Generate an appropriate title for the paper."""
@@ -217,68 +526,191 @@ class PaperGeneratorAgent:
             self.logger.error(f"Error generating title: {str(e)}")
             return f"Research on {topic}"
     
-    async def _generate_with_llm(self, prompt: str, max_tokens: int = 1000) -> str:
+    def _prompt_context(self, topic: str, summaries: Dict[str, Any]) -> PromptContextBuilder:
+        """Research context of the draft being generated, or a fresh one outside generate_draft."""
+        prompt_context = _prompt_context.get()
+        if prompt_context is None or prompt_context.summaries is not summaries:
+            prompt_context = PromptContextBuilder(topic, summaries, model=self.llm_model)
+        return prompt_context
+    
+    def _evidence(self, section: str, topic: str) -> Tuple[str, str]:
+        """The source passages most relevant to a section, numbered like its citation placeholders."""
+        if self.passage_index is None:
+            return 'Relevant evidence', ''
+        
+        query = f"{topic} {SECTION_EVIDENCE_QUERIES.get(section, '')}"
+        passages = self.passage_index.search(query, k=self.evidence_passages)
+        lines = [f"[{passage['citation']}] {passage['text']}" for passage in passages]
+        return 'Relevant evidence (cite by its number)', "\n".join(lines)
+    
+    def _written_section(self, name: str) -> str:
+        """Text of a section already written in this draft, without headings ('' if none)."""
+        section = (_draft_sections.get() or {}).get(name)
+        content = section.get('content', '') if isinstance(section, dict) else section
+        return "\n".join(line for line in str(content or '').splitlines()
+                         if line.strip() and not line.lstrip().startswith('#'))
+    
+    def _body_digest(self, sentences: int = 2) -> str:
+        """Opening sentences of each body section written so far, one line per section."""
+        lines = []
+        for name in _draft_sections.get() or {}:
+            if name in ('abstract', 'references'):
+                continue
+            text = ' '.join(self._written_section(name).split())
+            if text:
+                lead = ' '.join(_SENTENCE_END.split(text)[:sentences])
+                lines.append(f"{name.replace('_', ' ').title()}: {lead}")
+        return "\n".join(lines)
+    
+    async def _generate_with_llm(self, prompt: str, max_tokens: int = 1000,
+                                 response_format: Optional[Dict[str, Any]] = None) -> str:
         """Generate content using LLM with fallback to template-based generation."""
         try:
+            if _llm_disabled.get():
+                return ""  # Template draft of progressive mode
+            
+            # Bulk mode collects prompts into a batch file instead of calling the API
+            recorder = current_recorder()
+            
             # Check if OpenAI API key is available
-            openai_key = os.getenv('OPENAI_API_KEY', '')
-            if not openai_key or openai_key == 'sk-your-openai-key-here':
+            if recorder is None and not self.llm_available:
                 self.logger.info("No valid OpenAI API key - using template-based generation")
                 return ""  # Return empty to trigger fallback
-                
-            response = await self.openai_client.chat.completions.create(
-                model=self.llm_model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert academic writer specializing in research paper generation. Always include citation placeholders [1], [2], [3], etc. where references should appear. Use proper academic tone and structure."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=max_tokens,
-                temperature=0.7
-            )
             
-            content = response.choices[0].message.content
-            return content.strip() if content else ""
+            prompt_context = _prompt_context.get()
+            if prompt_context is not None:
+                prompt_context.record_prompt(_current_section.get(), prompt, SYSTEM_PROMPT)
+                
+            cache_key = None
+            if self.llm_cache is not None:
+                cache_key = self.llm_cache.make_key(self.llm_model, SYSTEM_PROMPT, prompt, max_tokens, self.llm_temperature)
+                cached = self.llm_cache.get(cache_key)
+                if cached is not None:
+                    self._emit_delta(cached)
+                    self._mark_llm_text(cached)
+                    return cached
+            
+            if recorder is not None:
+                # Batch responses are loaded into the cache under the same key
+                recorder.add(
+                    cache_key or LLMResponseCache.make_key(self.llm_model, SYSTEM_PROMPT, prompt, max_tokens, self.llm_temperature),
+                    self._chat_request(prompt, max_tokens, response_format)
+                )
+                return ""
+            
+            async def request(slot):
+                if _stream_queue.get() is not None and _current_section.get() is not None:
+                    content, usage = await self._stream_completion(prompt, max_tokens)
+                else:
+                    content, usage = await self._complete(prompt, max_tokens, response_format)
+                slot.record_usage(usage)
+                return content, usage
+            
+            async with self.llm_semaphore:
+                content, usage = await self.llm_scheduler.run(
+                    request, estimate_request_tokens(SYSTEM_PROMPT, prompt, max_tokens=max_tokens)
+                )
+            
+            content = content.strip() if content else ""
+            
+            if cache_key is not None and content:
+                self.llm_cache.put(
+                    cache_key, self.llm_model, content,
+                    prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+                    completion_tokens=getattr(usage, 'completion_tokens', 0) or 0
+                )
+            self._mark_llm_text(content)
+            return content
             
         except Exception as e:
             self.logger.error(f"Error generating content with LLM: {str(e)}")
             return ""  # Return empty to trigger fallback instead of error message
 
+    @staticmethod
+    def _mark_llm_text(content: str):
+        """Record that the current section task got text from the LLM."""
+        llm_wrote = _llm_wrote.get()
+        if llm_wrote is not None and content:
+            llm_wrote[0] = True
+
+    def _chat_request(self, prompt: str, max_tokens: int,
+                      response_format: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Chat completion parameters for a section prompt."""
+        request = {
+            'model': self.llm_model,
+            'messages': [
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            'max_tokens': max_tokens,
+            'temperature': self.llm_temperature
+        }
+        if response_format:
+            request['response_format'] = response_format
+        return request
+
+    async def _complete(self, prompt: str, max_tokens: int,
+                        response_format: Optional[Dict[str, Any]] = None) -> Tuple[str, Any]:
+        """Request a completion in one response."""
+        response = await self.openai_client.chat.completions.create(
+            **self._chat_request(prompt, max_tokens, response_format)
+        )
+        return response.choices[0].message.content, getattr(response, 'usage', None)
+
+    async def _stream_completion(self, prompt: str, max_tokens: int) -> Tuple[str, Any]:
+        """Stream a completion, forwarding each text delta to the active stream consumer."""
+        request = dict(self._chat_request(prompt, max_tokens), stream=True)
+        try:
+            stream = await self.openai_client.chat.completions.create(
+                **request, stream_options={"include_usage": True}
+            )
+        except TypeError:
+            # SDKs before openai 1.26 have no stream_options; usage is estimated below
+            stream = await self.openai_client.chat.completions.create(**request)
+        
+        parts = []
+        usage = None
+        async for chunk in stream:
+            if chunk.choices:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    self._emit_delta(delta)
+            if getattr(chunk, 'usage', None):
+                usage = chunk.usage
+        
+        content = ''.join(parts)
+        if usage is None:
+            usage = estimate_request_tokens(SYSTEM_PROMPT, prompt, content)
+        return content, usage
+    
+    def _emit_delta(self, delta: str):
+        """Send a text delta of the current section to the stream consumer, if any."""
+        queue = _stream_queue.get()
+        section = _current_section.get()
+        if queue is not None and section is not None:
+            queue.put_nowait((section, delta))
+    
     async def _generate_abstract(self, topic: str, summaries: Dict[str, Any], 
                                citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         """Generate the abstract section using LLM."""
         try:
-            # Prepare context for LLM
-            key_findings = summaries.get('key_findings', [])
-            methodology_summary = summaries.get('methodology_summary', {})
-            gaps = summaries.get('gaps_and_opportunities', [])
-            
-            # Build context string
-            context_parts = [f"Research topic: {topic}"]
-            
-            if key_findings:
-                findings_text = "\n".join([f"- {f.get('finding', '')}" for f in key_findings[:5]])
-                context_parts.append(f"Key findings:\n{findings_text}")
-            
-            if methodology_summary:
-                methodologies = list(methodology_summary.keys())
-                context_parts.append(f"Methodologies analyzed: {', '.join(methodologies)}")
-            
-            if gaps:
-                gaps_text = "\n".join([f"- {gap}" for gap in gaps[:3]])
-                context_parts.append(f"Research gaps identified:\n{gaps_text}")
-            
-            context = "\n\n".join(context_parts)
+            # Shared research context first, so every section prompt starts the same
+            # The abstract is written after the body, so it summarizes the actual draft
+            context = self._prompt_context(topic, summaries).context_for(
+                'abstract', extras=[('Paper body (opening of each section)', self._body_digest()),
+                                    self._evidence('abstract', topic)]
+            )
             
-            prompt = f"""Write a comprehensive, professional abstract for a research paper on "{topic}". 
+            prompt = f"""{context}
 
-Context:
-{context}
+Write a comprehensive, professional abstract for a research paper on "{topic}", summarizing the paper body above.
 
 Requirements:
 - 250-400 words (substantial and comprehensive)
@@ -295,28 +727,7 @@ Abstract:"""
             
             # Enhanced fallback if LLM fails
             if not abstract or "Error" in abstract:
-                abstract_parts = []
-                abstract_parts.append(f"This comprehensive systematic review presents a rigorous analysis of the current state of research in {topic}, synthesizing findings from multiple high-quality studies to advance theoretical understanding and identify critical directions for future investigation [1, 2].")
-                
-                abstract_parts.append(f"The research employed a multi-phase methodology incorporating systematic literature search, quality assessment, and thematic synthesis to ensure comprehensive coverage of the domain [3, 4].")
-                
-                if key_findings:
-                    findings_text = "; ".join([f.get('finding', '') for f in key_findings[:4]])
-                    abstract_parts.append(f"Principal findings reveal significant advances across multiple dimensions: {findings_text} [5, 6, 7, 8].")
-                
-                methodology_summary = summaries.get('methodology_summary', {})
-                if methodology_summary:
-                    methodologies = list(methodology_summary.keys())
-                    if methodologies:
-                        abstract_parts.append(f"Methodological analysis demonstrates the prevalence of {', '.join(methodologies[:3])} approaches, highlighting both convergent trends and emerging innovations in research design [9, 10, 11].")
-                
-                gaps = summaries.get('gaps_and_opportunities', [])
-                if gaps:
-                    abstract_parts.append(f"The analysis identifies {len(gaps)} critical research gaps that represent high-priority areas for future investigation, offering substantial opportunities for theoretical advancement and practical application [12, 13].")
-                
-                abstract_parts.append(f"These findings contribute significantly to the theoretical foundation of {topic} and provide actionable insights for researchers, practitioners, and policymakers seeking to advance the field through evidence-based approaches [14, 15].")
-                
-                abstract = " ".join(abstract_parts)
+                abstract = self._render_template('abstract', topic, summaries, requirements)
             
             return abstract
             
@@ -328,32 +739,14 @@ Abstract:"""
                                    citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         """Generate the introduction section using LLM."""
         try:
-            # Prepare context with real paper data
-            gaps = summaries.get('gaps_and_opportunities', [])
-            key_findings = summaries.get('key_findings', [])
-            individual_summaries = summaries.get('individual_summaries', [])
-            
-            context_parts = [f"Research topic: {topic}"]
-            
-            # Include real paper titles and findings
-            if individual_summaries:
-                paper_titles = [summary.get('title', '') for summary in individual_summaries[:5]]
-                context_parts.append(f"Recent research includes: {'; '.join(paper_titles)}")
-            
-            if gaps:
-                gaps_text = "\n".join([f"- {gap}" for gap in gaps[:3]])
-                context_parts.append(f"Research gaps identified:\n{gaps_text}")
-            
-            if key_findings:
-                findings_text = "\n".join([f"- {f.get('finding', '')}" for f in key_findings[:3]])
-                context_parts.append(f"Key findings from literature:\n{findings_text}")
-            
-            context = "\n\n".join(context_parts)
+            # Shared context already lists recent paper titles, gaps and findings
+            context = self._prompt_context(topic, summaries).context_for(
+                'introduction', extras=[self._evidence('introduction', topic)]
+            )
             
-            prompt = f"""Write a comprehensive introduction section for a research paper on "{topic}".
+            prompt = f"""{context}
 
-Context:
-{context}
+Write a comprehensive introduction section for a research paper on "{topic}".
 
 Requirements:
 - 400-600 words
@@ -369,21 +762,7 @@ Introduction:"""
             
             # Enhanced fallback with real context
             if not introduction:
-                introduction_parts = []
-                introduction_parts.append(f"{topic} has emerged as a transformative area of research with profound implications across multiple domains, fundamentally reshaping our understanding of complex systems and their applications [1, 2]. The rapid advancement of computational capabilities, coupled with the exponential growth of available data, has created unprecedented opportunities for innovation and discovery in this field.")
-                
-                if individual_summaries:
-                    paper_count = len(individual_summaries)
-                    introduction_parts.append(f"Recent literature analysis reveals a substantial body of work comprising {paper_count} high-quality studies that collectively demonstrate the maturation of {topic} as a scientific discipline [3, 4]. These investigations span diverse methodological approaches and application domains, establishing a robust foundation for continued advancement.")
-                
-                if gaps:
-                    introduction_parts.append(f"Despite significant progress, critical challenges persist in our comprehensive understanding of {topic}, particularly regarding scalability, generalizability, and real-world implementation [5, 6]. These limitations present substantial opportunities for methodological innovation and theoretical advancement.")
-                
-                introduction_parts.append(f"This comprehensive analysis aims to synthesize current knowledge in {topic}, identify emerging trends and patterns, evaluate methodological approaches, and establish a roadmap for future research directions [7, 8]. Through systematic examination of contemporary literature, we seek to advance theoretical understanding while providing practical insights for researchers and practitioners.")
-                
-                introduction_parts.append("The structure of this paper is organized as follows: Section 2 provides essential background and theoretical foundations, Section 3 presents the problem statement and research objectives, Section 4 offers a comprehensive literature review, Section 5 details the research methodology, Section 6 presents experimental results and evaluation, Section 7 discusses implications and applications, and Section 8 concludes with limitations and future research directions.")
-                
-                introduction = "\n\n".join(introduction_parts)
+                introduction = self._render_template('introduction', topic, summaries, requirements)
             
             return introduction
             
@@ -397,28 +776,15 @@ Introduction:"""
         try:
             # Prepare context
             thematic_summary = summaries.get('thematic_summary', '')
-            key_findings = summaries.get('key_findings', [])
-            methodology_summary = summaries.get('methodology_summary', {})
-            
-            context_parts = [f"Research topic: {topic}"]
-            
-            if thematic_summary:
-                context_parts.append(f"Thematic summary:\n{thematic_summary}")
-            
-            if key_findings:
-                findings_text = "\n".join([f"- {f.get('finding', '')}" for f in key_findings[:5]])
-                context_parts.append(f"Key findings from literature:\n{findings_text}")
             
-            if methodology_summary:
-                methods_text = "\n".join([f"- {method}: {len(papers)} papers" for method, papers in methodology_summary.items() if papers])
-                context_parts.append(f"Methodologies used in literature:\n{methods_text}")
-            
-            context = "\n\n".join(context_parts)
+            # The thematic summary is only needed here; it is trimmed to this section's budget
+            context = self._prompt_context(topic, summaries).context_for(
+                'literature_review', extras=[self._evidence('literature_review', topic), ('Thematic summary', thematic_summary)]
+            )
             
-            prompt = f"""Write a comprehensive literature review section for a research paper on "{topic}".
+            prompt = f"""{context}
 
-Context:
-{context}
+Write a comprehensive literature review section for a research paper on "{topic}".
 
 Requirements:
 - 800-1200 words
@@ -434,29 +800,7 @@ Literature Review:"""
             
             # Fallback if LLM fails
             if not literature_review or "Error" in literature_review:
-                review_parts = []
-                
-                review_parts.append("## Current State of Research")
-                if thematic_summary:
-                    review_parts.append(thematic_summary)
-                else:
-                    review_parts.append(f"Current research on {topic} spans multiple methodologies and approaches [1, 2].")
-                
-                if key_findings:
-                    review_parts.append("\n## Key Findings")
-                    for i, finding in enumerate(key_findings[:5], 1):
-                        review_parts.append(f"{i}. {finding.get('finding', '')} [{i+2}]")
-                
-                if methodology_summary:
-                    review_parts.append("\n## Methodological Approaches")
-                    for method_type, papers in methodology_summary.items():
-                        if papers:
-                            review_parts.append(f"### {method_type.title()}")
-                            review_parts.append(f"Several studies have employed {method_type} approaches, including:")
-                            for j, paper in enumerate(papers[:3]):
-                                review_parts.append(f"- {paper.get('title', 'Unknown')} [{j+8}]")
-                
-                literature_review = "\n\n".join(review_parts)
+                literature_review = self._render_template('literature_review', topic, summaries, requirements)
             
             return literature_review
             
@@ -467,288 +811,130 @@ Literature Review:"""
     async def _generate_background(self, topic: str, summaries: Dict[str, Any], 
                                    citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         try:
-            parts = []
-            parts.append("## Background")
-            parts.append(f"The field of {topic} has witnessed remarkable evolution over the past decades, emerging as a critical area of scientific inquiry with profound implications for multiple disciplines [1, 2]. Understanding the historical trajectory and conceptual foundations of this domain is essential for contextualizing current research efforts and identifying future directions.")
-            
-            thematic = summaries.get('thematic_summary')
-            if thematic:
-                parts.append("### Historical Development")
-                parts.append(f"The development of {topic} can be traced through several distinct phases, each characterized by significant theoretical advances and methodological innovations [3, 4]. {thematic}")
-                parts.append("Early pioneering work established fundamental principles that continue to guide contemporary research, while recent technological advances have opened new avenues for investigation and application [5, 6].")
-            
-            parts.append("### Theoretical Foundations")
-            parts.append(f"The theoretical underpinnings of {topic} draw from diverse disciplinary perspectives, creating a rich conceptual framework that encompasses both fundamental principles and applied methodologies [7, 8]. This interdisciplinary nature has been instrumental in driving innovation and fostering collaborative research efforts across traditional academic boundaries.")
-            
-            parts.append("### Contemporary Relevance")
-            parts.append(f"In the current research landscape, {topic} occupies a position of increasing prominence due to its potential to address pressing societal challenges and advance scientific understanding [9, 10]. The convergence of technological capabilities, theoretical insights, and practical applications has created unprecedented opportunities for breakthrough discoveries and transformative innovations.")
-            
-            return "\n\n".join(parts)
+            return self._render_template('background', topic, summaries, requirements)
         except Exception:
             return f"Background information establishes the comprehensive context of {topic} and its multifaceted significance in contemporary research [1]."
 
     async def _generate_problem_statement(self, topic: str, summaries: Dict[str, Any], 
                                           citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         try:
-            gaps = summaries.get('gaps_and_opportunities', [])
-            parts = ["## Problem Statement"]
-            parts.append(f"Despite increasing attention, critical challenges in {topic} remain insufficiently addressed [1, 2].")
-            if gaps:
-                parts.append("The key problems can be summarized as:")
-                for i, gap in enumerate(gaps[:5], 1):
-                    parts.append(f"{i}. {gap} [{i+2}]")
-            return "\n\n".join(parts)
+            return self._render_template('problem_statement', topic, summaries, requirements)
         except Exception:
             return f"Key challenges in {topic} are outlined to guide the study [1]."
 
     async def _generate_objectives(self, topic: str, summaries: Dict[str, Any], 
                                    citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         try:
-            parts = ["## Objectives"]
-            parts.append("This paper pursues the following objectives:")
-            parts.append("1. Synthesize current knowledge and identify gaps [1]")
-            parts.append("2. Analyze methodological trends and limitations [2]")
-            parts.append("3. Propose actionable directions for future research [3]")
-            return "\n\n".join(parts)
+            return self._render_template('objectives', topic, summaries, requirements)
         except Exception:
             return "This study outlines clear objectives to guide the analysis [1]."
 
     async def _generate_experiments(self, topic: str, summaries: Dict[str, Any], 
                                     citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         try:
-            parts = ["## Experiments"]
-            parts.append("We design experiments to evaluate the stated research objectives using representative datasets and protocols.")
-            parts.append("### Datasets")
-            parts.append("Publicly available datasets were selected based on relevance and quality criteria [1].")
-            parts.append("### Experimental Setup")
-            parts.append("Experiments were conducted under controlled conditions with reproducible configurations.")
-            parts.append("### Metrics")
-            parts.append("Evaluation metrics include accuracy, precision/recall, F1-score, and ablation-based sensitivity analyses.")
-            return "\n\n".join(parts)
+            return self._render_template('experiments', topic, summaries, requirements)
         except Exception:
             return "Experiments were designed to test the approach under standardized conditions."
 
     async def _generate_evaluation(self, topic: str, summaries: Dict[str, Any], 
                                    citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         try:
-            parts = ["## Evaluation"]
-            parts.append("This section presents a critical evaluation of results, including robustness checks and error analysis.")
-            parts.append("### Quantitative Results")
-            parts.append("Performance metrics indicate competitive results relative to baselines [1, 2].")
-            parts.append("### Qualitative Analysis")
-            parts.append("Case studies highlight strengths and failure modes with practical implications.")
-            parts.append("### Ablation Studies")
-            parts.append("Ablation experiments isolate the contribution of key components to overall performance.")
-            return "\n\n".join(parts)
+            return self._render_template('evaluation', topic, summaries, requirements)
         except Exception:
             return "Results are evaluated quantitatively and qualitatively with ablation analyses."
 
     async def _generate_applications(self, topic: str, summaries: Dict[str, Any], 
                                      citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         try:
-            parts = ["## Applications"]
-            parts.append(f"We discuss practical applications of {topic} across domains such as healthcare, education, and industry [1, 2].")
-            parts.append("### Case Examples")
-            parts.append("- Deployment in real-world pipelines\n- Integration with decision support systems\n- Socio-technical considerations")
-            return "\n\n".join(parts)
+            return self._render_template('applications', topic, summaries, requirements)
         except Exception:
             return f"Applications of {topic} span multiple domains [1]."
 
     async def _generate_limitations(self, topic: str, summaries: Dict[str, Any], 
                                     citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         try:
-            parts = ["## Limitations"]
-            parts.append("This work faces limitations related to data availability, generalizability, and evaluation scope [1].")
-            parts.append("We also note potential biases in the literature sample and reporting practices.")
-            return "\n\n".join(parts)
+            return self._render_template('limitations', topic, summaries, requirements)
         except Exception:
             return "We acknowledge limitations in scope, data, and evaluation [1]."
 
     async def _generate_future_work(self, topic: str, summaries: Dict[str, Any], 
                                     citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         try:
-            parts = ["## Future Work"]
-            parts.append("Future research directions include:")
-            parts.append("1. Larger-scale evaluations across diverse contexts [1]")
-            parts.append("2. Improved methods for fairness, interpretability, and robustness [2]")
-            parts.append("3. Standardized benchmarks and open datasets [3]")
-            return "\n\n".join(parts)
+            return self._render_template('future_work', topic, summaries, requirements)
         except Exception:
             return "Future work includes scaling, robustness, and benchmark development [1]."
 
     async def _generate_ethics(self, topic: str, summaries: Dict[str, Any], 
                                citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         try:
-            parts = ["## Ethical Considerations"]
-            parts.append("We consider privacy, fairness, transparency, and potential misuse risks associated with this research [1, 2].")
-            parts.append("Mitigations include data governance, bias audits, and stakeholder engagement.")
-            return "\n\n".join(parts)
+            return self._render_template('ethical_considerations', topic, summaries, requirements)
         except Exception:
             return "Ethical considerations include privacy, fairness, and safe deployment [1]."
 
     async def _generate_appendix(self, topic: str, summaries: Dict[str, Any], 
                                  citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         try:
-            parts = ["## Appendix"]
-            parts.append("Additional tables, figures, and implementation details are provided for reproducibility.")
-            return "\n\n".join(parts)
+            return self._render_template('appendix', topic, summaries, requirements)
         except Exception:
             return "Appendix includes supplementary material to support reproducibility."
-    
+
     async def _generate_methodology(self, topic: str, summaries: Dict[str, Any], 
-                                  citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
+                                    citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         """Generate the methodology section."""
         try:
-            methodology_parts = []
-            
-            methodology_parts.append("## Research Methodology")
-            methodology_parts.append(f"This comprehensive study employed a rigorous, multi-phase methodology to systematically analyze the current state of research in {topic} and identify key trends, patterns, and opportunities for future investigation [1, 2]. The methodology was designed to ensure reproducibility, minimize bias, and maximize the validity of findings through the integration of both quantitative and qualitative analytical approaches.")
-            
-            # Research Design
-            methodology_parts.append("### Research Design")
-            methodology_parts.append("A systematic literature review approach was adopted, following established guidelines for comprehensive evidence synthesis [3, 4]. The research design incorporated multiple validation stages to ensure methodological rigor and reliability of results. The study protocol was developed a priori and registered to minimize selection bias and enhance transparency of the research process.")
-            
-            # Data Collection Strategy
-            methodology_parts.append("### Data Collection Strategy")
-            methodology_parts.append("A comprehensive search strategy was implemented across multiple premier academic databases, including PubMed, IEEE Xplore, ACM Digital Library, Scopus, and Web of Science [5, 6]. The search encompassed publications from the past decade to capture contemporary developments while maintaining historical context. Boolean search operators and MeSH terms were employed to maximize sensitivity and specificity of the retrieval process.")
-            
-            methodology_parts.append("#### Search Terms and Criteria")
-            methodology_parts.append(f"Primary search terms included '{topic}' and related synonyms, combined with domain-specific terminology to ensure comprehensive coverage [7]. Inclusion criteria were established based on relevance, methodological quality, and publication in peer-reviewed venues. Exclusion criteria eliminated duplicate publications, non-English articles, and studies with insufficient methodological detail.")
-            
-            # Analysis Framework
-            methodology_parts.append("### Analysis Framework")
-            methodology_parts.append("The analytical framework integrated both quantitative bibliometric analysis and qualitative thematic synthesis [8, 9]. Quantitative measures included citation analysis, co-authorship networks, and temporal trend identification. Qualitative analysis employed systematic coding procedures to identify recurring themes, methodological approaches, and research gaps.")
-            
-            methodology_parts.append("#### Quality Assessment")
-            methodology_parts.append("Each included study underwent rigorous quality assessment using standardized evaluation criteria adapted from established frameworks [10, 11]. Assessment dimensions included methodological rigor, statistical validity, reproducibility, and contribution to theoretical understanding. Inter-rater reliability was maintained through independent evaluation by multiple researchers with subsequent consensus resolution.")
-            
-            # Data Synthesis
-            methodology_parts.append("### Data Synthesis and Integration")
-            methodology_parts.append("Data synthesis employed a convergent mixed-methods approach, allowing for triangulation of quantitative patterns with qualitative insights [12, 13]. Statistical analysis included descriptive statistics, trend analysis, and correlation assessment. Qualitative synthesis utilized thematic analysis to identify overarching patterns and emergent themes across the literature corpus.")
-            
-            return "\n\n".join(methodology_parts)
-            
+            return self._render_template('methodology', topic, summaries, requirements)
         except Exception as e:
             self.logger.error(f"Error generating methodology: {str(e)}")
             return "A comprehensive, multi-phase methodology was employed to systematically analyze the research literature with rigorous quality controls and validation procedures."
-    
+
     async def _generate_results(self, topic: str, summaries: Dict[str, Any], 
-                              citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
+                                citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         """Generate the results section."""
         try:
-            results_parts = []
-            
-            results_parts.append("## Results")
-            results_parts.append(f"The comprehensive analysis of the {topic} literature yielded substantial insights into current research trends, methodological approaches, and emerging patterns within the field [1, 2]. This section presents the key findings organized thematically to provide a systematic overview of the research landscape and its evolution over time.")
-            
-            # Literature Corpus Overview
-            individual_summaries = summaries.get('individual_summaries', [])
-            results_parts.append("### Literature Corpus Characteristics")
-            results_parts.append(f"The systematic search and screening process resulted in the inclusion of {len(individual_summaries)} high-quality peer-reviewed publications that met the established inclusion criteria [3]. The temporal distribution of these publications reveals a marked increase in research activity over the past five years, indicating growing scholarly interest and investment in this domain.")
-            
-            results_parts.append("#### Publication Trends and Patterns")
-            results_parts.append(f"Temporal analysis of the literature corpus demonstrates a consistent upward trajectory in publication volume, with the most recent three-year period accounting for approximately 60% of all identified studies [4, 5]. This trend reflects the accelerating pace of research and the increasing recognition of {topic} as a priority area for scientific investigation.")
-            
-            # Key Research Findings
-            key_findings = summaries.get('key_findings', [])
-            if key_findings:
-                results_parts.append("### Principal Research Findings")
-                results_parts.append(f"Analysis of the included studies revealed {len(key_findings)} major thematic areas that represent the core contributions of current research efforts [6, 7]. These findings demonstrate both the breadth of inquiry within the field and the convergence around key theoretical and methodological approaches.")
-                
-                for i, finding in enumerate(key_findings[:7], 1):
-                    finding_text = finding.get('finding', '')
-                    confidence = finding.get('confidence', 0.8)
-                    results_parts.append(f"#### Finding {i}: {finding_text}")
-                    results_parts.append(f"This finding was supported by multiple studies with high methodological rigor (confidence level: {confidence:.1%}) and represents a significant contribution to theoretical understanding [{i+7}].")
-            
-            # Methodological Landscape
-            methodology_summary = summaries.get('methodology_summary', {})
-            if methodology_summary:
-                results_parts.append("### Methodological Landscape Analysis")
-                results_parts.append("The methodological diversity within the literature reflects the interdisciplinary nature of the field and the variety of research questions being addressed [15, 16]. The following analysis provides insights into the predominant approaches and their relative prevalence.")
-                
-                results_parts.append("#### Methodological Distribution")
-                total_papers = sum(len(papers) for papers in methodology_summary.values() if papers)
-                for method_type, papers in methodology_summary.items():
-                    if papers:
-                        percentage = (len(papers) / max(total_papers, 1)) * 100
-                        results_parts.append(f"- **{method_type.title()} Approaches**: {len(papers)} studies ({percentage:.1f}%) - These studies primarily focused on {method_type} methodologies and contributed significantly to advancing practical applications [17].")
-            
-            # Research Quality and Impact
-            results_parts.append("### Research Quality and Impact Assessment")
-            results_parts.append("Quality assessment revealed that the majority of included studies (>85%) demonstrated high methodological rigor according to established evaluation criteria [18, 19]. Citation analysis indicates substantial impact within the academic community, with included studies receiving an average of 127 citations per publication, significantly exceeding field averages.")
-            
-            # Geographic and Institutional Distribution
-            results_parts.append("### Geographic and Institutional Distribution")
-            results_parts.append("The research landscape demonstrates global engagement with substantial contributions from institutions across North America (45%), Europe (32%), Asia-Pacific (18%), and other regions (5%) [20]. This geographic diversity enhances the generalizability of findings and reflects the universal relevance of the research domain.")
-            
-            return "\n\n".join(results_parts)
-            
+            return self._render_template('results', topic, summaries, requirements)
         except Exception as e:
             self.logger.error(f"Error generating results: {str(e)}")
             return "The comprehensive analysis revealed substantial insights into research trends, methodological approaches, and key findings within the literature."
-    
+
     async def _generate_discussion(self, topic: str, summaries: Dict[str, Any], 
-                                 citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
-        """Generate the discussion section."""
+                                   citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
+        """Generate the discussion section using LLM, interpreting the results section."""
         try:
-            discussion_parts = []
-            
-            discussion_parts.append("## Discussion")
-            discussion_parts.append("The analysis of current research reveals several important insights about the field.")
-            
-            # Implications
-            discussion_parts.append("\n### Implications")
-            discussion_parts.append("The findings suggest that while significant progress has been made, there are still areas that require further investigation.")
+            # Scheduled after the results section, which the prompt interprets
+            context = self._prompt_context(topic, summaries).context_for(
+                'discussion', extras=[('Results section', self._written_section('results')),
+                                      self._evidence('discussion', topic)]
+            )
             
-            # Limitations
-            gaps = summaries.get('gaps_and_opportunities', [])
-            if gaps:
-                discussion_parts.append("\n### Limitations and Gaps")
-                for gap in gaps[:3]:
-                    discussion_parts.append(f"- {gap}")
+            prompt = f"""{context}
+
+Write the discussion section of a research paper on "{topic}", interpreting the results section above.
+
+Requirements:
+- 400-500 words
+- Explain what the results mean, how they compare with prior work and what they imply
+- Use citation placeholders [1], [2], [3], etc. where references should appear
+- Maintain academic tone
+- Do not restate the results in full
+
+Discussion:"""
+
+            discussion = await self._generate_with_llm(prompt, max_tokens=650)
             
-            # Future directions
-            discussion_parts.append("\n### Future Directions")
-            discussion_parts.append("Based on the identified gaps, several areas present opportunities for future research:")
-            discussion_parts.append("1. Addressing methodological limitations in current studies")
-            discussion_parts.append("2. Exploring interdisciplinary approaches")
-            discussion_parts.append("3. Conducting longitudinal studies to understand long-term effects")
+            if not discussion:
+                discussion = self._render_template('discussion', topic, summaries, requirements)
             
-            return "\n\n".join(discussion_parts)
+            return discussion
             
         except Exception as e:
             self.logger.error(f"Error generating discussion: {str(e)}")
             return "The analysis provides valuable insights into the current state of research in this field."
-    
+
     async def _generate_conclusion(self, topic: str, summaries: Dict[str, Any], 
-                                 citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
+                                   citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         """Generate the conclusion section."""
         try:
-            conclusion_parts = []
-            
-            conclusion_parts.append("## Conclusion")
-            conclusion_parts.append(f"This comprehensive analysis of {topic} has revealed several key insights.")
-            
-            # Summary of findings
-            key_findings = summaries.get('key_findings', [])
-            if key_findings:
-                conclusion_parts.append("\n### Summary of Findings")
-                conclusion_parts.append("The research demonstrates that significant progress has been made in understanding various aspects of the field.")
-            
-            # Contributions
-            conclusion_parts.append("\n### Contributions")
-            conclusion_parts.append("This study contributes to the field by:")
-            conclusion_parts.append("1. Providing a comprehensive overview of current research")
-            conclusion_parts.append("2. Identifying key trends and patterns")
-            conclusion_parts.append("3. Highlighting areas for future investigation")
-            
-            # Final thoughts
-            conclusion_parts.append("\n### Final Thoughts")
-            conclusion_parts.append("As the field continues to evolve, it is important to build upon these findings and address the identified gaps through rigorous research and innovative approaches.")
-            
-            return "\n\n".join(conclusion_parts)
-            
+            return self._render_template('conclusion', topic, summaries, requirements)
         except Exception as e:
             self.logger.error(f"Error generating conclusion: {str(e)}")
             return f"This analysis provides valuable insights into {topic} and identifies opportunities for future research."
@@ -757,37 +943,11 @@ Literature Review:"""
                                  citations: Dict[str, Any], requirements: Dict[str, Any]) -> str:
         """Generate the references section."""
         try:
-            references_parts = []
-            
-            references_parts.append("## References")
-            
-            # Get bibliography
-            bibliography = citations.get('bibliography', [])
-            
-            if bibliography:
-                # Sort by relevance score
-                sorted_biblio = sorted(bibliography, key=lambda x: x.get('relevance_score', 0), reverse=True)
-                
-                for i, ref in enumerate(sorted_biblio[:20], 1):  # Limit to top 20 references
-                    authors = ref.get('authors', ['Unknown'])
-                    title = ref.get('title', 'Untitled')
-                    journal = ref.get('journal', '')
-                    year = ref.get('year', '')
-                    
-                    # Format reference
-                    if len(authors) == 1:
-                        author_str = authors[0]
-                    elif len(authors) <= 3:
-                        author_str = ', '.join(authors[:-1]) + ', & ' + authors[-1]
-                    else:
-                        author_str = ', '.join(authors[:2]) + ', et al.'
-                    
-                    reference = f"[{i}] {author_str}. ({year}). {title}. {journal}."
-                    references_parts.append(reference)
-            else:
-                references_parts.append("References will be populated from the analyzed papers.")
-            
-            return "\n\n".join(references_parts)
+            # The pipeline's reference list, numbered like the citation placeholders
+            reference_list = ReferenceList.from_citations(citations, citation_style=requirements.get('citation_style'))
+            if reference_list:
+                return reference_list.to_text()
+            return "## References\n\nReferences will be populated from the analyzed papers."
             
         except Exception as e:
             self.logger.error(f"Error generating references: {str(e)}")
@@ -11,6 +11,7 @@ import json
 import os
 from dataclasses import dataclass
 from dotenv import load_dotenv
+from services.paper_text import PaperTextCache
 
 # Load environment variables from multiple possible locations
 load_dotenv('.env')
@@ -34,8 +35,9 @@ class PaperMetadata:
 class RetrievalAgent:
     """Agent responsible for retrieving research papers from various sources."""
     
-    def __init__(self):
+    def __init__(self, text_cache: Optional[PaperTextCache] = None):
         self.logger = logging.getLogger(__name__)
+        self.text_cache = text_cache or PaperTextCache()
         self.api_keys = {
             'semantic_scholar': os.getenv('SEMANTIC_SCHOLAR_API_KEY', ''),
             'pubmed': os.getenv('PUBMED_API_KEY', ''),
@@ -780,13 +782,15 @@ class RetrievalAgent:
             try:
                 score = 0.0
                 
+                paper_text = self.text_cache.for_paper(paper)
+                
                 # Score based on title
-                title = str(paper.get('title', '')).lower()
+                title = paper_text.lower_title
                 title_matches = sum(1 for word in topic_words if word in title)
                 score += (title_matches / max(len(topic_words), 1)) * 0.4
                 
                 # Score based on abstract
-                abstract = str(paper.get('abstract', '')).lower()
+                abstract = paper_text.lower_abstract
                 abstract_matches = sum(1 for word in topic_words if word in abstract)
                 score += (abstract_matches / max(len(topic_words), 1)) * 0.3
                 
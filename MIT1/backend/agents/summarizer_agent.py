@@ -5,13 +5,40 @@ Summarizer agent for creating summaries of research papers.
 import asyncio
 from typing import List, Dict, Any, Optional
 import logging
+import os
+from services.paper_text import PaperTextCache
+from services.text_rank import TextRankSummarizer
+from services.theme_discovery import ThemeDiscovery
+from services.finding_clusters import FindingClusterer
+from services.pipeline_context import MemoKey, PipelineMemo, active_memo, memo_scope
+
+METHODOLOGY_SUMMARY: MemoKey[Dict[str, Any]] = MemoKey('summarizer.methodology_summary')
 
 class SummarizerAgent:
     """Agent responsible for summarizing research papers."""
     
-    def __init__(self):
+    def __init__(self, text_cache: Optional[PaperTextCache] = None, summary_mode: Optional[str] = None,
+                 memo: Optional[PipelineMemo] = None):
         self.logger = logging.getLogger(__name__)
+        self.text_cache = text_cache or PaperTextCache()
+        self.shared_memo = memo  # the pipeline's memo, shared with its other agents
         self.max_summary_length = 2000
+        self.text_rank = TextRankSummarizer()
+        self.theme_discovery = ThemeDiscovery()
+        self.finding_clusterer = FindingClusterer()
+        # 'extractive' (TextRank) or 'llm' (batched LLM calls with a content-hash cache)
+        self.summary_mode = (summary_mode or os.getenv('SUMMARIZER_MODE', 'extractive')).lower()
+        self.llm_summarizer = None
+        if self.summary_mode == 'llm':
+            from services.llm_summarizer import BatchLLMSummarizer
+            self.llm_summarizer = BatchLLMSummarizer()
+        # Corpora at least this large are summarized with the map-reduce engine
+        self.map_reduce_threshold = int(os.getenv('MAP_REDUCE_THRESHOLD', '1000'))
+
+    @property
+    def memo(self) -> PipelineMemo:
+        """Memo of the current call: the pipeline's when shared, else one per call."""
+        return active_memo()
     
     async def summarize_papers(self, papers: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -23,37 +50,80 @@ class SummarizerAgent:
         Returns:
             Dictionary containing various types of summaries
         """
-        try:
-            self.logger.info(f"Starting summarization of {len(papers)} papers")
-            
-            # Create different types of summaries
-            summaries = {
-                'individual_summaries': await self._create_individual_summaries(papers),
-                'thematic_summary': await self._create_thematic_summary(papers),
-                'key_findings': await self._extract_key_findings(papers),
-                'methodology_summary': await self._summarize_methodologies(papers),
-                'gaps_and_opportunities': await self._identify_gaps(papers)
-            }
-            
-            self.logger.info("Summarization completed successfully")
-            return summaries
-            
-        except Exception as e:
-            self.logger.error(f"Error in summarization: {str(e)}")
-            return {'error': str(e)}
+        with memo_scope(self.shared_memo):
+            try:
+                self.logger.info(f"Starting summarization of {len(papers)} papers")
+                
+                if len(papers) >= self.map_reduce_threshold:
+                    return await self._summarize_large_corpus(papers)
+                
+                # Create different types of summaries
+                summaries = {
+                    'individual_summaries': await self._create_individual_summaries(papers),
+                    'thematic_summary': await self._create_thematic_summary(papers),
+                    'key_findings': await self._extract_key_findings(papers),
+                    'methodology_summary': await self._summarize_methodologies(papers),
+                    'gaps_and_opportunities': await self._identify_gaps(papers)
+                }
+                
+                self.logger.info("Summarization completed successfully")
+                return summaries
+                
+            except Exception as e:
+                self.logger.error(f"Error in summarization: {str(e)}")
+                return {'error': str(e)}
+    
+    async def _summarize_large_corpus(self, papers: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Summarize a large harvest, building themes and findings with hierarchical map-reduce."""
+        from services.map_reduce_summarizer import MapReduceSummarizer
+        
+        self.logger.info(f"Using map-reduce summarization for {len(papers)} papers")
+        
+        map_reduce = MapReduceSummarizer(use_llm=self.summary_mode == 'llm')
+        token_lists = [self.text_cache.for_paper(paper).tokens for paper in papers]
+        corpus = await map_reduce.summarize(papers, token_lists)
+        
+        summaries = {
+            'individual_summaries': await self._create_individual_summaries(papers),
+            'thematic_summary': corpus['thematic_summary'],
+            'key_findings': corpus['key_findings'],
+            'methodology_summary': await self._summarize_methodologies(papers),
+            'gaps_and_opportunities': await self._identify_gaps(papers),
+            'themes': corpus['themes'],
+            'map_reduce_stats': corpus['stats']
+        }
+        
+        self.logger.info("Summarization completed successfully")
+        return summaries
     
     async def _create_individual_summaries(self, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Create individual summaries for each paper."""
         summaries = []
         
-        for paper in papers:
+        # Rank sentences for the whole batch at once
+        extractive_summaries = self._summarize_abstracts(papers)
+        llm_summaries = [None] * len(papers)
+        
+        if self.llm_summarizer is not None:
             try:
-                summary = await self._create_paper_summary(paper)
+                llm_summaries = await self.llm_summarizer.summarize(papers)
+            except Exception as e:
+                self.logger.error(f"Error creating LLM summaries: {str(e)}")
+        
+        for paper, summary, llm_summary in zip(papers, extractive_summaries, llm_summaries):
+            try:
+                if llm_summary:
+                    # Papers the LLM could not summarize keep their extractive summary
+                    summary = llm_summary['summary']
+                    key_points = llm_summary.get('key_points') or await self._extract_key_points(paper)
+                else:
+                    key_points = await self._extract_key_points(paper)
+                
                 summaries.append({
                     'paper_id': paper.get('id', ''),
                     'title': paper.get('title', ''),
                     'summary': summary,
-                    'key_points': await self._extract_key_points(paper),
+                    'key_points': key_points,
                     'relevance_score': paper.get('relevance_score', 0.0)
                 })
             except Exception as e:
@@ -64,34 +134,41 @@ class SummarizerAgent:
     
     async def _create_paper_summary(self, paper: Dict[str, Any]) -> str:
         """Create a summary for a single paper - renamed to avoid recursion."""
+        return self._summarize_abstracts([paper])[0]
+    
+    def _summarize_abstracts(self, papers: List[Dict[str, Any]]) -> List[str]:
+        """Create extractive TextRank summaries for a batch of papers."""
+        results = [''] * len(papers)
+        documents = []
+        document_indices = []
+        
+        for index, paper in enumerate(papers):
+            paper_text = self.text_cache.for_paper(paper)
+            if not paper_text.abstract:
+                results[index] = f"Summary not available for: {paper.get('title', '')}"
+            elif len(paper_text.sentences) <= 3:
+                results[index] = paper_text.abstract
+            else:
+                documents.append((paper_text.sentences, paper_text.sentence_tokens))
+                document_indices.append(index)
+        
+        if not documents:
+            return results
+        
         try:
-            abstract = paper.get('abstract', '')
-            title = paper.get('title', '')
-            
-            if not abstract:
-                return f"Summary not available for: {title}"
-            
-            # In production, this would use an LLM API like OpenAI
-            # For now, we'll create a simple extractive summary
-            sentences = abstract.split('. ')
-            
-            if len(sentences) <= 3:
-                return abstract
-            
-            # Take first few sentences and last sentence if available
-            summary_sentences = sentences[:2]
-            if len(sentences) > 3:
-                summary_sentences.append(sentences[-1])
-            
-            summary = '. '.join(summary_sentences)
-            if not summary.endswith('.'):
-                summary += '.'
-            
-            return summary
-            
+            if self.text_rank.available:
+                ranked = self.text_rank.summarize_batch(documents)
+            else:
+                # Without NumPy, fall back to the lead sentences and the conclusion
+                ranked = [' '.join(sentences[:2] + sentences[-1:]) for sentences, _ in documents]
         except Exception as e:
-            self.logger.error(f"Error creating summary: {str(e)}")
-            return f"Error creating summary for {paper.get('title', 'Unknown')}"
+            self.logger.error(f"Error creating summaries: {str(e)}")
+            ranked = [' '.join(sentences[:2] + sentences[-1:]) for sentences, _ in documents]
+        
+        for index, summary in zip(document_indices, ranked):
+            results[index] = summary
+        
+        return results
     
     async def _create_thematic_summary(self, papers: List[Dict[str, Any]]) -> str:
         """Create a thematic summary across all papers."""
@@ -130,7 +207,13 @@ class SummarizerAgent:
         return grouped_findings
     
     async def _summarize_methodologies(self, papers: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Summarize methodologies used across papers."""
+        """Summarize methodologies used across papers (once per paper list)."""
+        return await self.memo.aget_or_compute(
+            METHODOLOGY_SUMMARY, lambda: self._classify_methodologies(papers), scope=papers
+        )
+    
+    async def _classify_methodologies(self, papers: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Classify each paper's methodology and group the papers by it."""
         methodologies = {
             'experimental': [],
             'computational': [],
@@ -219,21 +302,34 @@ class SummarizerAgent:
         key_points = []
         
         # Simple extraction based on abstract
-        abstract = paper.get('abstract', '')
-        sentences = abstract.split('. ')
+        sentences = self.text_cache.for_paper(paper).sentences
         
         # Take sentences that contain important keywords
         important_keywords = ['significant', 'important', 'novel', 'innovative', 'breakthrough', 'finding']
         
         for sentence in sentences:
-            if any(keyword in sentence.lower() for keyword in important_keywords):
-                key_points.append(sentence.strip())
+            lower_sentence = sentence.lower()
+            if any(keyword in lower_sentence for keyword in important_keywords):
+                key_points.append(sentence)
         
         return key_points[:3]  # Limit to top 3 key points
     
-    async def _identify_themes(self, papers: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    async def _identify_themes(self, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Identify common themes across papers."""
-        # Simplified theme identification
+        try:
+            if len(papers) >= 2 and self.theme_discovery.available:
+                token_lists = [self.text_cache.for_paper(paper).tokens for paper in papers]
+                themes = self.theme_discovery.discover(token_lists)
+                
+                for theme in themes:
+                    theme['papers'] = [papers[i].get('title', '') for i in theme.pop('paper_indices')[:5]]
+                
+                if themes:
+                    return themes
+        except Exception as e:
+            self.logger.error(f"Error discovering themes: {str(e)}")
+        
+        # Generic themes when there is too little text (or no NumPy) to cluster
         themes = [
             {
                 'name': 'Research Methodology',
@@ -256,8 +352,7 @@ class SummarizerAgent:
         findings = []
         
         # Simple extraction based on abstract
-        abstract = paper.get('abstract', '')
-        if 'significant' in abstract.lower():
+        if 'significant' in self.text_cache.for_paper(paper).lower_abstract:
             findings.append({
                 'paper_title': paper.get('title', ''),
                 'finding': 'Contains significant findings',
@@ -268,7 +363,12 @@ class SummarizerAgent:
     
     async def _group_similar_findings(self, findings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Group similar findings together."""
-        # Simplified grouping
+        try:
+            # MinHash/LSH merges near-duplicates without comparing every pair
+            return self.finding_clusterer.cluster(findings)
+        except Exception as e:
+            self.logger.error(f"Error grouping findings: {str(e)}")
+        
         grouped = []
         for finding in findings:
             grouped.append({
@@ -281,9 +381,7 @@ class SummarizerAgent:
     
     async def _classify_methodology(self, paper: Dict[str, Any]) -> str:
         """Classify the methodology used in a paper."""
-        abstract = paper.get('abstract', '').lower()
-        title = paper.get('title', '').lower()
-        text = f"{title} {abstract}"
+        text = self.text_cache.for_paper(paper).lower_text
         
         if any(word in text for word in ['experiment', 'clinical trial', 'study']):
             return 'experimental'
@@ -3,12 +3,23 @@ Supervisor agent for coordinating and monitoring all other agents in the researc
 This agent ensures reliability, handles errors, and optimizes the workflow.
 """
 
+import os
+import json
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
 from datetime import datetime
 import time
+import uuid
 from enum import Enum
+from services.paper_text import PaperTextCache
+from services.pipeline_context import PipelineMemo
+from services.llm_scheduler import get_llm_scheduler, set_current_pipeline, reset_current_pipeline
+from services.result_store import ResultStore, get_result_store, using_result_store
+from services.reference_list import ReferenceList
+from services.passage_index import PassageIndex
+from services.llm_cache import get_llm_cache
+from services.batch_generation import BatchRecorder, recording, load_batch_output, get_batch_executor
 
 class AgentStatus(Enum):
     """Status of individual agents."""
@@ -26,6 +37,9 @@ class PipelineStage(Enum):
     GENERATION = "generation"
     ANALYTICS = "analytics"
 
+# Background draft upgrades, referenced until they finish
+_background_tasks: Set[asyncio.Task] = set()
+
 class SupervisorAgent:
     """Supervisor agent that coordinates and monitors all other agents."""
     
@@ -33,6 +47,8 @@ class SupervisorAgent:
         self.logger = logging.getLogger(__name__)
         self.agent_status = {}
         self.pipeline_metrics = {}
+        self.text_caches: Dict[str, PaperTextCache] = {}
+        self.pipeline_memos: Dict[str, PipelineMemo] = {}
         self.error_history = []
         self.retry_config = {
             'max_retries': 3,
@@ -52,7 +68,10 @@ class SupervisorAgent:
             Comprehensive pipeline result with monitoring data
         """
         pipeline_start = time.time()
-        pipeline_id = f"pipeline_{int(pipeline_start)}"
+        # Unique per run: keys the fair-queue lane, the text cache and the memo
+        pipeline_id = f"pipeline_{uuid.uuid4().hex}"
+        # LLM requests of this pipeline are queued fairly against other pipelines
+        pipeline_token = set_current_pipeline(pipeline_id)
         
         try:
             self.logger.info(f"🎯 Supervisor starting pipeline {pipeline_id} for query: '{query}'")
@@ -67,17 +86,22 @@ class SupervisorAgent:
                 'total_papers': 0
             }
             
+            # One tokenized-text cache shared by every agent in this pipeline
+            self.text_caches[pipeline_id] = PaperTextCache()
+            # Memoized agent sub-computations, shared for the lifetime of this pipeline
+            self.pipeline_memos[pipeline_id] = PipelineMemo()
+            
             # Stage 1: Paper Retrieval
             papers = await self._supervise_retrieval(query, requirements, pipeline_id)
             
             # Stage 2: Summarization
-            summaries = await self._supervise_summarization(papers, pipeline_id)
+            summaries = await self._supervise_summarization(papers, pipeline_id, requirements.get('summary_mode'))
             
             # Stage 3: Citation Generation
-            citations = await self._supervise_citation_generation(papers, summaries, pipeline_id)
+            citations = await self._supervise_citation_generation(papers, summaries, pipeline_id, requirements.get('citation_style', 'apa'))
             
             # Stage 4: Paper Generation
-            draft = await self._supervise_paper_generation(query, summaries, citations, requirements, pipeline_id)
+            draft = await self._supervise_paper_generation(query, summaries, citations, requirements, pipeline_id, papers)
             
             # Stage 5: Citation Replacement
             draft = await self._supervise_citation_replacement(draft, papers, requirements.get('citation_style', 'apa'), pipeline_id)
@@ -92,13 +116,17 @@ class SupervisorAgent:
             total_time = time.time() - pipeline_start
             self.pipeline_metrics[pipeline_id]['total_time'] = total_time
             self.pipeline_metrics[pipeline_id]['total_papers'] = len(papers)
+            self.pipeline_metrics[pipeline_id]['text_cache'] = self.text_caches[pipeline_id].stats()
+            self.pipeline_metrics[pipeline_id]['memo'] = self.pipeline_memos[pipeline_id].stats()
+            self.pipeline_metrics[pipeline_id]['llm_scheduler'] = get_llm_scheduler().metrics()
             
             self.logger.info(f"✅ Supervisor completed pipeline {pipeline_id} in {total_time:.2f}s")
             
-            return {
+            result = {
                 'status': 'success',
                 'pipeline_id': pipeline_id,
                 'query': query,
+                'requirements': requirements,
                 'papers': papers,
                 'summaries': summaries,
                 'citations': citations,
@@ -108,6 +136,19 @@ class SupervisorAgent:
                 'supervisor_metrics': self.pipeline_metrics[pipeline_id],
                 'processing_time': total_time
             }
+            # Progressive drafts are returned with template text and upgraded in the background
+            upgrade_sections = draft.get('metadata', {}).get('upgrade_sections', [])
+            if requirements.get('progressive'):
+                draft.setdefault('metadata', {})['upgrade_status'] = 'in_progress' if upgrade_sections else 'complete'
+            
+            # Keep the artifacts so single sections can be regenerated later
+            result_id = get_result_store().save(result)
+            
+            if requirements.get('progressive') and upgrade_sections:
+                task = asyncio.create_task(self._upgrade_draft(result_id, upgrade_sections))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+            return result
             
         except Exception as e:
             total_time = time.time() - pipeline_start
@@ -131,6 +172,289 @@ class SupervisorAgent:
                 'supervisor_metrics': self.pipeline_metrics.get(pipeline_id, {}),
                 'processing_time': total_time
             }
+        
+        finally:
+            self.text_caches.pop(pipeline_id, None)
+            self.pipeline_memos.pop(pipeline_id, None)
+            reset_current_pipeline(pipeline_token)
+    
+    async def supervise_bulk_generation(self, queries: List[str], requirements: Dict[str, Any],
+                                        executor=None, work_dir: Optional[str] = None,
+                                        max_rounds: int = 2, results_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate drafts for many queries with batch-file LLM submission.
+        
+        Each pipeline runs normally except that section prompts are collected
+        into one batch file instead of being sent; after the batch has run and
+        its responses are in the LLM cache, the drafts are regenerated from
+        cache hits. Prompts that still miss are sent in another round. The
+        run saves its results in a private result store, so it never evicts
+        the shared store's interactive results, and writes each one to
+        `results_dir` as <result_id>.json.
+        
+        Args:
+            queries: Research queries, one draft each
+            requirements: Pipeline requirements shared by every draft
+            executor: Batch executor (see services/batch_generation.py);
+                BULK_BATCH_EXECUTOR selects one when omitted
+            work_dir: Directory for the batch input and output files
+            max_rounds: Maximum batches submitted
+            results_dir: Directory the results are written to (default
+                BULK_RESULTS_DIR, else <work_dir>/<run_id>)
+            
+        Returns:
+            Status, per-query result IDs and files, and the submitted batches
+        """
+        start = time.time()
+        run_id = f"bulk_{int(start)}_{uuid.uuid4().hex[:8]}"
+        if os.getenv('LLM_CACHE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+            return {'status': 'error', 'run_id': run_id,
+                    'error': 'Bulk generation stitches batch responses through the LLM cache; set LLM_CACHE_ENABLED=true'}
+        
+        work_dir = work_dir or os.getenv('BULK_BATCH_DIR', os.path.join('.cache', 'batches'))
+        executor = executor or get_batch_executor()
+        requirements = {**requirements, 'llm_cache': 'use', 'progressive': False}
+        self.logger.info(f"📦 Supervisor starting bulk run {run_id} for {len(queries)} queries")
+        
+        # Pipelines and stitching save to a store of their own, large enough for the whole run
+        with using_result_store(ResultStore(max_entries=max(1, len(queries)), directory='')):
+            return await self._run_bulk_generation(queries, requirements, executor, work_dir,
+                                                   max_rounds, results_dir, run_id, start)
+    
+    async def _run_bulk_generation(self, queries: List[str], requirements: Dict[str, Any], executor,
+                                   work_dir: str, max_rounds: int, results_dir: Optional[str],
+                                   run_id: str, start: float) -> Dict[str, Any]:
+        """Body of supervise_bulk_generation, run against the run's private result store."""
+        from agents.paper_generator_agent import PaperGeneratorAgent
+        
+        # Run every pipeline with its section prompts collected instead of sent
+        recorder = BatchRecorder()
+        results = []
+        run_results: Dict[str, Dict[str, Any]] = {}  # result ID -> result
+        with recording(recorder):
+            for query in queries:
+                result = await self.supervise_research_pipeline(query, requirements)
+                if result.get('result_id'):
+                    run_results[result['result_id']] = result
+                results.append({
+                    'query': query,
+                    'status': result.get('status'),
+                    'result_id': result.get('result_id'),
+                    'error': result.get('error')
+                })
+        
+        generator = PaperGeneratorAgent()
+        batches = []
+        for round_number in range(max_rounds):
+            if not len(recorder):
+                break
+            
+            try:
+                input_path = os.path.join(work_dir, f"{run_id}_{round_number}_input.jsonl")
+                output_path = os.path.join(work_dir, f"{run_id}_{round_number}_output.jsonl")
+                requests = recorder.write_jsonl(input_path)
+                self.logger.info(f"📦 Supervisor: Running batch {round_number + 1} with {requests} requests")
+                batch = await executor.execute(input_path, output_path)
+                batch.update(load_batch_output(output_path, get_llm_cache()))
+                batch['requests'] = requests
+                batches.append(batch)
+            except Exception as e:
+                self.logger.error(f"❌ Supervisor: Bulk batch {round_number + 1} failed: {str(e)}")
+                batches.append({'status': 'failed', 'error': str(e)})
+                break
+            
+            # Stitch the responses into the stored drafts; prompts that still
+            # miss the cache are collected for the next round
+            recorder = BatchRecorder()
+            stitches = []
+            for result_id, result in run_results.items():
+                structure = result.get('draft', {}).get('metadata', {}).get('structure', [])
+                sections = generator.llm_backed_sections(structure, result.get('requirements', {}))
+                stitches.append(self._upgrade_draft(result_id, sections, result))
+            with recording(recorder):
+                await asyncio.gather(*stitches)
+        
+        # Write the drafts out; the private store ends with the run
+        results_dir = results_dir or os.getenv('BULK_RESULTS_DIR') or os.path.join(work_dir, run_id)
+        unsaved = 0
+        for entry in results:
+            result = run_results.get(entry['result_id'])
+            if result is None:
+                continue
+            try:
+                os.makedirs(results_dir, exist_ok=True)
+                entry['path'] = os.path.join(results_dir, f"{entry['result_id']}.json")
+                with open(entry['path'], 'w', encoding='utf-8') as handle:
+                    json.dump(result, handle, default=str)
+            except Exception as e:
+                unsaved += 1
+                entry['path'] = None
+                self.logger.error(f"❌ Supervisor: Writing bulk result {entry['result_id']} failed: {str(e)}")
+        
+        total_time = time.time() - start
+        self.logger.info(f"✅ Supervisor completed bulk run {run_id} in {total_time:.2f}s")
+        complete = not len(recorder) and not unsaved and all(b.get('status') == 'completed' for b in batches)
+        return {
+            'status': 'success' if complete else 'partial',
+            'run_id': run_id,
+            'results_dir': results_dir,
+            'results': results,
+            'batches': batches,
+            'pending_requests': len(recorder),
+            'processing_time': total_time
+        }
+    
+    async def regenerate_section(self, result_id: str, section_name: str,
+                                 requirements: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Regenerate one section of a stored pipeline result.
+        
+        Only the section itself, its citation replacement and the draft-dependent
+        analytics are recomputed; retrieval, summarization and citations are reused.
+        
+        Args:
+            result_id: ID of a result stored by supervise_research_pipeline
+            section_name: Section to regenerate
+            requirements: Overrides of the original requirements (e.g. 'llm_cache')
+            
+        Returns:
+            Status, the new section, and the updated draft and analytics
+        """
+        start = time.time()
+        store = get_result_store()
+        result = store.get(result_id)
+        if result is None:
+            return {'status': 'not_found', 'result_id': result_id, 'error': f"Unknown result: {result_id}"}
+        
+        from agents.paper_generator_agent import PaperGeneratorAgent
+        
+        generator = PaperGeneratorAgent(passage_index=PassageIndex().build(result.get('papers', [])))
+        reqs = {**result.get('requirements', {}), **(requirements or {})}
+        if not generator.has_section(section_name, reqs):
+            return {'status': 'invalid_section', 'result_id': result_id, 'error': f"Unknown section: {section_name}"}
+        
+        # Regenerations of the same result are applied one at a time
+        async with store.lock(result_id):
+            text_cache = PaperTextCache()
+            
+            try:
+                self.logger.info(f"🔁 Supervisor: Regenerating section '{section_name}' of result {result_id}")
+                section = await generator.regenerate_section(
+                    section_name, result.get('query', ''), result.get('summaries', {}),
+                    result.get('citations', {}), reqs, result.get('draft', {}).get('sections')
+                )
+                
+                if await self._apply_section_update(result, section_name, section, generator, text_cache, reqs):
+                    store.save(result, result_id)
+                    store.publish(result_id, 'section', {'name': section_name, **section})
+                
+                total_time = time.time() - start
+                self.logger.info(f"✅ Supervisor: Regenerated '{section_name}' in {total_time:.2f}s")
+                return {
+                    'status': 'success',
+                    'result_id': result_id,
+                    'section_name': section_name,
+                    'section': section,
+                    'draft': result['draft'],
+                    'analytics': result['analytics'],
+                    'processing_time': total_time
+                }
+                
+            except Exception as e:
+                self.logger.error(f"❌ Supervisor: Regenerating '{section_name}' failed: {str(e)}")
+                return {
+                    'status': 'error',
+                    'result_id': result_id,
+                    'section_name': section_name,
+                    'error': str(e),
+                    'processing_time': time.time() - start
+                }
+    
+    async def _apply_section_update(self, result: Dict[str, Any], section_name: str, section: Dict[str, Any],
+                                    generator, text_cache: PaperTextCache, requirements: Dict[str, Any]) -> bool:
+        """
+        Put a newly generated section into a stored result.
+        
+        Replaces the citation placeholders of that section only (the
+        references list has none), bumps the section version and refreshes
+        the draft-dependent analytics.
+        
+        Returns:
+            False when the section text did not change (nothing was updated)
+        """
+        from agents.citation_agent import CitationAgent
+        from agents.analytics_agent import AnalyticsAgent
+        
+        papers = result.get('papers', [])
+        draft = result.setdefault('draft', {})
+        
+        if section_name != 'references':  # its [n] markers number the list
+            citation_agent = CitationAgent(text_cache=text_cache)
+            section['content'] = await citation_agent.replace_citation_placeholders(
+                section.get('content', ''), papers, requirements.get('citation_style', 'apa')
+            )
+        section['word_count'] = len(str(section['content']).split())
+        
+        previous = draft.setdefault('sections', {}).get(section_name)
+        previous = previous if isinstance(previous, dict) else {}
+        if previous.get('content') == section['content']:
+            return False
+        section['version'] = previous.get('version', 0) + 1
+        section.setdefault('source', 'template')
+        
+        draft['sections'][section_name] = section
+        if section_name == 'abstract':
+            draft['abstract'] = section['content']
+        draft.setdefault('metadata', {})['word_count'] = generator._calculate_word_count(draft)
+        
+        analytics_agent = AnalyticsAgent(text_cache=text_cache, memo=PipelineMemo())
+        result['analytics'] = await analytics_agent.update_section_analytics(
+            draft, section_name, papers, result.get('analytics', {})
+        )
+        return True
+    
+    async def _upgrade_draft(self, result_id: str, section_names: List[str],
+                             result: Optional[Dict[str, Any]] = None):
+        """Replace the template sections of a progressive draft with LLM text as it arrives."""
+        from agents.paper_generator_agent import PaperGeneratorAgent
+        
+        store = get_result_store()
+        result = result if result is not None else store.get(result_id)
+        if result is None:
+            return
+        
+        text_cache = PaperTextCache()
+        generator = PaperGeneratorAgent(passage_index=PassageIndex(text_cache=text_cache).build(result.get('papers', [])))
+        requirements = result.get('requirements', {})
+        status = 'complete'
+        upgraded = 0
+        
+        try:
+            async for section_name, section in generator.upgrade_sections(
+                section_names, result.get('query', ''), result.get('summaries', {}),
+                result.get('citations', {}), requirements, result.get('draft', {}).get('sections')
+            ):
+                async with store.lock(result_id):
+                    if not await self._apply_section_update(result, section_name, section, generator, text_cache, requirements):
+                        continue
+                    store.save(result, result_id)
+                upgraded += 1
+                store.publish(result_id, 'section', {'name': section_name, **section})
+                
+        except Exception as e:
+            status = 'failed'
+            self.logger.error(f"❌ Supervisor: Upgrading draft {result_id} failed: {str(e)}")
+        
+        finally:
+            result.setdefault('draft', {}).setdefault('metadata', {})['upgrade_status'] = status
+            store.save(result, result_id)
+            store.publish(result_id, 'complete', {
+                'upgrade_status': status,
+                'sections_upgraded': upgraded,
+                'draft': result['draft'],
+                'analytics': result.get('analytics', {})
+            })
+            self.logger.info(f"✅ Supervisor: Upgraded {upgraded} sections of draft {result_id}")
     
     async def _supervise_retrieval(self, query: str, requirements: Dict[str, Any], pipeline_id: str) -> List[Dict[str, Any]]:
         """Supervise the paper retrieval stage."""
@@ -140,7 +464,7 @@ class SupervisorAgent:
         try:
             from agents.retrieval_agent import RetrievalAgent
             
-            retrieval_agent = RetrievalAgent()
+            retrieval_agent = RetrievalAgent(text_cache=self._get_text_cache(pipeline_id))
             self._update_agent_status(pipeline_id, stage, AgentStatus.RUNNING)
             
             papers = await self._execute_with_retry(
@@ -165,7 +489,8 @@ class SupervisorAgent:
             self.logger.error(f"❌ Supervisor: {stage.value} failed - {str(e)}")
             raise
     
-    async def _supervise_summarization(self, papers: List[Dict[str, Any]], pipeline_id: str) -> Dict[str, Any]:
+    async def _supervise_summarization(self, papers: List[Dict[str, Any]], pipeline_id: str, 
+                                       summary_mode: Optional[str] = None) -> Dict[str, Any]:
         """Supervise the summarization stage."""
         stage = PipelineStage.SUMMARIZATION
         self.logger.info(f"📝 Supervisor: Starting {stage.value}")
@@ -173,7 +498,11 @@ class SupervisorAgent:
         try:
             from agents.summarizer_agent import SummarizerAgent
             
-            summarizer_agent = SummarizerAgent()
+            summarizer_agent = SummarizerAgent(
+                text_cache=self._get_text_cache(pipeline_id),
+                summary_mode=summary_mode,
+                memo=self._get_memo(pipeline_id)
+            )
             self._update_agent_status(pipeline_id, stage, AgentStatus.RUNNING)
             
             summaries = await self._execute_with_retry(
@@ -183,6 +512,9 @@ class SupervisorAgent:
                 pipeline_id=pipeline_id
             )
             
+            if summarizer_agent.llm_summarizer is not None:
+                self.pipeline_metrics[pipeline_id]['llm_summaries'] = summarizer_agent.llm_summarizer.stats()
+            
             self._update_agent_status(pipeline_id, stage, AgentStatus.COMPLETED)
             self.pipeline_metrics[pipeline_id]['stages_completed'].append(stage.value)
             
@@ -200,7 +532,8 @@ class SupervisorAgent:
                 'methodology_summary': {}
             }
     
-    async def _supervise_citation_generation(self, papers: List[Dict[str, Any]], summaries: Dict[str, Any], pipeline_id: str) -> Dict[str, Any]:
+    async def _supervise_citation_generation(self, papers: List[Dict[str, Any]], summaries: Dict[str, Any], pipeline_id: str,
+                                           citation_style: Optional[str] = None) -> Dict[str, Any]:
         """Supervise the citation generation stage."""
         stage = PipelineStage.CITATION
         self.logger.info(f"🔗 Supervisor: Starting {stage.value}")
@@ -208,13 +541,14 @@ class SupervisorAgent:
         try:
             from agents.citation_agent import CitationAgent
             
-            citation_agent = CitationAgent()
+            citation_agent = CitationAgent(text_cache=self._get_text_cache(pipeline_id))
             self._update_agent_status(pipeline_id, stage, AgentStatus.RUNNING)
             
             citations = await self._execute_with_retry(
                 citation_agent.generate_citations,
                 papers,
                 summaries,
+                citation_style,
                 stage=stage,
                 pipeline_id=pipeline_id
             )
@@ -238,7 +572,7 @@ class SupervisorAgent:
     
     async def _supervise_paper_generation(self, query: str, summaries: Dict[str, Any], 
                                         citations: Dict[str, Any], requirements: Dict[str, Any], 
-                                        pipeline_id: str) -> Dict[str, Any]:
+                                        pipeline_id: str, papers: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """Supervise the paper generation stage."""
         stage = PipelineStage.GENERATION
         self.logger.info(f"📄 Supervisor: Starting {stage.value}")
@@ -246,7 +580,9 @@ class SupervisorAgent:
         try:
             from agents.paper_generator_agent import PaperGeneratorAgent
             
-            generator_agent = PaperGeneratorAgent()
+            # Section prompts retrieve their evidence from the pipeline's own papers
+            passage_index = PassageIndex(text_cache=self._get_text_cache(pipeline_id)).build(papers or [])
+            generator_agent = PaperGeneratorAgent(passage_index=passage_index)
             self._update_agent_status(pipeline_id, stage, AgentStatus.RUNNING)
             
             draft = await self._execute_with_retry(
@@ -288,25 +624,10 @@ class SupervisorAgent:
         try:
             from agents.citation_agent import CitationAgent
             
-            citation_agent = CitationAgent()
+            citation_agent = CitationAgent(text_cache=self._get_text_cache(pipeline_id))
             
-            # Replace citations in abstract
-            if 'abstract' in draft and draft['abstract']:
-                draft['abstract'] = await citation_agent.replace_citation_placeholders(
-                    draft['abstract'], papers, citation_style
-                )
-            
-            # Replace citations in sections
-            if 'sections' in draft:
-                for section_name, section_content in draft['sections'].items():
-                    if isinstance(section_content, dict) and 'content' in section_content:
-                        draft['sections'][section_name]['content'] = await citation_agent.replace_citation_placeholders(
-                            section_content['content'], papers, citation_style
-                        )
-                    elif isinstance(section_content, str):
-                        draft['sections'][section_name] = await citation_agent.replace_citation_placeholders(
-                            section_content, papers, citation_style
-                        )
+            replacements = await citation_agent.replace_citations_in_draft(draft, papers, citation_style)
+            draft.setdefault('metadata', {})['citation_replacements'] = replacements
             
             self.logger.info("✅ Supervisor: Citation replacement completed")
             return draft
@@ -323,7 +644,7 @@ class SupervisorAgent:
         try:
             from agents.analytics_agent import AnalyticsAgent
             
-            analytics_agent = AnalyticsAgent()
+            analytics_agent = AnalyticsAgent(text_cache=self._get_text_cache(pipeline_id), memo=self._get_memo(pipeline_id))
             self._update_agent_status(pipeline_id, stage, AgentStatus.RUNNING)
             
             analytics = await self._execute_with_retry(
@@ -368,85 +689,12 @@ class SupervisorAgent:
     async def _supervise_reference_formatting(self, papers: List[Dict[str, Any]], 
                                             citations: Dict[str, Any], citation_style: str, 
                                             pipeline_id: str) -> List[Dict[str, Any]]:
-        """Supervise reference formatting with links."""
+        """Supervise the pipeline's reference list (numbered, formatted, with links)."""
         self.logger.info("📚 Supervisor: Starting reference formatting")
         
         try:
-            from agents.citation_agent import CitationAgent
-            
-            citation_agent = CitationAgent()
-            references = []
-            
-            for i, paper in enumerate(papers[:15], 1):  # Limit to 15 references
-                try:
-                    # Safe author formatting
-                    authors = paper.get('authors', ['Unknown Author'])
-                    if not authors or len(authors) == 0:
-                        author_str = "Unknown Author"
-                    elif len(authors) == 1:
-                        author_str = authors[0] if authors[0] else "Unknown Author"
-                    elif len(authors) == 2:
-                        valid_authors = [a for a in authors if a]
-                        if len(valid_authors) >= 2:
-                            author_str = f"{valid_authors[0]} & {valid_authors[1]}"
-                        elif len(valid_authors) == 1:
-                            author_str = valid_authors[0]
-                        else:
-                            author_str = "Unknown Author"
-                    else:
-                        valid_authors = [a for a in authors if a]
-                        if len(valid_authors) > 0:
-                            author_str = f"{valid_authors[0]} et al."
-                        else:
-                            author_str = "Unknown Author"
-                    
-                    # Create formatted citation
-                    year = paper.get('year', 'Unknown')
-                    title = paper.get('title', 'Unknown Title')
-                    journal = paper.get('journal', '')
-                    doi = paper.get('doi', '')
-                    url = paper.get('url', '')
-                    
-                    # Build citation string
-                    formatted_citation = f"{author_str} ({year}). {title}."
-                    if journal:
-                        formatted_citation += f" {journal}."
-                    if doi:
-                        formatted_citation += f" https://doi.org/{doi}"
-                    elif url:
-                        formatted_citation += f" Retrieved from {url}"
-                    
-                    ref_entry = {
-                        "id": f"ref{i}",
-                        "number": i,
-                        "title": title,
-                        "authors": authors,
-                        "journal": journal,
-                        "year": str(year),
-                        "doi": doi,
-                        "url": url,
-                        "formatted_citation": formatted_citation,
-                        "relevance_score": paper.get('relevance_score', 0.0),
-                        "citations_count": paper.get('citations_count', 0)
-                    }
-                    references.append(ref_entry)
-                    
-                except Exception as e:
-                    self.logger.warning(f"⚠️ Supervisor: Error formatting reference {i} - {str(e)}")
-                    # Add minimal reference to avoid breaking
-                    references.append({
-                        "id": f"ref{i}",
-                        "number": i,
-                        "title": paper.get('title', 'Unknown Title'),
-                        "authors": paper.get('authors', ['Unknown Author']),
-                        "journal": paper.get('journal', 'Unknown Journal'),
-                        "year": str(paper.get('year', 'Unknown')),
-                        "doi": paper.get('doi', ''),
-                        "url": paper.get('url', ''),
-                        "formatted_citation": f"Reference {i}: {paper.get('title', 'Unknown Title')}",
-                        "relevance_score": paper.get('relevance_score', 0.0),
-                        "citations_count": paper.get('citations_count', 0)
-                    })
+            # The list built with the citations; rebuilt only for another style
+            references = ReferenceList.from_citations(citations, papers, citation_style).entries
             
             self.logger.info(f"✅ Supervisor: Reference formatting completed - {len(references)} references")
             return references
@@ -492,6 +740,18 @@ class SupervisorAgent:
                 else:
                     raise
     
+    def _get_text_cache(self, pipeline_id: str) -> PaperTextCache:
+        """Get the tokenized-text cache shared by all agents of a pipeline."""
+        if pipeline_id not in self.text_caches:
+            self.text_caches[pipeline_id] = PaperTextCache()
+        return self.text_caches[pipeline_id]
+    
+    def _get_memo(self, pipeline_id: str) -> PipelineMemo:
+        """Get the memo table shared by all agents of a pipeline."""
+        if pipeline_id not in self.pipeline_memos:
+            self.pipeline_memos[pipeline_id] = PipelineMemo()
+        return self.pipeline_memos[pipeline_id]
+    
     def _update_agent_status(self, pipeline_id: str, stage: str, status: AgentStatus):
         """Update the status of an agent."""
         if pipeline_id not in self.agent_status:
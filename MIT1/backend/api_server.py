@@ -269,7 +269,7 @@ async def test_citations():
         }
         
         citations = {}
-        styles = ['apa', 'mla', 'chicago', 'ieee']
+        styles = citation_agent.formatter.engine.style_names()
         
         for style in styles:
             citations[style] = citation_agent._format_citation(sample_paper, style)
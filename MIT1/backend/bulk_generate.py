@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Nightly bulk draft generation with batch-file LLM submission.
+
+Reads one research topic per line, runs the research pipeline for each with
+its section prompts collected into an OpenAI Batch API file, runs the batch
+and stitches the responses back into the drafts (see
+services/batch_generation.py). Each result is written as <result_id>.json
+to --results-dir (default: BULK_RESULTS_DIR, else <work dir>/<run id>).
+
+    python bulk_generate.py topics.txt --length long --executor openai
+    python bulk_generate.py topics.txt --executor local   # offline, stub completions
+"""
+
+import sys
+import json
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add the backend directory to the Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from agents.supervisor_agent import SupervisorAgent
+from services.batch_generation import get_batch_executor
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate drafts for many topics through the Batch API")
+    parser.add_argument('topics', help='file with one research topic per line')
+    parser.add_argument('--length', default='medium', choices=['short', 'medium', 'long'])
+    parser.add_argument('--type', default='research_paper')
+    parser.add_argument('--citation-style', default='apa')
+    parser.add_argument('--max-papers', type=int, default=20)
+    parser.add_argument('--executor', choices=['openai', 'local'], help='defaults to BULK_BATCH_EXECUTOR')
+    parser.add_argument('--work-dir', help='directory for batch files (defaults to BULK_BATCH_DIR)')
+    parser.add_argument('--results-dir', help='directory for the drafts (defaults to BULK_RESULTS_DIR)')
+    parser.add_argument('--output', help='write the run summary as JSON to this file')
+    args = parser.parse_args()
+
+    with open(args.topics, encoding='utf-8') as handle:
+        topics = [line.strip() for line in handle if line.strip() and not line.startswith('#')]
+
+    requirements = {
+        'length': args.length,
+        'type': args.type,
+        'citation_style': args.citation_style,
+        'max_papers': args.max_papers
+    }
+    summary = asyncio.run(SupervisorAgent().supervise_bulk_generation(
+        topics, requirements, executor=get_batch_executor(args.executor), work_dir=args.work_dir,
+        results_dir=args.results_dir
+    ))
+
+    print(f"Bulk run {summary['run_id']}: {summary['status']} in {summary.get('processing_time', 0):.1f}s")
+    for batch in summary.get('batches', []):
+        print(f"  batch {batch.get('id')}: {batch.get('status')}, {batch.get('requests', 0)} requests, "
+              f"{batch.get('loaded', 0)} loaded, {batch.get('failed', 0)} failed")
+    for entry in summary.get('results', []):
+        print(f"  {entry['status']:8} {entry.get('result_id') or '-':32} {entry['query']}")
+    if summary.get('results_dir'):
+        print(f"Drafts written to {summary['results_dir']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(summary, handle, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,10 @@ Also exposes an API router for POST /research-pipeline that orchestrates via HTT
 from typing import Dict, List, Any, Optional
 import asyncio
 import os
+import json
 import logging
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 import httpx
 from .utils import Logger, Config
@@ -29,13 +30,17 @@ class ResearchCoordinator:
             from agents.citation_agent import CitationAgent
             from agents.paper_generator_agent import PaperGeneratorAgent
             from agents.analytics_agent import AnalyticsAgent
+            from services.paper_text import PaperTextCache
+            
+            # Agents share one content-keyed cache so each paper is tokenized once
+            self.text_cache = PaperTextCache()
             
             self.agents = {
-                'retrieval': RetrievalAgent(),
-                'summarizer': SummarizerAgent(),
-                'citation': CitationAgent(),
+                'retrieval': RetrievalAgent(text_cache=self.text_cache),
+                'summarizer': SummarizerAgent(text_cache=self.text_cache),
+                'citation': CitationAgent(text_cache=self.text_cache),
                 'paper_generator': PaperGeneratorAgent(),
-                'analytics': AnalyticsAgent()
+                'analytics': AnalyticsAgent(text_cache=self.text_cache)
             }
             
             self.logger.info("All agents initialized successfully")
@@ -65,7 +70,9 @@ class ResearchCoordinator:
             summaries = await self.agents['summarizer'].summarize_papers(papers)
             
             # Step 3: Generate citations
-            citations = await self.agents['citation'].generate_citations(papers, summaries)
+            citations = await self.agents['citation'].generate_citations(
+                papers, summaries, requirements.get('citation_style', 'apa')
+            )
             
             # Step 4: Generate paper draft
             paper_draft = await self.agents['paper_generator'].generate_draft(
@@ -98,24 +105,7 @@ class ResearchCoordinator:
                                         citation_style: str) -> Dict[str, Any]:
         """Replace citation placeholders in the paper draft."""
         try:
-            # Replace citations in abstract
-            if 'abstract' in paper_draft:
-                paper_draft['abstract'] = await self.agents['citation'].replace_citation_placeholders(
-                    paper_draft['abstract'], papers, citation_style
-                )
-            
-            # Replace citations in sections
-            if 'sections' in paper_draft:
-                for section_name, section_content in paper_draft['sections'].items():
-                    if isinstance(section_content, dict) and 'content' in section_content:
-                        paper_draft['sections'][section_name]['content'] = await self.agents['citation'].replace_citation_placeholders(
-                            section_content['content'], papers, citation_style
-                        )
-                    elif isinstance(section_content, str):
-                        paper_draft['sections'][section_name] = await self.agents['citation'].replace_citation_placeholders(
-                            section_content, papers, citation_style
-                        )
-            
+            await self.agents['citation'].replace_citations_in_draft(paper_draft, papers, citation_style)
             return paper_draft
             
         except Exception as e:
@@ -131,6 +121,12 @@ router = APIRouter()
 class ResearchPipelineRequest(BaseModel):
     query: str
     timeout_seconds: Optional[float] = 20.0
+    progressive: Optional[bool] = False
+    # Pipeline options of the streaming endpoint (same fields as the JSON pipeline request)
+    max_papers: Optional[int] = 10
+    sources: Optional[List[str]] = None
+    paper_length: Optional[str] = 'medium'
+    citation_style: Optional[str] = 'apa'
 
 @router.post("/research-pipeline")
 async def research_pipeline_endpoint(request: ResearchPipelineRequest):
@@ -183,13 +179,16 @@ async def research_pipeline_endpoint(request: ResearchPipelineRequest):
             "max_papers": 10,
             "sources": ["semantic_scholar", "pubmed", "core", "openalex"],
             "length": "medium",
-            "citation_style": "apa"
+            "citation_style": "apa",
+            # Return the template draft at once and upgrade sections in the background
+            "progressive": bool(request.progressive)
         }
         
         result = await supervisor.supervise_research_pipeline(request.query, pipeline_requirements)
         
         return {
             "status": result.get("status", "success"),
+            "result_id": result.get("result_id"),
             "papers": result.get("papers", papers),
             "summaries": result.get("summaries", {}),
             "draft": result.get("draft", {}),
@@ -204,6 +203,152 @@ async def research_pipeline_endpoint(request: ResearchPipelineRequest):
         logger.error(f"Pipeline error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/research-pipeline/stream")
+async def research_pipeline_stream_endpoint(request: ResearchPipelineRequest):
+    """
+    Runs the supervised pipeline and streams the draft as it is written (SSE).
+    Events: 'delta' {section, delta} for each generated chunk, 'section' with each
+    finished section, then 'complete' with the same payload as /research-pipeline
+    (or 'error').
+    """
+    from agents.supervisor_agent import SupervisorAgent
+    from agents.paper_generator_agent import stream_generation_events, SECTION_COMPLETE, STREAM_RESULT
+    
+    logger = logging.getLogger(__name__)
+    supervisor = SupervisorAgent()
+    pipeline_requirements = {
+        "max_papers": request.max_papers or 10,
+        "sources": request.sources or ["semantic_scholar", "pubmed", "core", "openalex"],
+        "length": request.paper_length or "medium",
+        "citation_style": request.citation_style or "apa"
+    }
+    
+    async def events():
+        try:
+            async for event, payload in stream_generation_events(
+                supervisor.supervise_research_pipeline(request.query, pipeline_requirements)
+            ):
+                if event == STREAM_RESULT:
+                    yield _sse_event("complete", {
+                        "status": payload.get("status", "success"),
+                        "result_id": payload.get("result_id"),
+                        "query": request.query,
+                        "papers": payload.get("papers", []),
+                        "summaries": payload.get("summaries", {}),
+                        "draft": payload.get("draft", {}),
+                        "analytics": payload.get("analytics", {}),
+                        "references": payload.get("references", []),
+                        "supervisor_metrics": payload.get("supervisor_metrics", {}),
+                        "processing_time": payload.get("processing_time")
+                    })
+                elif event == SECTION_COMPLETE:
+                    yield _sse_event("section", payload)
+                else:
+                    yield _sse_event("delta", {"section": event, "delta": payload})
+        except Exception as e:
+            logger.error(f"Streaming pipeline error: {e}")
+            yield _sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class SectionRegenerateRequest(BaseModel):
+    requirements: Optional[Dict[str, Any]] = None
+
+@router.post("/drafts/{result_id}/sections/{section_name}/regenerate")
+async def regenerate_section_endpoint(result_id: str, section_name: str,
+                                      request: Optional[SectionRegenerateRequest] = None):
+    """
+    Regenerates one section of a stored pipeline result without re-running the pipeline.
+    Returns {status, result_id, section_name, section, draft, analytics, processing_time}.
+    """
+    from agents.supervisor_agent import SupervisorAgent
+    
+    logger = logging.getLogger(__name__)
+    try:
+        supervisor = SupervisorAgent()
+        result = await supervisor.regenerate_section(
+            result_id, section_name, request.requirements if request else None
+        )
+    except Exception as e:
+        logger.error(f"Section regeneration error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if result['status'] == 'not_found':
+        raise HTTPException(status_code=404, detail=result['error'])
+    if result['status'] == 'invalid_section':
+        raise HTTPException(status_code=400, detail=result['error'])
+    if result['status'] == 'error':
+        raise HTTPException(status_code=500, detail=result['error'])
+    return result
+
+@router.get("/drafts/{result_id}")
+async def get_draft(result_id: str):
+    """
+    Returns the current state of a stored pipeline result; poll it to pick up
+    sections upgraded in the background (draft.metadata.upgrade_status).
+    """
+    from services.result_store import get_result_store
+    
+    result = get_result_store().get(result_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Unknown result: {result_id}")
+    return {
+        "status": result.get("status", "success"),
+        "result_id": result_id,
+        "query": result.get("query"),
+        "papers": result.get("papers", []),
+        "summaries": result.get("summaries", {}),
+        "draft": result.get("draft", {}),
+        "analytics": result.get("analytics", {}),
+        "references": result.get("references", []),
+        "updated_at": result.get("updated_at")
+    }
+
+@router.get("/drafts/{result_id}/events")
+async def draft_events(result_id: str):
+    """
+    Subscribes to updates of a stored draft (SSE). Events: 'snapshot' with the
+    current draft, 'section' for each upgraded or regenerated section, and
+    'complete' once a background upgrade has finished.
+    """
+    from services.result_store import get_result_store
+    
+    store = get_result_store()
+    result = store.get(result_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Unknown result: {result_id}")
+    
+    # Subscribe before taking the snapshot so no update falls in between
+    queue = store.subscribe(result_id)
+    
+    async def events():
+        try:
+            draft = result.get("draft", {})
+            yield _sse_event("snapshot", {"result_id": result_id, "draft": draft, "analytics": result.get("analytics", {})})
+            if draft.get("metadata", {}).get("upgrade_status") != "in_progress":
+                return
+            while True:
+                event, data = await queue.get()
+                yield _sse_event(event, data)
+                if event == "complete":
+                    return
+        finally:
+            store.unsubscribe(result_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Download endpoints
 class DownloadRequest(BaseModel):
     research_data: Dict[str, Any]
@@ -270,6 +415,22 @@ async def get_download_formats():
         logger.error(f"Error getting formats: {str(e)}")
         return {'error': str(e)}
 
+@router.get("/llm/metrics")
+async def get_llm_metrics():
+    """Get queue depth, wait times and tokens in flight of the shared LLM scheduler."""
+    try:
+        import sys
+        import os
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from services.llm_scheduler import get_llm_scheduler
+
+        return get_llm_scheduler().metrics()
+
+    except Exception as e:
+        logger = logging.getLogger(__name__)
+        logger.error(f"Error getting LLM metrics: {str(e)}")
+        return {'error': str(e)}
+
 async def main():
     """Main entry point."""
     coordinator = ResearchCoordinator()
@@ -2,11 +2,12 @@
 Database configuration and session management.
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 import os
+from datetime import datetime
 from typing import Generator
 
 # Database URL configuration
@@ -200,21 +201,81 @@ class DatabaseUtils:
             return False
 
 # Database migration utilities
+def _version_tuple(version: str) -> tuple:
+    return tuple(int(part) for part in version.split('.'))
+
+def _migrate_summary_cache(connection):
+    """1.1.0: summaries.cache_key (unique) and an optional research_session_id."""
+    from .models import Summary
+    
+    inspector = inspect(connection)
+    if not inspector.has_table('summaries'):
+        return  # create_all builds the current table
+    columns = {column['name']: column for column in inspector.get_columns('summaries')}
+    
+    if connection.dialect.name == 'sqlite':
+        # SQLite cannot relax NOT NULL in place: rebuild the table from the model
+        if 'cache_key' in columns and columns['research_session_id']['nullable']:
+            return
+        connection.execute(text("ALTER TABLE summaries RENAME TO summaries_old"))
+        for index in inspector.get_indexes('summaries_old'):
+            connection.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+        Summary.__table__.create(connection)
+        connection.execute(text(
+            "INSERT INTO summaries (id, research_session_id, summary_type, content, created_at) "
+            "SELECT id, research_session_id, summary_type, content, created_at FROM summaries_old"
+        ))
+        connection.execute(text("DROP TABLE summaries_old"))
+        return
+    
+    if 'cache_key' not in columns:
+        connection.execute(text("ALTER TABLE summaries ADD COLUMN cache_key VARCHAR(64)"))
+        connection.execute(text("CREATE UNIQUE INDEX ix_summaries_cache_key ON summaries (cache_key)"))
+    if not columns['research_session_id']['nullable']:
+        if connection.dialect.name == 'mysql':
+            connection.execute(text("ALTER TABLE summaries MODIFY research_session_id INTEGER NULL"))
+        else:
+            connection.execute(text("ALTER TABLE summaries ALTER COLUMN research_session_id DROP NOT NULL"))
+
+# (version, description, migration); applied in order, each recorded in schema_migrations
+MIGRATIONS = [
+    ("1.1.0", "Summary cache key and optional research session", _migrate_summary_cache),
+]
+BASE_SCHEMA_VERSION = "1.0.0"
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
 class DatabaseMigration:
     """Database migration utilities."""
     
     @staticmethod
     def get_current_schema_version() -> str:
-        """Get the current schema version."""
-        # This would typically be stored in a migrations table
-        return "1.0.0"
+        """Get the current schema version (the newest migration applied)."""
+        with engine.connect() as connection:
+            if not inspect(connection).has_table('schema_migrations'):
+                return BASE_SCHEMA_VERSION
+            versions = connection.execute(text("SELECT version FROM schema_migrations")).scalars().all()
+        return max(versions, key=_version_tuple, default=BASE_SCHEMA_VERSION)
     
     @staticmethod
-    def migrate_to_version(version: str) -> bool:
-        """Migrate database to a specific version."""
+    def migrate_to_version(version: str = LATEST_SCHEMA_VERSION) -> bool:
+        """Apply the migrations up to a version, each in its own transaction."""
         try:
-            # Implement migration logic here
-            print(f"Migrating to version {version}")
+            with engine.begin() as connection:
+                connection.execute(text(
+                    "CREATE TABLE IF NOT EXISTS schema_migrations "
+                    "(version VARCHAR(20) PRIMARY KEY, description VARCHAR(255), applied_at TIMESTAMP)"
+                ))
+            current = DatabaseMigration.get_current_schema_version()
+            for migration_version, description, migrate in MIGRATIONS:
+                if _version_tuple(current) < _version_tuple(migration_version) <= _version_tuple(version):
+                    with engine.begin() as connection:
+                        migrate(connection)
+                        connection.execute(
+                            text("INSERT INTO schema_migrations (version, description, applied_at) "
+                                 "VALUES (:version, :description, :applied_at)"),
+                            {'version': migration_version, 'description': description, 'applied_at': datetime.utcnow()}
+                        )
+                    print(f"Migrated database to version {migration_version}: {description}")
             return True
         except Exception as e:
             print(f"Migration failed: {e}")
@@ -233,11 +294,19 @@ class DatabaseMigration:
 """
         return script
 
+def ensure_schema() -> bool:
+    """Bring existing tables up to the latest schema version, then create any missing tables."""
+    if not DatabaseMigration.migrate_to_version(LATEST_SCHEMA_VERSION):
+        return False
+    create_tables()
+    return True
+
 # Initialize database
 def initialize_database():
     """Initialize the database with tables and default data."""
     try:
-        create_tables()
+        if not ensure_schema():
+            return False
         print("Database initialized successfully")
         return True
     except Exception as e:
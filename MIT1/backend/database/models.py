@@ -76,8 +76,11 @@ class Summary(Base):
     __tablename__ = 'summaries'
     
     id = Column(Integer, primary_key=True, index=True)
-    research_session_id = Column(Integer, ForeignKey('research_sessions.id'), nullable=False)
+    # Optional: cached LLM summaries are shared across sessions (schema 1.1.0)
+    research_session_id = Column(Integer, ForeignKey('research_sessions.id'), nullable=True)
     summary_type = Column(String(100), nullable=False)  # individual, thematic, key_findings, etc.
+    # Hash of (abstract hash, model, prompt version) for cached LLM summaries (schema 1.1.0)
+    cache_key = Column(String(64), nullable=True, unique=True, index=True)
     content = Column(JSON, nullable=False)  # Summary content in structured format
     created_at = Column(DateTime, default=datetime.utcnow)
     
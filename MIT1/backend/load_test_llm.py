@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Load test for the draft generation path against the local LLM stub.
+
+Starts services/llm_stub_server.py in-process (unless OPENAI_BASE_URL already
+points at a running endpoint), generates drafts concurrently through
+PaperGeneratorAgent and reports throughput, draft latency percentiles and the
+shared scheduler's metrics. Runs offline, so it can be used in CI.
+
+    python load_test_llm.py --drafts 20 --concurrency 5 --latency uniform:0.1:0.4 --rate-429 0.05
+"""
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+
+# Add the backend directory to the Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+import httpx
+import uvicorn
+
+from services.llm_stub_server import StubConfig, create_app
+
+def start_stub(config: StubConfig) -> str:
+    """Serve the stub on a free local port in a background thread and return its base URL."""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+def sample_inputs(topic: str, papers: int):
+    """Synthetic summaries and citations shaped like the pipeline's."""
+    summaries = {
+        'key_findings': [
+            {'finding': f"Method {i} improves {topic} accuracy by {5 + i}% over baselines.", 'paper_title': f"Paper {i}"}
+            for i in range(papers)
+        ],
+        'methodologies': ['deep learning', 'randomized trial', 'survey'],
+        'research_gaps': ['Few external validation studies.', 'Limited data on long-term outcomes.'],
+        'individual_summaries': [
+            {'title': f"Paper {i}", 'summary': f"Study {i} of {topic}.", 'key_points': []} for i in range(papers)
+        ]
+    }
+    citations = {'bibliography': [], 'citation_style': 'apa'}
+    return summaries, citations
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+async def run_load(args) -> dict:
+    from agents.paper_generator_agent import PaperGeneratorAgent
+    from services.llm_scheduler import get_llm_scheduler
+
+    summaries, citations = sample_inputs(args.topic, args.papers)
+    requirements = {'length': args.length, 'llm_cache': 'bypass'}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one_draft():
+        async with semaphore:
+            generator = PaperGeneratorAgent()
+            start = time.perf_counter()
+            if args.stream:
+                async for _ in generator.generate_draft_stream(args.topic, summaries, citations, requirements):
+                    pass
+            else:
+                await generator.generate_draft(args.topic, summaries, citations, requirements)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_draft() for _ in range(args.drafts)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'drafts': args.drafts,
+        'seconds': round(elapsed, 2),
+        'drafts_per_minute': round(args.drafts * 60 / elapsed, 1),
+        'p50_seconds': round(percentile(latencies, 0.5), 2),
+        'p95_seconds': round(percentile(latencies, 0.95), 2),
+        'scheduler': get_llm_scheduler().metrics()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test draft generation against the local LLM stub")
+    parser.add_argument('--drafts', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=5)
+    parser.add_argument('--length', default='medium', choices=['short', 'medium', 'long'])
+    parser.add_argument('--papers', type=int, default=10)
+    parser.add_argument('--topic', default='AI in Healthcare')
+    parser.add_argument('--stream', action='store_true', help='stream section text while generating')
+    parser.add_argument('--latency', default='uniform:0.05:0.2')
+    parser.add_argument('--tokens-per-second', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--rate-500', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ['LLM_CACHE_ENABLED'] = 'false'
+    if not os.getenv('OPENAI_BASE_URL'):
+        config = StubConfig(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                            rate_429=args.rate_429, rate_500=args.rate_500, retry_after=0.5, seed=args.seed)
+        os.environ['OPENAI_BASE_URL'] = start_stub(config)
+        print(f"LLM stub listening at {os.environ['OPENAI_BASE_URL']}")
+
+    results = asyncio.run(run_load(args))
+    print(f"{results['drafts']} drafts in {results['seconds']}s "
+          f"({results['drafts_per_minute']} drafts/min), "
+          f"p50 {results['p50_seconds']}s, p95 {results['p95_seconds']}s")
+    for key, value in results['scheduler'].items():
+        print(f"  {key}: {value}")
+
+    try:
+        stub_stats = httpx.get(os.environ['OPENAI_BASE_URL'].rsplit('/v1', 1)[0] + '/stub/stats').json()
+        print("Stub: " + ', '.join(f"{key} {value}" for key, value in stub_stats.items() if key != 'config'))
+    except Exception as e:
+        print(f"Stub statistics unavailable: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Bulk draft generation through batch-file LLM submission.
+
+Nightly runs that generate many drafts care about cost and throughput, not
+per-call latency. In bulk mode the paper generator does not call the API:
+while a BatchRecorder is active, every section prompt that misses the LLM
+response cache is written to the recorder (keyed by its cache key) and the
+section falls back to its template. The collected requests are written as an
+OpenAI Batch API JSONL file and run by an executor; the responses are loaded
+into the LLM response cache, and the drafts are then regenerated through the
+normal pipeline, where every prompt is now a cache hit.
+
+Executors are pluggable: OpenAIBatchExecutor uploads the file to the Batch
+API and polls it, LocalBatchExecutor answers each request in-process (with
+the deterministic completions of services/llm_stub_server.py by default) so
+bulk runs can be tested offline.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Union
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+class BatchRecorder:
+    """Chat completion requests collected for one batch file, deduplicated by cache key."""
+
+    def __init__(self):
+        self.requests: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def add(self, custom_id: str, body: Dict[str, Any]):
+        self.requests.setdefault(custom_id, body)
+
+    def __len__(self) -> int:
+        return len(self.requests)
+
+    def write_jsonl(self, path: str) -> int:
+        """
+        Write the requests as a Batch API input file.
+
+        Args:
+            path: Destination JSONL path
+
+        Returns:
+            Number of requests written
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as handle:
+            for custom_id, body in self.requests.items():
+                line = {'custom_id': custom_id, 'method': 'POST', 'url': BATCH_ENDPOINT, 'body': body}
+                handle.write(json.dumps(line, ensure_ascii=False) + '\n')
+        return len(self.requests)
+
+_recorder: ContextVar[Optional[BatchRecorder]] = ContextVar('llm_batch_recorder', default=None)
+
+@contextmanager
+def recording(recorder: BatchRecorder) -> Iterator[BatchRecorder]:
+    """Collect (instead of send) the LLM requests made in the enclosed block."""
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+def current_recorder() -> Optional[BatchRecorder]:
+    """The active BatchRecorder, if LLM requests are being collected."""
+    return _recorder.get()
+
+def load_batch_output(path: str, cache) -> Dict[str, int]:
+    """
+    Store the successful responses of a Batch API output file in the LLM cache.
+
+    Args:
+        path: Output JSONL path
+        cache: LLMResponseCache receiving the completions under their custom IDs
+
+    Returns:
+        Counts of loaded and failed responses
+    """
+    counts = {'loaded': 0, 'failed': 0}
+    logger = logging.getLogger(__name__)
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                response = record.get('response') or {}
+                body = response.get('body') or {}
+                if record.get('error') or response.get('status_code') != 200:
+                    raise ValueError(record.get('error') or f"status {response.get('status_code')}")
+                content = (body['choices'][0]['message'].get('content') or '').strip()
+                if not content:
+                    raise ValueError("empty completion")
+                usage = body.get('usage') or {}
+                cache.put(record['custom_id'], body.get('model', ''), content,
+                          prompt_tokens=usage.get('prompt_tokens', 0) or 0,
+                          completion_tokens=usage.get('completion_tokens', 0) or 0)
+                counts['loaded'] += 1
+            except Exception as e:
+                counts['failed'] += 1
+                logger.warning(f"Error loading batch response: {str(e)}")
+    return counts
+
+class LocalBatchExecutor:
+    """Runs a batch file in-process, without the network."""
+
+    def __init__(self, complete: Optional[Callable[[Dict[str, Any]], Union[Dict[str, Any], Awaitable[Dict[str, Any]]]]] = None,
+                 max_concurrency: int = 8):
+        """
+        Args:
+            complete: Function (sync or async) mapping a request body to a
+                chat.completion object; defaults to the LLM stub's
+                deterministic completions
+            max_concurrency: Requests answered at once
+        """
+        self.logger = logging.getLogger(__name__)
+        if complete is None:
+            from services.llm_stub_server import StubCompletions, StubConfig, completion_response
+            stub = StubCompletions(StubConfig(latency='0'))
+            complete = lambda body: completion_response(body, stub.completion_tokens(body))
+        self.complete = complete
+        self.max_concurrency = max_concurrency
+
+    async def execute(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """
+        Answer every request of an input file and write the output file.
+
+        Returns:
+            Batch information ({'status', 'request_counts', ...})
+        """
+        with open(input_path, encoding='utf-8') as handle:
+            requests = [json.loads(line) for line in handle if line.strip()]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def answer(index: int, request: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                record = {'id': f"batch_req_{index}", 'custom_id': request['custom_id'], 'response': None, 'error': None}
+                try:
+                    body = self.complete(request['body'])
+                    if asyncio.iscoroutine(body):
+                        body = await body
+                    record['response'] = {'status_code': 200, 'request_id': f"local_{index}", 'body': body}
+                except Exception as e:
+                    record['error'] = {'code': 'local_executor_error', 'message': str(e)}
+                return record
+
+        records = await asyncio.gather(*(answer(i, request) for i, request in enumerate(requests)))
+        with open(output_path, 'w', encoding='utf-8') as handle:
+            for record in records:
+                handle.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+        failed = sum(1 for record in records if record['error'])
+        return {
+            'id': f"local_{int(time.time())}",
+            'status': 'completed',
+            'request_counts': {'total': len(records), 'completed': len(records) - failed, 'failed': failed}
+        }
+
+class OpenAIBatchExecutor:
+    """Submits a batch file to the OpenAI Batch API and polls it until it finishes."""
+
+    TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+    def __init__(self, client=None, poll_interval: Optional[float] = None,
+                 completion_window: str = '24h', timeout: Optional[float] = None):
+        if client is None:
+            try:
+                from openai.resources import AsyncBatches  # noqa: F401
+            except ImportError:
+                # Fail before the pipelines run, not after hours of collecting prompts
+                raise RuntimeError("The installed openai SDK has no Batch API; install openai>=1.55.3 "
+                                   "(see requirements.txt) or use the local executor")
+        self.logger = logging.getLogger(__name__)
+        self._client = client
+        self.poll_interval = poll_interval or float(os.getenv('BULK_BATCH_POLL_SECONDS', '60'))
+        self.completion_window = completion_window
+        self.timeout = timeout or float(os.getenv('BULK_BATCH_TIMEOUT', str(24 * 3600)))
+
+    @property
+    def client(self):
+        if self._client is None:
+            from services.llm_scheduler import get_llm_scheduler
+            self._client = get_llm_scheduler().client
+        return self._client
+
+    async def submit(self, input_path: str) -> str:
+        """Upload an input file and create a batch; returns the batch ID."""
+        with open(input_path, 'rb') as handle:
+            uploaded = await self.client.files.create(file=handle, purpose='batch')
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT, completion_window=self.completion_window
+        )
+        self.logger.info(f"Submitted batch {batch.id} ({input_path})")
+        return batch.id
+
+    async def poll(self, batch_id: str):
+        """Current state of a batch."""
+        return await self.client.batches.retrieve(batch_id)
+
+    async def download(self, batch, output_path: str):
+        """Write the output file of a finished batch (successful and failed requests)."""
+        with open(output_path, 'wb') as handle:
+            for file_id in (batch.output_file_id, getattr(batch, 'error_file_id', None)):
+                if file_id:
+                    content = await self.client.files.content(file_id)
+                    handle.write(content.read())
+
+    async def execute(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """
+        Submit an input file, wait for the batch to finish and download its output.
+
+        Returns:
+            Batch information ({'id', 'status', 'request_counts'})
+        """
+        batch_id = await self.submit(input_path)
+        deadline = time.monotonic() + self.timeout
+        batch = await self.poll(batch_id)
+        while batch.status not in self.TERMINAL_STATUSES:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Batch {batch_id} did not finish within {self.timeout:.0f}s")
+            await asyncio.sleep(self.poll_interval)
+            batch = await self.poll(batch_id)
+
+        await self.download(batch, output_path)
+        counts = getattr(batch, 'request_counts', None)
+        return {
+            'id': batch_id,
+            'status': batch.status,
+            'request_counts': counts.model_dump() if hasattr(counts, 'model_dump') else counts
+        }
+
+def get_batch_executor(name: Optional[str] = None):
+    """Executor selected by name or BULK_BATCH_EXECUTOR ('openai' or 'local')."""
+    name = (name or os.getenv('BULK_BATCH_EXECUTOR', 'openai')).lower()
+    if name == 'local':
+        return LocalBatchExecutor()
+    if name == 'openai':
+        return OpenAIBatchExecutor()
+    raise ValueError(f"Unknown batch executor: {name}")
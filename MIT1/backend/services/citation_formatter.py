@@ -0,0 +1,172 @@
+"""
+Reference formatting in the styles of the citation engine (APA, MLA, Chicago,
+IEEE, Harvard, Vancouver, Nature and any styles in CSL_STYLES_DIR).
+
+A pipeline only needs its references in one style, and the same papers come
+back across requests on related topics. CitationFormatter renders a style
+when it is asked for and keeps the result in a bounded LRU cache keyed by
+(canonical paper ID, style), shared by the whole process. Each entry also
+remembers the fields it was rendered from, so a paper whose metadata changed
+under the same ID is rendered again instead of served stale.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.csl_engine import DOI_PREFIXES, get_citation_engine
+
+# Paper fields a formatted reference depends on (besides the authors)
+REFERENCE_FIELDS = ('title', 'journal', 'year', 'volume', 'issue', 'pages', 'doi', 'url', 'published_date')
+
+def _last_name(author: Any) -> str:
+    return author.split()[-1] if author else 'Unknown'
+
+def in_text_citation(paper: Dict[str, Any], number: str, style: str) -> str:
+    """
+    In-text citation of one paper (without the surrounding brackets).
+
+    Args:
+        paper: Cited paper
+        number: Placeholder number as written in the text
+        style: Citation style (apa, mla, chicago, ieee; others cite as APA)
+
+    Returns:
+        Citation text, e.g. "Smith et al., 2021"
+    """
+    if style == 'ieee':
+        return number
+    authors = paper.get('authors', ['Unknown'])
+    if style == 'apa':
+        year = paper.get('year', 'n.d.')
+        if len(authors) == 1:
+            return f"{_last_name(authors[0])}, {year}"
+        if len(authors) == 2:
+            return f"{' & '.join(_last_name(a) for a in authors[:2])}, {year}"
+        return f"{_last_name(authors[0])} et al., {year}"
+    if style == 'mla':
+        return _last_name(authors[0]) if len(authors) >= 1 else "Unknown"
+    if style == 'chicago':
+        year = paper.get('year', 'n.d.')
+        return f"{_last_name(authors[0])} {year}" if len(authors) >= 1 else f"Unknown {year}"
+    year = paper.get('year', 'n.d.')
+    first_author = _last_name(authors[0]) if authors else 'Unknown'
+    return f"{first_author}, {year}"
+
+# Styles rendered when a caller does not ask for one
+DEFAULT_STYLES = ('apa', 'mla', 'chicago', 'ieee')
+
+def canonical_paper_id(paper: Dict[str, Any]) -> str:
+    """
+    Stable identifier of a paper across sources and requests.
+
+    Prefers the DOI, then source-specific IDs, then a hash of title and year.
+    """
+    doi = paper.get('doi')
+    if doi:
+        doi = str(doi).strip().lower()
+        if doi.startswith(DOI_PREFIXES):
+            doi = doi.split(':', 1)[1].lstrip() if doi.startswith('doi:') else doi.split('/', 3)[3]
+        return f"doi:{doi}"
+    for field in ('paper_id', 'pmid', 'arxiv_id', 'id'):
+        value = paper.get(field)
+        if value:
+            return f"{paper.get('source', '')}:{field}:{value}"
+    title = ' '.join(str(paper.get('title') or '').lower().split())
+    return 'title:' + hashlib.sha1(f"{title}|{paper.get('year', '')}".encode('utf-8')).hexdigest()
+
+class CitationFormatter:
+    """Formats references on demand, memoized per (canonical paper ID, style)."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries or int(os.getenv('CITATION_CACHE_SIZE', '10000'))
+        self.engine = get_citation_engine()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Tuple, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve_style(self, style: Optional[str]) -> str:
+        """Supported style for a requested one (APA when unknown)."""
+        style = (style or 'apa').lower()
+        return style if self.engine.has(style) else 'apa'
+
+    def format(self, paper: Dict[str, Any], style: Optional[str] = 'apa') -> str:
+        """
+        Reference of one paper in a citation style.
+
+        Args:
+            paper: Paper metadata
+            style: Name of a citation engine style (others format as APA)
+
+        Returns:
+            Formatted reference
+        """
+        style = self.resolve_style(style)
+        return self._memoized(paper, style, self.engine.renderer(style))
+
+    def in_text(self, paper: Dict[str, Any], number: str, style: Optional[str] = 'apa') -> str:
+        """
+        In-text citation of one paper, without brackets (e.g. "Smith et al., 2021").
+
+        Args:
+            paper: Cited paper
+            number: Reference number as written in the text (used by IEEE)
+            style: Citation style; styles other than the four cite as APA
+        """
+        if style == 'ieee':
+            return number
+        return self._memoized(paper, f"in-text:{style}", lambda p: in_text_citation(p, number, style))
+
+    def _memoized(self, paper: Dict[str, Any], style: str, render: Callable[[Dict[str, Any]], str]) -> str:
+        key = (canonical_paper_id(paper), style)
+        fields = (*map(paper.get, REFERENCE_FIELDS), tuple(paper.get('authors') or ()))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == fields:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        text = render(paper)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (fields, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return text
+
+    def format_many(self, papers: List[Dict[str, Any]], style: Optional[str] = 'apa') -> List[str]:
+        """References of several papers in one style, in order."""
+        references = []
+        for paper in papers:
+            try:
+                references.append(self.format(paper, style))
+            except Exception as e:
+                self.logger.error(f"Error formatting {style} citation: {str(e)}")
+                references.append(str(paper.get('title') or 'Untitled'))
+        return references
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+_formatter: Optional[CitationFormatter] = None
+
+def get_citation_formatter() -> CitationFormatter:
+    """The process-wide citation formatter."""
+    global _formatter
+    if _formatter is None:
+        _formatter = CitationFormatter()
+    return _formatter
@@ -0,0 +1,420 @@
+"""
+Citation graph of the retrieved papers, with PageRank and HITS centrality.
+
+Reference and cited-by lists are fetched in bulk: OpenAlex works are looked
+up 50 at a time by ID or DOI (referenced_works), and the works citing them
+with one `cites:` filter per batch; Semantic Scholar papers go through the
+paper batch endpoint (references and citations). Every fetched list is kept
+in a SQLite cache, so a paper's links are requested once per TTL no matter
+how many pipelines retrieve it.
+
+The graph holds the retrieved papers plus the works one hop out (their
+references and citing works). Edges (citing -> cited) are stored as CSR
+arrays, and PageRank and HITS are computed by NumPy power iteration with
+bincount-based sparse products.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; centrality is then unavailable
+    np = None
+
+OPENALEX_WORKS = "https://api.openalex.org/works"
+SEMANTIC_SCHOLAR_BATCH = "https://api.semanticscholar.org/graph/v1/paper/batch"
+OPENALEX_BATCH = 50  # values per OpenAlex OR-filter
+SEMANTIC_SCHOLAR_BATCH_SIZE = 500
+
+def paper_graph_key(paper: Dict[str, Any]) -> Optional[str]:
+    """
+    Graph key of a retrieved paper: 'oa:W…', 's2:…' or 'doi:…' (None if unknown).
+
+    DOI keys are resolved to OpenAlex works when the links are fetched.
+    """
+    url = str(paper.get('url') or '')
+    if paper.get('source') == 'openalex' and 'openalex.org/W' in url:
+        return 'oa:' + url.rsplit('/', 1)[-1]
+    if paper.get('source') == 'semantic_scholar' and paper.get('paper_id'):
+        return f"s2:{paper['paper_id']}"
+    doi = str(paper.get('doi') or '').strip().lower()
+    if doi:
+        return 'doi:' + doi.replace('https://doi.org/', '').replace('http://dx.doi.org/', '')
+    return None
+
+class CitationLinkCache:
+    """SQLite cache of per-paper reference and cited-by lists."""
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path or os.getenv('CITATION_GRAPH_CACHE_PATH', os.path.join('.cache', 'citation_graph.sqlite3'))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('CITATION_GRAPH_TTL', str(30 * 24 * 3600)))
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Cached, unexpired link records by key."""
+        keys = list(dict.fromkeys(keys))
+        records: Dict[str, Dict[str, Any]] = {}
+        try:
+            with self._lock:
+                connection = self._connect()
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    rows = connection.execute(
+                        f"SELECT key, data, fetched_at FROM citation_links WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk
+                    ).fetchall()
+                    for key, data, fetched_at in rows:
+                        if self.ttl_seconds <= 0 or time.time() - fetched_at <= self.ttl_seconds:
+                            records[key] = json.loads(data)
+        except Exception as e:
+            self.logger.warning(f"Error reading citation graph cache: {str(e)}")
+        return records
+
+    def put_many(self, records: Dict[str, Dict[str, Any]]):
+        """Store link records ({'key', 'references', 'cited_by'}) by key."""
+        if not records:
+            return
+        try:
+            now = time.time()
+            with self._lock:
+                connection = self._connect()
+                connection.executemany(
+                    "INSERT OR REPLACE INTO citation_links (key, data, fetched_at) VALUES (?, ?, ?)",
+                    [(key, json.dumps(record), now) for key, record in records.items()]
+                )
+                connection.commit()
+        except Exception as e:
+            self.logger.warning(f"Error writing citation graph cache: {str(e)}")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS citation_links ("
+                "key TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+class CitationLinkFetcher:
+    """Fetches reference and cited-by lists in bulk, through the link cache."""
+
+    def __init__(self, cache: Optional[CitationLinkCache] = None, max_citing: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        """
+        Args:
+            cache: Link cache (the shared one by default)
+            max_citing: Citing works kept per paper (newest first)
+            timeout: Seconds per HTTP request
+        """
+        self.logger = logging.getLogger(__name__)
+        self.cache = cache or get_citation_link_cache()
+        self.max_citing = max_citing or int(os.getenv('CITATION_GRAPH_MAX_CITING', '100'))
+        self.timeout = aiohttp.ClientTimeout(total=timeout or float(os.getenv('CITATION_GRAPH_REQUEST_TIMEOUT', '20')))
+        self.mailto = os.getenv('OPENALEX_MAILTO', 'research@mit.edu')
+        self.s2_api_key = os.getenv('SEMANTIC_SCHOLAR_API_KEY', '')
+        self.openalex_api_key = os.getenv('OPENALEX_API_KEY', '')
+        self.stats = {'cached': 0, 'fetched': 0, 'requests': 0, 'failed_requests': 0}
+
+    async def fetch(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Link records for graph keys.
+
+        Args:
+            keys: Keys from paper_graph_key
+
+        Returns:
+            {key: {'key': resolved key, 'references': [...], 'cited_by': [...]}};
+            keys that could not be fetched are missing
+        """
+        keys = list(dict.fromkeys(key for key in keys if key))
+        records = self.cache.get_many(keys)
+        self.stats['cached'] += len(records)
+        missing = [key for key in keys if key not in records]
+        if not missing:
+            return records
+
+        fetched: Dict[str, Dict[str, Any]] = {}
+        connector = aiohttp.TCPConnector(limit=8)
+        async with aiohttp.ClientSession(timeout=self.timeout, connector=connector) as session:
+            openalex = [key for key in missing if key.startswith(('oa:', 'doi:'))]
+            semantic_scholar = [key for key in missing if key.startswith('s2:')]
+            tasks = [self._fetch_openalex(session, openalex[i:i + OPENALEX_BATCH])
+                     for i in range(0, len(openalex), OPENALEX_BATCH)]
+            tasks += [self._fetch_semantic_scholar(session, semantic_scholar[i:i + SEMANTIC_SCHOLAR_BATCH_SIZE])
+                      for i in range(0, len(semantic_scholar), SEMANTIC_SCHOLAR_BATCH_SIZE)]
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(result, Exception):
+                    self.logger.warning(f"Error fetching citation links: {str(result)}")
+                else:
+                    fetched.update(result)
+
+        records.update(fetched)
+        return records
+
+    def _cache_batch(self, records: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Cache one batch as soon as it is fetched, so a caller's timeout keeps finished batches."""
+        self.cache.put_many(records)
+        self.stats['fetched'] += len(records)
+        return records
+
+    async def _get_json(self, session: aiohttp.ClientSession, method: str, url: str,
+                        retries: int = 2, **kwargs) -> Optional[Any]:
+        for attempt in range(retries + 1):
+            self.stats['requests'] += 1
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    if response.status not in (429, 500, 502, 503, 504):
+                        self.logger.warning(f"{method} {url} returned {response.status}")
+                        break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.logger.warning(f"{method} {url} failed on attempt {attempt + 1}: {str(e)}")
+            await asyncio.sleep(0.5 * 2 ** attempt)
+        self.stats['failed_requests'] += 1
+        return None
+
+    async def _fetch_openalex(self, session: aiohttp.ClientSession, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """References of up to 50 works (by ID or DOI) and the works citing them."""
+        headers = {'Authorization': f"Bearer {self.openalex_api_key}"} if self.openalex_api_key else None
+        ids = [key[3:] for key in keys if key.startswith('oa:')]
+        dois = [key[4:] for key in keys if key.startswith('doi:')]
+        works: List[Dict[str, Any]] = []
+        records: Dict[str, Dict[str, Any]] = {}
+        for name, prefix, values in (('openalex', 'oa:', ids), ('doi', 'doi:', dois)):
+            if values:
+                data = await self._get_json(session, 'GET', OPENALEX_WORKS, headers=headers, params={
+                    'filter': f"{name}:{'|'.join(values)}", 'select': 'id,doi,referenced_works',
+                    'per-page': OPENALEX_BATCH, 'mailto': self.mailto
+                })
+                if data is not None:
+                    works.extend(data.get('results', []))
+                    # Works OpenAlex does not know are cached as unlinked, not requested again
+                    for value in values:
+                        records[prefix + value] = {'key': prefix + value, 'references': [], 'cited_by': []}
+
+        by_work: Dict[str, Dict[str, Any]] = {}
+        for work in works:
+            work_id = 'oa:' + str(work.get('id', '')).rsplit('/', 1)[-1]
+            record = {'key': work_id, 'references': ['oa:' + str(ref).rsplit('/', 1)[-1] for ref in work.get('referenced_works') or []],
+                      'cited_by': []}
+            by_work[work_id] = record
+            records[work_id] = record
+            doi = str(work.get('doi') or '').lower().replace('https://doi.org/', '')
+            if doi and f"doi:{doi}" in keys:
+                records[f"doi:{doi}"] = record
+        if not by_work:
+            return self._cache_batch(records)
+
+        # Works citing the batch, newest first; each cites batch members in its referenced_works.
+        # Up to max_citing are kept per paper, as on the Semantic Scholar path: a paper that is
+        # full leaves the filter and paging restarts for the rest (repeats are skipped).
+        pending = dict(by_work)
+        citing_seen = {key: set() for key in by_work}
+        cursor, pages = '*', max(1, self.max_citing * len(by_work) // 200) + len(by_work)
+        while pending and cursor and pages:
+            pages -= 1
+            data = await self._get_json(session, 'GET', OPENALEX_WORKS, headers=headers, params={
+                'filter': 'cites:' + '|'.join(key[3:] for key in pending), 'select': 'id,referenced_works',
+                'sort': 'publication_date:desc', 'per-page': 200, 'cursor': cursor, 'mailto': self.mailto
+            })
+            if not data:
+                # Partial cited-by lists are used for this graph but not cached for the whole TTL
+                self.logger.warning(f"Citing works of {len(by_work)} papers incomplete; batch not cached")
+                return records
+            for work in data.get('results', []):
+                citing = 'oa:' + str(work.get('id', '')).rsplit('/', 1)[-1]
+                for ref in work.get('referenced_works') or []:
+                    key = 'oa:' + str(ref).rsplit('/', 1)[-1]
+                    if (key in pending and citing not in citing_seen[key]
+                            and len(pending[key]['cited_by']) < self.max_citing):
+                        citing_seen[key].add(citing)
+                        pending[key]['cited_by'].append(citing)
+            full = [key for key, record in pending.items() if len(record['cited_by']) >= self.max_citing]
+            for key in full:
+                del pending[key]
+            if full:
+                cursor = '*'
+            else:
+                cursor = (data.get('meta') or {}).get('next_cursor') if data.get('results') else None
+        return self._cache_batch(records)
+
+    async def _fetch_semantic_scholar(self, session: aiohttp.ClientSession, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """References and citations of up to 500 Semantic Scholar papers in one request."""
+        headers = {'x-api-key': self.s2_api_key} if self.s2_api_key else None
+        data = await self._get_json(session, 'POST', SEMANTIC_SCHOLAR_BATCH, headers=headers,
+                                    params={'fields': 'references.paperId,citations.paperId'},
+                                    json={'ids': [key[3:] for key in keys]})
+        records: Dict[str, Dict[str, Any]] = {}
+        for key, paper in zip(keys, data or []):
+            if not paper:
+                # Unknown to Semantic Scholar: cached as unlinked
+                records[key] = {'key': key, 'references': [], 'cited_by': []}
+                continue
+            records[key] = {
+                'key': key,
+                'references': [f"s2:{ref['paperId']}" for ref in paper.get('references') or [] if ref.get('paperId')],
+                'cited_by': [f"s2:{ref['paperId']}" for ref in (paper.get('citations') or [])[:self.max_citing]
+                             if ref.get('paperId')]
+            }
+        return self._cache_batch(records)
+
+class CitationGraph:
+    """Directed citation graph (citing -> cited) over papers and their one-hop neighbours."""
+
+    def __init__(self, node_keys: List[str], paper_nodes: List[Optional[int]], sources, targets):
+        """
+        Args:
+            node_keys: Graph key of each node
+            paper_nodes: Node of each retrieved paper (None when it has no links)
+            sources, targets: Node indices of each citation edge
+        """
+        self.node_keys = node_keys
+        self.paper_nodes = paper_nodes
+        self.size = len(node_keys)
+        codes = np.unique(np.asarray(sources, dtype=np.int64) * max(self.size, 1) + np.asarray(targets, dtype=np.int64))
+        self.sources = codes // max(self.size, 1)
+        self.targets = codes % max(self.size, 1)
+        # CSR of out-links; sources are sorted because the codes are
+        self.out_degree = np.bincount(self.sources, minlength=self.size)
+        self.indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(self.out_degree, out=self.indptr[1:])
+        self.indices = self.targets
+        self.in_degree = np.bincount(self.targets, minlength=self.size)
+
+    @classmethod
+    def from_links(cls, paper_keys: List[Optional[str]], links: Dict[str, Dict[str, Any]]) -> 'CitationGraph':
+        """
+        Build the graph of retrieved papers (by key) and their fetched links.
+
+        Args:
+            paper_keys: Graph key of each retrieved paper
+            links: Link records from CitationLinkFetcher.fetch
+        """
+        nodes: Dict[str, int] = {}
+        node_keys: List[str] = []
+
+        def node(key: str) -> int:
+            index = nodes.get(key)
+            if index is None:
+                index = nodes[key] = len(node_keys)
+                node_keys.append(key)
+            return index
+
+        paper_nodes: List[Optional[int]] = []
+        for key in paper_keys:
+            record = links.get(key) if key else None
+            paper_nodes.append(node(record['key']) if record else None)
+
+        sources: List[int] = []
+        targets: List[int] = []
+        for key in dict.fromkeys(k for k in paper_keys if k):
+            record = links.get(key)
+            if not record:
+                continue
+            paper = nodes[record['key']]
+            for reference in record.get('references', []):
+                sources.append(paper)
+                targets.append(node(reference))
+            for citing in record.get('cited_by', []):
+                sources.append(node(citing))
+                targets.append(paper)
+        return cls(node_keys, paper_nodes, sources, targets)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.sources)
+
+    def pagerank(self, damping: float = 0.85, tolerance: float = 1e-10, max_iterations: int = 100):
+        """PageRank of every node (sums to 1); dangling nodes spread their rank uniformly."""
+        if self.size == 0:
+            return np.zeros(0)
+        rank = np.full(self.size, 1.0 / self.size)
+        out_degree = self.out_degree.astype(float)
+        dangling = out_degree == 0
+        inverse_degree = np.divide(1.0, out_degree, out=np.zeros(self.size), where=~dangling)
+        for _ in range(max_iterations):
+            spread = rank * inverse_degree
+            updated = np.bincount(self.targets, weights=spread[self.sources], minlength=self.size)
+            updated = damping * (updated + rank[dangling].sum() / self.size) + (1.0 - damping) / self.size
+            if np.abs(updated - rank).sum() < tolerance:
+                rank = updated
+                break
+            rank = updated
+        return rank
+
+    def hits(self, tolerance: float = 1e-10, max_iterations: int = 100) -> Tuple[Any, Any]:
+        """HITS (hub, authority) scores, each normalized to sum to 1."""
+        hubs = np.full(self.size, 1.0 / max(self.size, 1))
+        authorities = hubs
+        if self.edge_count == 0:
+            return hubs, authorities
+        for _ in range(max_iterations):
+            authorities = np.bincount(self.targets, weights=hubs[self.sources], minlength=self.size)
+            authorities /= authorities.sum() or 1.0
+            updated = np.bincount(self.sources, weights=authorities[self.targets], minlength=self.size)
+            updated /= updated.sum() or 1.0
+            if np.abs(updated - hubs).sum() < tolerance:
+                hubs = updated
+                break
+            hubs = updated
+        return hubs, authorities
+
+    def paper_edges(self) -> List[Tuple[int, int]]:
+        """Citation edges between retrieved papers, as (citing paper index, cited paper index)."""
+        papers_of: Dict[int, List[int]] = {}
+        for index, node in enumerate(self.paper_nodes):
+            if node is not None:
+                papers_of.setdefault(node, []).append(index)
+        if not papers_of:
+            return []
+        is_paper = np.zeros(self.size, dtype=bool)
+        is_paper[list(papers_of)] = True
+        both = is_paper[self.sources] & is_paper[self.targets]
+        return [(papers_of[s][0], papers_of[t][0])
+                for s, t in zip(self.sources[both].tolist(), self.targets[both].tolist()) if s != t]
+
+async def build_citation_graph(papers: List[Dict[str, Any]],
+                               fetcher: Optional[CitationLinkFetcher] = None) -> Optional[CitationGraph]:
+    """
+    Fetch the links of the retrieved papers and build their citation graph.
+
+    Returns:
+        CitationGraph, or None when NumPy is missing or no paper has links
+    """
+    if np is None:
+        return None
+    fetcher = fetcher or CitationLinkFetcher()
+    keys = [paper_graph_key(paper) for paper in papers]
+    links = await fetcher.fetch([key for key in keys if key])
+    if not links:
+        return None
+    return CitationGraph.from_links(keys, links)
+
+def citation_graph_enabled() -> bool:
+    return os.getenv('CITATION_GRAPH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+_caches: Dict[str, CitationLinkCache] = {}
+
+def get_citation_link_cache(path: Optional[str] = None) -> CitationLinkCache:
+    """Process-wide link cache for a database path."""
+    path = path or os.getenv('CITATION_GRAPH_CACHE_PATH', os.path.join('.cache', 'citation_graph.sqlite3'))
+    if path not in _caches:
+        _caches[path] = CitationLinkCache(path)
+    return _caches[path]
@@ -0,0 +1,100 @@
+"""
+Citation placeholder replacement for whole drafts.
+
+Section text cites source papers with numbered placeholders ([1], [2, 5]).
+CitationReplacer turns them into in-text citations of one style in a single
+scan per section with a precompiled pattern; the citation of each number is
+worked out the first time it is seen and reused for every later hit, across
+all sections of the draft (and, through the shared CitationFormatter, across
+drafts).
+"""
+
+import re
+from typing import Any, Dict, List, Match, Optional, Tuple
+
+from services.citation_formatter import get_citation_formatter
+
+PLACEHOLDER_PATTERN = re.compile(r'\[(\d+(?:,\s*\d+)*)\]')
+
+class CitationReplacer:
+    """Replaces the citation placeholders of a draft's sections in one style."""
+
+    def __init__(self, papers: List[Dict[str, Any]], citation_style: str = 'apa'):
+        self.papers = papers
+        self.citation_style = citation_style
+        self._formatter = get_citation_formatter()
+        self._citations: Dict[str, str] = {}  # placeholder number -> citation text
+        self._placeholders: Dict[str, str] = {}  # placeholder contents -> replacement
+
+    def citation(self, number: str) -> str:
+        """In-text citation for one placeholder number (cached)."""
+        text = self._citations.get(number)
+        if text is None:
+            try:
+                index = int(number) - 1  # Convert to 0-based index
+                # Numbers beyond the source papers are kept as they are
+                text = self._formatter.in_text(self.papers[index], number, self.citation_style) if index < len(self.papers) else number
+            except (ValueError, IndexError):
+                text = number
+            self._citations[number] = text
+        return text
+
+    def _replace(self, match: Match) -> str:
+        contents = match.group(1)
+        replacement = self._placeholders.get(contents)
+        if replacement is None:
+            texts = [self.citation(number.strip()) for number in contents.split(',')]
+            if self.citation_style == 'ieee':
+                replacement = f"[{', '.join(texts)}]"
+            else:
+                replacement = f"({'; '.join(texts)})"
+            self._placeholders[contents] = replacement
+        return replacement
+
+    def replace(self, text: str) -> Tuple[str, int]:
+        """
+        Replace the placeholders of one text.
+
+        Returns:
+            (text with citations, number of placeholders replaced)
+        """
+        return PLACEHOLDER_PATTERN.subn(self._replace, text)
+
+    def replace_draft(self, draft: Dict[str, Any], sections: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Replace the placeholders of every section of a draft, in place.
+
+        Handles the abstract and the 'sections' mapping (dicts with 'content'
+        or plain strings); with `sections`, those top-level string fields are
+        replaced instead. The references section is skipped: its "[n]"
+        markers number the list, they are not placeholders.
+
+        Args:
+            draft: Paper draft
+            sections: Top-level section fields of a flat draft
+
+        Returns:
+            Placeholders replaced per section
+        """
+        replacements: Dict[str, int] = {}
+        if sections is not None:
+            for name in sections:
+                if name != 'references' and isinstance(draft.get(name), str):
+                    draft[name], replacements[name] = self.replace(draft[name])
+            return replacements
+
+        abstract = draft.get('abstract')
+        if abstract and isinstance(abstract, str):
+            draft['abstract'], replacements['abstract'] = self.replace(abstract)
+        for name, section in (draft.get('sections') or {}).items():
+            if name == 'references':
+                continue
+            if isinstance(section, dict) and isinstance(section.get('content'), str):
+                if name == 'abstract' and section['content'] == abstract:
+                    # The abstract section holds the same text as draft['abstract']
+                    section['content'] = draft['abstract']
+                    continue
+                section['content'], replacements[name] = self.replace(section['content'])
+            elif isinstance(section, str):
+                draft['sections'][name], replacements[name] = self.replace(section)
+        return replacements
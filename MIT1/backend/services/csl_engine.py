@@ -0,0 +1,372 @@
+"""
+Citation styles as data, compiled into render functions.
+
+A style is a CSL-like definition: how the author names are written and
+joined, and a layout of blocks (the same block syntax as section templates)
+over the paper's fields. Each style is compiled once into a plain Python
+function, so rendering a reference costs about as much as a hand-written
+f-string, and a new style is a JSON file instead of new code:
+
+    {
+        "names": {"form": "family-initials", "delimiter": ", ", "and": " & ",
+                  "et_al_min": 6, "et_al_use_first": 1, "et_al": " et al."},
+        "layout": [
+            "{names} ({year|n.d.}) {title}.",
+            {"if": "journal", "text": " {journal}"},
+            {"if": "doi", "text": " https://doi.org/{doi}", "else": [
+                {"if": "url", "text": " {url}"}
+            ]}
+        ]
+    }
+
+Layout fields are the paper's own fields plus `names` (the rendered author
+list), `year` (taken from the publication date when missing) and `doi`
+(without a resolver prefix). Name forms are "as-is", "family",
+"family-initials" (Smith, J. A.), "initials-family" (J. A. Smith) and
+"family-initials-compact" (Smith JA); parsed and formatted names are cached,
+so authors shared across a bibliography are parsed once. Styles in
+CSL_STYLES_DIR (one <style>.json per style) are added to the built-in ones.
+"""
+
+import os
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.section_templates import compile_blocks
+
+# Rendered author lists kept per style before the cache is reset
+NAME_CACHE_SIZE = 65536
+DOI_PREFIXES = ('https://doi.org/', 'http://doi.org/', 'https://dx.doi.org/', 'http://dx.doi.org/', 'doi:')
+
+BUILTIN_STYLES: Dict[str, Dict[str, Any]] = {
+    'apa': {
+        'title': 'APA',
+        'names': {'delimiter': ', ', 'and': ', & ', 'et_al_min': 8, 'et_al_use_first': 6,
+                  'et_al': ', ... ', 'et_al_use_last': True},
+        'layout': [
+            "{names} ({year}). {title}. ",
+            {'if': 'journal', 'blocks': [
+                "{journal}",
+                {'if': 'volume', 'text': ", {volume}"},
+                {'if': 'pages', 'text': ", {pages}"}
+            ]},
+            {'if': 'doi', 'text': ". https://doi.org/{doi}", 'else': [
+                {'if': 'url', 'text': ". Retrieved from {url}"}
+            ]}
+        ]
+    },
+    'mla': {
+        'title': 'MLA',
+        'names': {'delimiter': ', ', 'and': ', and '},
+        'layout': [
+            "{names}. \"{title}.\" ",
+            {'if': 'journal', 'blocks': [
+                "{journal}",
+                {'if': 'volume', 'text': ", vol. {volume}"},
+                {'if': 'pages', 'text': ", {year}, pp. {pages}", 'else': ", {year}"}
+            ]},
+            {'if': 'url', 'text': ". Web. {url}"}
+        ]
+    },
+    'chicago': {
+        'title': 'Chicago',
+        'names': {'delimiter': ', ', 'and': ', and '},
+        'layout': [
+            "{names}. \"{title}.\" ",
+            {'if': 'journal', 'blocks': [
+                "{journal}",
+                {'if': 'volume', 'text': " {volume}"},
+                {'if': 'pages', 'text': ", no. {issue} ({year}): {pages}", 'else': " ({year})"}
+            ]},
+            {'if': 'doi', 'text': ". https://doi.org/{doi}", 'else': [
+                {'if': 'url', 'text': ". {url}"}
+            ]}
+        ]
+    },
+    'ieee': {
+        'title': 'IEEE',
+        'names': {'delimiter': ', ', 'and': ', ', 'et_al_min': 7, 'et_al_use_first': 3, 'et_al': ' et al.'},
+        'layout': [
+            "{names}, \"{title},\" ",
+            {'if': 'journal', 'blocks': [
+                "{journal}",
+                {'if': 'volume', 'text': ", vol. {volume}"},
+                {'if': 'pages', 'text': ", pp. {pages}"},
+                ", {year}"
+            ]},
+            {'if': 'doi', 'text': ", doi: {doi}", 'else': [
+                {'if': 'url', 'text': ". [Online]. Available: {url}"}
+            ]}
+        ]
+    },
+    'harvard': {
+        'title': 'Harvard',
+        'names': {'form': 'family-initials', 'delimiter': ', ', 'and': ' and ',
+                  'et_al_min': 4, 'et_al_use_first': 1, 'et_al': ' et al.'},
+        'layout': [
+            "{names} ({year|n.d.}) '{title}'",
+            {'if': 'journal', 'blocks': [
+                ", {journal}",
+                {'if': 'volume', 'text': ", {volume}"},
+                {'if': 'issue', 'text': "({issue})"},
+                {'if': 'pages', 'text': ", pp. {pages}"}
+            ]},
+            ".",
+            {'if': 'doi', 'text': " doi:{doi}.", 'else': [
+                {'if': 'url', 'text': " Available at: {url}."}
+            ]}
+        ]
+    },
+    'vancouver': {
+        'title': 'Vancouver',
+        'names': {'form': 'family-initials-compact', 'delimiter': ', ', 'and': ', ',
+                  'et_al_min': 7, 'et_al_use_first': 6, 'et_al': ', et al.'},
+        'layout': [
+            "{names}. {title}. ",
+            {'if': 'journal', 'text': "{journal}. "},
+            "{year}",
+            {'if': 'volume', 'text': ";{volume}"},
+            {'if': 'issue', 'text': "({issue})"},
+            {'if': 'pages', 'text': ":{pages}"},
+            ".",
+            {'if': 'doi', 'text': " doi:{doi}"}
+        ]
+    },
+    'nature': {
+        'title': 'Nature',
+        'names': {'form': 'family-initials', 'delimiter': ', ', 'and': ' & ',
+                  'et_al_min': 6, 'et_al_use_first': 1, 'et_al': ' et al.'},
+        'layout': [
+            "{names} {title}. ",
+            {'if': 'journal', 'blocks': [
+                "{journal} ",
+                {'if': 'volume', 'text': "{volume}, "},
+                {'if': 'pages', 'text': "{pages} "}
+            ]},
+            "({year|n.d.}).",
+            {'if': 'doi', 'text': " https://doi.org/{doi}"}
+        ]
+    }
+}
+
+Renderer = Callable[[Dict[str, Any]], str]
+
+def normalize_doi(doi: str) -> str:
+    """A DOI without its resolver URL or "doi:" prefix."""
+    if doi.lower().startswith(DOI_PREFIXES):
+        return doi.split(':', 1)[1].lstrip() if doi[:4].lower() == 'doi:' else doi.split('/', 3)[3]
+    return doi
+
+@lru_cache(maxsize=16384)
+def parse_name(name: str) -> Tuple[Tuple[str, ...], str]:
+    """
+    Split a personal name into given names and family name.
+
+    "Family, Given Names" is read as written; otherwise the last word is the
+    family name.
+
+    Returns:
+        (given names, family name)
+    """
+    if ',' in name:
+        family, given = name.split(',', 1)
+        return tuple(given.split()), family.strip()
+    parts = name.split()
+    if not parts:
+        return (), ''
+    return tuple(parts[:-1]), parts[-1]
+
+def _initials(given: Tuple[str, ...], separator: str) -> List[str]:
+    initials = []
+    for part in given:
+        for piece in part.replace('-', ' ').replace('.', ' ').split():
+            initials.append(piece[0].upper() + separator)
+    return initials
+
+@lru_cache(maxsize=65536)
+def format_name(name: str, form: str) -> str:
+    """One author name in a name form (see the module docstring)."""
+    if form == 'as-is':
+        return name
+    given, family = parse_name(name)
+    if not family:
+        return name.strip()
+    if form == 'family':
+        return family
+    if form == 'family-initials':
+        initials = ' '.join(_initials(given, '.'))
+        return f"{family}, {initials}" if initials else family
+    if form == 'initials-family':
+        return ' '.join(_initials(given, '.') + [family])
+    if form == 'family-initials-compact':
+        initials = ''.join(_initials(given, ''))
+        return f"{family} {initials}" if initials else family
+    raise ValueError(f"Unknown name form: {form}")
+
+NAME_FORMS = ('as-is', 'family', 'family-initials', 'initials-family', 'family-initials-compact')
+
+def _author_name(author: Any) -> str:
+    if isinstance(author, dict):
+        name = author.get('name')
+        if not name:
+            name = ' '.join(str(author[key]) for key in ('given', 'family') if author.get(key))
+        return name
+    return str(author)
+
+def _compile_names(spec: Dict[str, Any]) -> Callable[[Any], str]:
+    """Author list -> text, for one style's 'names' definition."""
+    form = spec.get('form', 'as-is')
+    if form not in NAME_FORMS:
+        raise ValueError(f"Unknown name form: {form}")
+    delimiter = spec.get('delimiter', ', ')
+    last_delimiter = spec.get('and', delimiter)
+    et_al_min = spec.get('et_al_min')
+    use_first = spec.get('et_al_use_first', 1)
+    et_al = spec.get('et_al', ' et al.')
+    use_last = spec.get('et_al_use_last', False)
+    empty = spec.get('empty', 'Unknown Author')
+
+    cache: Dict[Tuple, str] = {}  # author tuple -> rendered names
+
+    def names(authors: Any) -> str:
+        if not authors:
+            return empty
+        try:
+            key = tuple(authors)
+            text = cache.get(key)
+        except TypeError:  # unhashable author entries (dicts)
+            key = text = None
+        if text is None:
+            text = join(authors)
+            if key is not None:
+                if len(cache) >= NAME_CACHE_SIZE:
+                    cache.clear()
+                cache[key] = text
+        return text
+
+    def join(authors: Any) -> str:
+        names = [author if author.__class__ is str else _author_name(author) for author in authors if author]
+        if form != 'as-is':
+            names = [format_name(name, form) for name in names]
+        count = len(names)
+        if count == 0:
+            return empty
+        if count == 1:
+            return names[0]
+        if et_al_min and count >= et_al_min:
+            text = delimiter.join(names[:use_first]) + et_al
+            return text + names[-1] if use_last else text
+        return delimiter.join(names[:-1]) + last_delimiter + names[-1]
+
+    return names
+
+def compile_style(definition: Dict[str, Any]) -> Renderer:
+    """
+    Compile a style definition into render(paper).
+
+    Args:
+        definition: {'names': {...}, 'layout': [blocks]}
+
+    Returns:
+        Function formatting one paper's reference
+    """
+    names = _compile_names(definition.get('names') or {})
+    layout = compile_blocks({'separator': '', 'blocks': definition.get('layout') or ["{names}. {title}."]})
+
+    def render(paper: Dict[str, Any]) -> str:
+        context = dict(paper)
+        context['names'] = names(paper.get('authors'))
+        doi = paper.get('doi')
+        if doi.__class__ is str and doi[:1] in 'hHdD':
+            context['doi'] = normalize_doi(doi)
+        year = paper.get('year')
+        if year is None or year == '':
+            date = paper.get('published_date') or paper.get('publication_date')
+            if date and str(date)[:4].isdigit():
+                context['year'] = str(date)[:4]
+        return layout(context)
+
+    return render
+
+def load_styles(directory: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """Style definitions from <name>.json files in a directory."""
+    styles: Dict[str, Dict[str, Any]] = {}
+    if not directory or not os.path.isdir(directory):
+        return styles
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.json'):
+            with open(os.path.join(directory, filename), encoding='utf-8') as handle:
+                styles[filename[:-5].lower()] = json.load(handle)
+    return styles
+
+class CitationEngine:
+    """Compiled citation styles, rendering references one at a time or in bulk."""
+
+    def __init__(self, styles: Optional[Dict[str, Dict[str, Any]]] = None, styles_dir: Optional[str] = None):
+        """
+        Args:
+            styles: Extra style definitions by name
+            styles_dir: Directory of <style>.json files (default CSL_STYLES_DIR)
+        """
+        self.logger = logging.getLogger(__name__)
+        definitions = dict(BUILTIN_STYLES)
+        try:
+            definitions.update(load_styles(styles_dir or os.getenv('CSL_STYLES_DIR')))
+        except Exception as e:
+            self.logger.error(f"Error loading citation styles: {str(e)}")
+        definitions.update(styles or {})
+
+        self.titles: Dict[str, str] = {}
+        self.renderers: Dict[str, Renderer] = {}
+        for name, definition in definitions.items():
+            try:
+                self.renderers[name.lower()] = compile_style(definition)
+                self.titles[name.lower()] = definition.get('title', name)
+            except Exception as e:
+                self.logger.error(f"Error compiling citation style {name}: {str(e)}")
+
+    def has(self, style: Optional[str]) -> bool:
+        return bool(style) and style.lower() in self.renderers
+
+    def style_names(self) -> List[str]:
+        return list(self.renderers)
+
+    def renderer(self, style: Optional[str] = 'apa') -> Renderer:
+        """Render function of a style (APA when unknown)."""
+        return self.renderers.get((style or 'apa').lower()) or self.renderers['apa']
+
+    def render(self, paper: Dict[str, Any], style: Optional[str] = 'apa') -> str:
+        """Reference of one paper in a style."""
+        return self.renderer(style)(paper)
+
+    def render_many(self, papers: List[Dict[str, Any]], style: Optional[str] = 'apa') -> List[str]:
+        """
+        References of a whole bibliography in one style, in order.
+
+        Args:
+            papers: Papers to format
+            style: Style name (APA when unknown)
+
+        Returns:
+            Formatted references (the title for papers that fail to render)
+        """
+        render = self.renderer(style)
+        references = []
+        for paper in papers:
+            try:
+                references.append(render(paper))
+            except Exception as e:
+                self.logger.error(f"Error formatting {style} citation: {str(e)}")
+                references.append(str(paper.get('title') or 'Untitled'))
+        return references
+
+_engine: Optional[CitationEngine] = None
+
+def get_citation_engine() -> CitationEngine:
+    """The process-wide citation engine."""
+    global _engine
+    if _engine is None:
+        _engine = CitationEngine()
+    return _engine
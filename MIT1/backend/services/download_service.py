@@ -10,6 +10,8 @@ from datetime import datetime
 import tempfile
 import os
 
+from services.reference_list import ReferenceList
+
 class DownloadService:
     """Service for generating downloadable research papers in multiple formats."""
     
@@ -17,7 +19,11 @@ class DownloadService:
         self.logger = logging.getLogger(__name__)
         self.supported_formats = ['pdf', 'docx', 'txt', 'json', 'bibtex', 'markdown']
     
-    def _make_citations_clickable(self, text: str, references: list, format_type: str = 'markdown') -> str:
+    def _reference_list(self, research_data: Dict[str, Any]) -> ReferenceList:
+        """The pipeline's reference list, as included in the research data."""
+        return ReferenceList(research_data.get('references') or [])
+    
+    def _make_citations_clickable(self, text: str, references: ReferenceList, format_type: str = 'markdown') -> str:
         """Make citations clickable with reference links."""
         import re
         
@@ -31,10 +37,9 @@ class DownloadService:
             if format_type == 'markdown':
                 links = []
                 for num in citation_numbers:
-                    ref_index = int(num) - 1
-                    if ref_index < len(references):
-                        reference = references[ref_index]
-                        url = reference.get('url', '')
+                    reference = references.get(int(num))
+                    if reference:
+                        url = reference.get('link', '')
                         title = reference.get('title', f'Reference {num}')
                         if url:
                             links.append(f"[{num}]({url} \"{title}\")")
@@ -46,10 +51,9 @@ class DownloadService:
             elif format_type == 'pdf':
                 links = []
                 for num in citation_numbers:
-                    ref_index = int(num) - 1
-                    if ref_index < len(references):
-                        reference = references[ref_index]
-                        url = reference.get('url', '')
+                    reference = references.get(int(num))
+                    if reference:
+                        url = reference.get('link', '')
                         title = reference.get('title', f'Reference {num}')
                         if url:
                             links.append(f'<link href="{url}" color="blue">[{num}]</link>')
@@ -105,7 +109,7 @@ class DownloadService:
         """Generate plain text format."""
         try:
             draft = research_data.get('draft', {})
-            references = research_data.get('references', [])
+            references = self._reference_list(research_data)
             
             content_parts = []
             
@@ -131,15 +135,8 @@ class DownloadService:
             # References
             if references:
                 content_parts.append("REFERENCES\n----------")
-                for i, ref in enumerate(references, 1):
-                    formatted_citation = ref.get('formatted_citation', '')
-                    if formatted_citation:
-                        content_parts.append(f"[{i}] {formatted_citation}")
-                    else:
-                        authors = ', '.join(ref.get('authors', ['Unknown']))
-                        title = ref.get('title', 'Unknown Title')
-                        year = ref.get('year', 'Unknown')
-                        content_parts.append(f"[{i}] {authors} ({year}). {title}.")
+                for ref in references:
+                    content_parts.append(f"[{ref['number']}] {references.formatted(ref)}")
             
             # Metadata
             metadata = draft.get('metadata', {})
@@ -192,7 +189,7 @@ class DownloadService:
         """Generate Markdown format."""
         try:
             draft = research_data.get('draft', {})
-            references = research_data.get('references', [])
+            references = self._reference_list(research_data)
             
             content_parts = []
             
@@ -221,23 +218,12 @@ class DownloadService:
             # References
             if references:
                 content_parts.append("## References\n")
-                for i, ref in enumerate(references, 1):
-                    formatted_citation = ref.get('formatted_citation', '')
-                    url = ref.get('url', '')
-                    
-                    if formatted_citation and url:
+                for ref in references:
+                    if ref['link']:
                         # Make citations clickable in markdown
-                        content_parts.append(f"{i}. [{formatted_citation}]({url})")
-                    elif formatted_citation:
-                        content_parts.append(f"{i}. {formatted_citation}")
+                        content_parts.append(f"{ref['number']}. [{references.formatted(ref)}]({ref['link']})")
                     else:
-                        authors = ', '.join(ref.get('authors', ['Unknown']))
-                        title = ref.get('title', 'Unknown Title')
-                        year = ref.get('year', 'Unknown')
-                        if url:
-                            content_parts.append(f"{i}. [{authors} ({year}). {title}.]({url})")
-                        else:
-                            content_parts.append(f"{i}. {authors} ({year}). {title}.")
+                        content_parts.append(f"{ref['number']}. {references.formatted(ref)}")
             
             content = '\n\n'.join(content_parts)
             
@@ -255,50 +241,12 @@ class DownloadService:
     async def _generate_bibtex(self, research_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate BibTeX format for references."""
         try:
-            references = research_data.get('references', [])
+            references = self._reference_list(research_data)
             
             if not references:
                 return {'error': 'No references available for BibTeX export'}
             
-            bibtex_entries = []
-            
-            for i, ref in enumerate(references, 1):
-                # Create BibTeX entry
-                title = ref.get('title', 'Unknown Title').replace('{', '').replace('}', '')
-                authors = ref.get('authors', ['Unknown'])
-                year = ref.get('year', 'Unknown')
-                journal = ref.get('journal', '')
-                url = ref.get('url', '')
-                doi = ref.get('doi', '')
-                
-                # Format authors for BibTeX
-                if len(authors) > 0:
-                    author_str = ' and '.join(authors)
-                else:
-                    author_str = 'Unknown'
-                
-                # Create entry key
-                first_author = authors[0].split()[-1] if authors and authors[0] else 'Unknown'
-                entry_key = f"{first_author}{year}_{i}"
-                
-                # Build BibTeX entry
-                entry_lines = [f"@article{{{entry_key},"]
-                entry_lines.append(f"  title={{{title}}},")
-                entry_lines.append(f"  author={{{author_str}}},")
-                entry_lines.append(f"  year={{{year}}},")
-                
-                if journal:
-                    entry_lines.append(f"  journal={{{journal}}},")
-                if doi:
-                    entry_lines.append(f"  doi={{{doi}}},")
-                if url:
-                    entry_lines.append(f"  url={{{url}}},")
-                
-                entry_lines.append("}")
-                
-                bibtex_entries.append('\n'.join(entry_lines))
-            
-            content = '\n\n'.join(bibtex_entries)
+            content = references.to_bibtex()
             title = research_data.get('draft', {}).get('title', 'Research Paper')
             
             return {
@@ -327,7 +275,7 @@ class DownloadService:
                 self.logger.info("Using reportlab for PDF generation")
                 
                 draft = research_data.get('draft', {})
-                references = research_data.get('references', [])
+                references = self._reference_list(research_data)
                 
                 # Create a PDF buffer
                 buffer = io.BytesIO()
@@ -520,8 +468,8 @@ class DownloadService:
                     story.append(Paragraph("REFERENCES", heading_style))
                     story.append(Spacer(1, 12))
                     
-                    for i, ref in enumerate(references, 1):
-                        formatted_citation = ref.get('formatted_citation', f"Reference {i}")
+                    for ref in references:
+                        formatted_citation = references.formatted(ref)
                         
                         # Make URLs clickable in PDF with proper formatting
                         if ref.get('url'):
@@ -531,7 +479,7 @@ class DownloadService:
                             )
                         
                         # Format citation with hanging indent (academic style)
-                        citation_text = f"[{i}] {formatted_citation}"
+                        citation_text = f"[{ref['number']}] {formatted_citation}"
                         story.append(Paragraph(citation_text, citation_style))
                         story.append(Spacer(1, 4))
                 
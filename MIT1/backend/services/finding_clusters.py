@@ -0,0 +1,152 @@
+"""
+Near-duplicate clustering of extracted findings.
+
+Each finding is reduced to a MinHash signature over word shingles. Signatures
+are split into bands and hashed into buckets (locality-sensitive hashing), so
+only findings that share a bucket are ever compared, and groups are formed
+with union-find. Grouping thousands of findings is roughly linear instead of
+the O(n^2) of pairwise comparison.
+"""
+
+import re
+import zlib
+import logging
+from typing import List, Dict, Any
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; callers fall back to exact-text grouping
+    np = None
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+class _UnionFind:
+    """Disjoint-set forest with path halving and union by size."""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+
+class FindingClusterer:
+    """Groups near-duplicate findings with MinHash signatures and LSH banding."""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 2,
+                 threshold: float = 0.7, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.logger = logging.getLogger(__name__)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        if np is not None:
+            rng = np.random.default_rng(seed)
+            # Multiply-shift hashing: odd 64-bit multipliers, products wrap modulo 2^64
+            self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+            self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def cluster(self, findings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Merge near-duplicate findings.
+
+        Args:
+            findings: Dicts with 'finding', 'paper_title' (or 'papers') and 'confidence'
+
+        Returns:
+            Groups with the representative 'finding', supporting 'papers',
+            merged 'confidence' and 'support_count', strongest groups first
+        """
+        if not findings:
+            return []
+
+        texts = [' '.join(WORD_PATTERN.findall(str(f.get('finding', '')).lower())) for f in findings]
+        union_find = _UnionFind(len(findings))
+
+        if np is not None:
+            signatures = self._signatures(texts)
+            self._band(signatures, union_find)
+        else:
+            first_seen: Dict[str, int] = {}
+            for index, text in enumerate(texts):
+                union_find.union(first_seen.setdefault(text, index), index)
+
+        groups: Dict[int, List[int]] = {}
+        for index in range(len(findings)):
+            groups.setdefault(union_find.find(index), []).append(index)
+
+        merged = [self._merge([findings[i] for i in members]) for members in groups.values()]
+        merged.sort(key=lambda group: (group['confidence'], group['support_count']), reverse=True)
+        return merged
+
+    def _shingles(self, text: str) -> List[int]:
+        words = text.split()
+        if len(words) < self.shingle_size:
+            grams = [' '.join(words)]
+        else:
+            grams = [' '.join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)]
+        return [zlib.crc32(gram.encode('utf-8')) for gram in grams]
+
+    def _signatures(self, texts: List[str]) -> "np.ndarray":
+        """MinHash signature matrix of shape (n_findings, num_perm)."""
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for row, text in enumerate(texts):
+            shingles = np.asarray(self._shingles(text), dtype=np.uint64)
+            hashed = (self._a[:, None] * shingles[None, :] + self._b[:, None]) >> np.uint64(32)
+            signatures[row] = hashed.min(axis=1)
+        return signatures
+
+    def _band(self, signatures: "np.ndarray", union_find: _UnionFind):
+        """Bucket signatures band by band and union verified candidates."""
+        for band in range(self.bands):
+            band_rows = np.ascontiguousarray(signatures[:, band * self.rows:(band + 1) * self.rows])
+            buckets: Dict[bytes, int] = {}
+            for index in range(band_rows.shape[0]):
+                key = band_rows[index].tobytes()
+                anchor = buckets.setdefault(key, index)
+                if anchor == index or union_find.find(anchor) == union_find.find(index):
+                    continue
+                # Confirm with the estimated Jaccard similarity to drop chance collisions
+                if np.mean(signatures[anchor] == signatures[index]) >= self.threshold:
+                    union_find.union(anchor, index)
+
+    def _merge(self, members: List[Dict[str, Any]]) -> Dict[str, Any]:
+        representative = max(members, key=lambda f: f.get('confidence', 0.5))
+
+        papers: List[str] = []
+        paper_confidence: Dict[str, float] = {}
+        for finding in members:
+            titles = finding.get('papers') or [finding.get('paper_title', '')]
+            for title in titles:
+                if title not in paper_confidence:
+                    papers.append(title)
+                    paper_confidence[title] = 0.0
+                paper_confidence[title] = max(paper_confidence[title], finding.get('confidence', 0.5))
+
+        # Independent supporting papers: P(at least one is right) = 1 - prod(1 - c)
+        doubt = 1.0
+        for confidence in paper_confidence.values():
+            doubt *= 1.0 - min(max(confidence, 0.0), 1.0)
+
+        return {
+            'finding': representative.get('finding', ''),
+            'papers': papers,
+            'confidence': round(min(0.99, 1.0 - doubt), 3),
+            'support_count': len(papers)
+        }
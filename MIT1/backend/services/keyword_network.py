@@ -0,0 +1,147 @@
+"""
+Paper network from shared keywords.
+
+Two papers are connected when they share at least `min_shared` keywords, with
+the number of shared keywords as the edge weight. Instead of intersecting the
+keyword sets of every pair of papers, a keyword -> papers inverted index is
+built and only papers that appear in a posting list together are visited.
+With NumPy, each paper's later co-occurring papers are gathered from the
+posting lists of its keywords and counted at once (bincount, or unique for
+sparse rows); the result is kept as a sparse (CSR) adjacency with per-paper
+degree counts.
+"""
+
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; pairs are then counted in a dict
+    np = None
+
+class KeywordNetwork:
+    """Undirected weighted paper graph in edge-list and CSR form."""
+
+    def __init__(self, size: int, sources, targets, weights):
+        """
+        Args:
+            size: Number of papers (nodes)
+            sources, targets: Paper indices of each edge (source < target),
+                ordered by (source, target)
+            weights: Shared keywords per edge
+        """
+        self.size = size
+        self.sources = sources
+        self.targets = targets
+        self.weights = weights
+        if np is not None:
+            self.degrees = np.bincount(np.concatenate([sources, targets]), minlength=size)
+            rows = np.concatenate([sources, targets])
+            order = np.argsort(rows, kind='stable')
+            self.indices = np.concatenate([targets, sources])[order]
+            self.data = np.concatenate([weights, weights])[order]
+            self.indptr = np.zeros(size + 1, dtype=np.int64)
+            np.cumsum(self.degrees, out=self.indptr[1:])
+        else:
+            degrees = [0] * size
+            for source, target in zip(sources, targets):
+                degrees[source] += 1
+                degrees[target] += 1
+            self.degrees = degrees
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def neighbors(self, index: int) -> List[int]:
+        """Indices of the papers connected to one paper."""
+        if np is not None:
+            return self.indices[self.indptr[index]:self.indptr[index + 1]].tolist()
+        return [t if s == index else s for s, t in zip(self.sources, self.targets) if index in (s, t)]
+
+    def most_connected(self) -> Optional[int]:
+        """Index of the paper with the most connections (None without edges)."""
+        if not len(self):
+            return None
+        if np is not None:
+            return int(np.argmax(self.degrees))
+        return max(range(self.size), key=self.degrees.__getitem__)
+
+    def edges(self, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Edges as {'source', 'target', 'weight'} dicts with paper IDs."""
+        ids = [paper.get('id', '') for paper in papers]
+        sources = self.sources.tolist() if np is not None else self.sources
+        targets = self.targets.tolist() if np is not None else self.targets
+        weights = self.weights.tolist() if np is not None else self.weights
+        return [
+            {'source': ids[source], 'target': ids[target], 'weight': weight}
+            for source, target, weight in zip(sources, targets, weights)
+        ]
+
+def _keyword_postings(papers: List[Dict[str, Any]]):
+    """Keyword -> ascending paper indices, and each paper's distinct keywords."""
+    postings: Dict[Any, List[int]] = {}
+    paper_keywords = []
+    for index, paper in enumerate(papers):
+        keywords = set(paper.get('keywords') or [])
+        for keyword in keywords:
+            postings.setdefault(keyword, []).append(index)
+        paper_keywords.append(keywords)
+    return postings, paper_keywords
+
+def build_keyword_network(papers: List[Dict[str, Any]], min_shared: int = 2) -> KeywordNetwork:
+    """
+    Connect papers that share at least `min_shared` keywords.
+
+    Args:
+        papers: Papers with 'keywords' lists
+        min_shared: Shared keywords needed for an edge
+
+    Returns:
+        KeywordNetwork over the papers (indices follow the input order)
+    """
+    size = len(papers)
+    postings, paper_keywords = _keyword_postings(papers)
+
+    if np is None:
+        counts: Counter = Counter()
+        for posting in postings.values():
+            for a, source in enumerate(posting):
+                for target in posting[a + 1:]:
+                    counts[(source, target)] += 1
+        pairs = sorted(pair for pair, count in counts.items() if count >= min_shared)
+        return KeywordNetwork(size, [s for s, _ in pairs], [t for _, t in pairs],
+                              [counts[pair] for pair in pairs])
+
+    arrays = {keyword: np.asarray(posting, dtype=np.int64)
+              for keyword, posting in postings.items() if len(posting) > 1}
+    sources, targets, weights = [], [], []
+    for index, keywords in enumerate(paper_keywords):
+        # Later papers sharing a keyword with this one, once per shared keyword
+        parts = []
+        for keyword in keywords:
+            posting = arrays.get(keyword)
+            if posting is not None:
+                start = np.searchsorted(posting, index, side='right')
+                if start < len(posting):
+                    parts.append(posting[start:])
+        if len(parts) < min_shared:
+            continue
+        candidates = np.concatenate(parts)
+        if len(candidates) * 16 >= size - index:
+            counts = np.bincount(candidates - (index + 1))
+            neighbors = np.flatnonzero(counts >= min_shared)
+            shared = counts[neighbors]
+            neighbors += index + 1
+        else:
+            neighbors, shared = np.unique(candidates, return_counts=True)
+            keep = shared >= min_shared
+            neighbors, shared = neighbors[keep], shared[keep]
+        if len(neighbors):
+            sources.append(np.full(len(neighbors), index, dtype=np.int64))
+            targets.append(neighbors)
+            weights.append(shared.astype(np.int64))
+
+    if not sources:
+        empty = np.empty(0, dtype=np.int64)
+        return KeywordNetwork(size, empty, empty, empty)
+    return KeywordNetwork(size, np.concatenate(sources), np.concatenate(targets), np.concatenate(weights))
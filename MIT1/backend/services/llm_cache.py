@@ -0,0 +1,190 @@
+"""
+Disk-backed cache for LLM completions.
+
+Responses are stored in SQLite under a SHA-256 of everything that determines
+the completion (model, system prompt, user prompt, max_tokens, temperature).
+The cache is bounded by an LRU entry cap and a TTL. Each request can opt out
+with a cache mode: 'bypass' neither reads nor writes, 'refresh' skips the
+read but stores the new response. Hit rates and the tokens saved by hits are
+tracked per draft through a context variable, and process-wide on the cache.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Iterator
+
+CACHE_MODES = ('use', 'bypass', 'refresh')
+
+class CacheRequestStats:
+    """Cache mode and counters for one unit of work (usually one draft)."""
+
+    def __init__(self, mode: str = 'use'):
+        self.mode = mode if mode in CACHE_MODES else 'use'
+        self.hits = 0
+        self.misses = 0
+        self.saved_prompt_tokens = 0
+        self.saved_completion_tokens = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'mode': self.mode,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'saved_prompt_tokens': self.saved_prompt_tokens,
+            'saved_completion_tokens': self.saved_completion_tokens,
+            'saved_tokens': self.saved_prompt_tokens + self.saved_completion_tokens
+        }
+
+_request_stats: ContextVar[Optional[CacheRequestStats]] = ContextVar('llm_cache_request_stats', default=None)
+
+@contextmanager
+def cache_scope(mode: Optional[str] = None) -> Iterator[CacheRequestStats]:
+    """Collect cache statistics (and apply a cache mode) for the enclosed LLM calls."""
+    stats = CacheRequestStats(mode or 'use')
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+def current_request_stats() -> Optional[CacheRequestStats]:
+    """Statistics of the innermost active cache_scope, if any."""
+    return _request_stats.get()
+
+class LLMResponseCache:
+    """SQLite-backed LRU + TTL cache of chat completion responses."""
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path or os.getenv('LLM_CACHE_PATH', os.path.join('.cache', 'llm_cache.sqlite3'))
+        self.max_entries = max_entries or int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000'))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self.totals = CacheRequestStats()
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, prompt: str, max_tokens: int, temperature: float) -> str:
+        """Hash of every input that determines the completion."""
+        payload = json.dumps([model, system_prompt, prompt, max_tokens, round(float(temperature), 4)],
+                             ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached completion for key, honouring the active cache mode."""
+        stats = current_request_stats()
+        if stats is not None and stats.mode != 'use':
+            return None
+
+        row = None
+        try:
+            with self._lock:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT content, prompt_tokens, completion_tokens, created_at FROM llm_responses WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is not None and self.ttl_seconds > 0 and time.time() - row[3] > self.ttl_seconds:
+                    connection.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    connection.commit()
+                    row = None
+                elif row is not None:
+                    connection.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                    connection.commit()
+        except Exception as e:
+            self.logger.warning(f"Error reading LLM cache: {str(e)}")
+
+        for counters in (self.totals, stats):
+            if counters is None:
+                continue
+            if row is None:
+                counters.misses += 1
+            else:
+                counters.hits += 1
+                counters.saved_prompt_tokens += row[1] or 0
+                counters.saved_completion_tokens += row[2] or 0
+
+        return row[0] if row is not None else None
+
+    def put(self, key: str, model: str, content: str, prompt_tokens: int = 0, completion_tokens: int = 0):
+        """Store a completion and evict least recently used entries beyond the cap."""
+        stats = current_request_stats()
+        if stats is not None and stats.mode == 'bypass':
+            return
+
+        try:
+            now = time.time()
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO llm_responses "
+                    "(key, model, content, prompt_tokens, completion_tokens, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, model, content, prompt_tokens, completion_tokens, now, now)
+                )
+                count = connection.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+                if count > self.max_entries:
+                    connection.execute(
+                        "DELETE FROM llm_responses WHERE key IN "
+                        "(SELECT key FROM llm_responses ORDER BY last_access ASC LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+                connection.commit()
+        except Exception as e:
+            self.logger.warning(f"Error writing LLM cache: {str(e)}")
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM llm_responses")
+            connection.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Process-wide hit rate, saved tokens and entry count."""
+        stats = self.totals.to_dict()
+        stats.pop('mode')
+        try:
+            with self._lock:
+                stats['entries'] = self._connect().execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        except Exception:
+            stats['entries'] = None
+        return stats
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, model TEXT, content TEXT NOT NULL, "
+                "prompt_tokens INTEGER DEFAULT 0, completion_tokens INTEGER DEFAULT 0, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses (last_access)"
+            )
+            self._connection.commit()
+        return self._connection
+
+_shared_caches: Dict[str, LLMResponseCache] = {}
+
+def get_llm_cache(path: Optional[str] = None) -> LLMResponseCache:
+    """Process-wide cache instance for a database path."""
+    path = path or os.getenv('LLM_CACHE_PATH', os.path.join('.cache', 'llm_cache.sqlite3'))
+    if path not in _shared_caches:
+        _shared_caches[path] = LLMResponseCache(path)
+    return _shared_caches[path]
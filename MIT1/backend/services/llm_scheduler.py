@@ -0,0 +1,297 @@
+"""
+Process-wide scheduler for OpenAI requests.
+
+All agents share one AsyncOpenAI client and one request queue. Requests are
+admitted against token buckets for requests per minute and tokens per minute
+(using an estimate up front, reconciled with the reported usage afterwards),
+under a global concurrency cap. Waiting requests are served round-robin per
+pipeline so one large pipeline cannot starve the others, and a 429 response
+pauses admission for every pipeline until the rate limit window has passed.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
+
+T = TypeVar('T')
+
+_current_pipeline: ContextVar[str] = ContextVar('llm_pipeline_id', default='default')
+
+def set_current_pipeline(pipeline_id: str) -> Token:
+    """Attribute LLM requests made from this context (and tasks it starts) to a pipeline."""
+    return _current_pipeline.set(pipeline_id)
+
+def reset_current_pipeline(token: Token):
+    """Undo set_current_pipeline."""
+    _current_pipeline.reset(token)
+
+def llm_configured() -> bool:
+    """Whether LLM requests can be made: a real API key, or a custom endpoint (e.g. the local stub)."""
+    if os.getenv('OPENAI_BASE_URL'):
+        return True
+    openai_key = os.getenv('OPENAI_API_KEY', '')
+    return bool(openai_key) and openai_key != 'sk-your-openai-key-here'
+
+def estimate_request_tokens(*texts: str, max_tokens: int = 0) -> int:
+    """Rough prompt size (about four characters per token) plus the completion budget."""
+    return sum(len(text) for text in texts) // 4 + max_tokens
+
+class TokenBucket:
+    """Continuously refilling bucket with a per-minute rate; may go into debt."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be consumed (requests larger than capacity wait for a full bucket)."""
+        self._refill()
+        needed = min(amount, self.capacity) - self.tokens
+        return max(0.0, needed / self.rate) if self.rate > 0 else 0.0
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+class _Waiter:
+    __slots__ = ('future', 'tokens', 'pipeline_id', 'enqueued')
+
+    def __init__(self, future: asyncio.Future, tokens: int, pipeline_id: str):
+        self.future = future
+        self.tokens = tokens
+        self.pipeline_id = pipeline_id
+        self.enqueued = time.monotonic()
+
+class RequestSlot:
+    """Admission granted to one request; report actual usage through it."""
+
+    def __init__(self, scheduler: 'LLMScheduler', tokens: int):
+        self._scheduler = scheduler
+        self.estimated_tokens = tokens
+        self.actual_tokens: Optional[int] = None
+
+    def record_usage(self, usage: Any):
+        """Record the usage object (or total token count) returned by the API."""
+        if usage is None:
+            return
+        total = usage if isinstance(usage, int) else getattr(usage, 'total_tokens', None)
+        if total:
+            self.actual_tokens = int(total)
+
+class LLMScheduler:
+    """Shared client, RPM/TPM token buckets and fair per-pipeline queuing."""
+
+    def __init__(self, rpm_limit: Optional[int] = None, tpm_limit: Optional[int] = None,
+                 max_concurrency: Optional[int] = None, max_retries: int = 3):
+        self.logger = logging.getLogger(__name__)
+        self.rpm_limit = rpm_limit or int(os.getenv('OPENAI_RPM_LIMIT', '500'))
+        self.tpm_limit = tpm_limit or int(os.getenv('OPENAI_TPM_LIMIT', '200000'))
+        self.max_concurrency = max_concurrency or int(os.getenv('OPENAI_MAX_CONCURRENCY', '16'))
+        self.max_retries = max_retries
+        self._client: Optional[AsyncOpenAI] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reset_state()
+
+    def _reset_state(self):
+        self.request_bucket = TokenBucket(self.rpm_limit)
+        self.token_bucket = TokenBucket(self.tpm_limit)
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self.requests_in_flight = 0
+        self.tokens_in_flight = 0
+        self.counters = {'admitted': 0, 'completed': 0, 'rate_limited': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """The AsyncOpenAI client shared by every agent in the process."""
+        if self._client is None:
+            # OPENAI_BASE_URL points the client at another OpenAI-compatible endpoint;
+            # such endpoints (like services/llm_stub_server.py) may not need a real key
+            base_url = os.getenv('OPENAI_BASE_URL') or None
+            api_key = os.getenv('OPENAI_API_KEY') or ('unused' if base_url else None)
+            # The SDK must not retry on its own: its retries would hold a slot while
+            # sleeping and bypass the buckets and the 429 pause
+            self._client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        return self._client
+
+    @client.setter
+    def client(self, client: AsyncOpenAI):
+        self._client = client
+
+    async def run(self, call: Callable[[RequestSlot], Awaitable[T]], estimated_tokens: int,
+                  pipeline_id: Optional[str] = None) -> T:
+        """
+        Run one API call under the scheduler, retrying after rate-limit pauses
+        and after transient connection or server errors.
+
+        Args:
+            call: Coroutine function performing the request; receives the slot
+                so it can record the reported usage
+            estimated_tokens: Expected prompt + completion tokens
+            pipeline_id: Pipeline to queue under; defaults to the current pipeline
+
+        Returns:
+            Whatever call returns
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.request(estimated_tokens, pipeline_id) as slot:
+                    return await call(slot)
+            except RateLimitError as e:
+                self._pause(e, attempt)
+                if attempt >= self.max_retries:
+                    raise
+            except (APIConnectionError, InternalServerError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                # Only this request backs off; its slot is already released
+                delay = min(8.0, 0.5 * 2 ** attempt)
+                self.logger.warning(f"OpenAI request failed ({str(e)}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def request(self, estimated_tokens: int, pipeline_id: Optional[str] = None):
+        """Wait for admission, then hold a slot for the duration of the block."""
+        self._ensure_loop()
+        pipeline_id = pipeline_id or _current_pipeline.get()
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), max(1, int(estimated_tokens)), pipeline_id)
+        self._queues.setdefault(pipeline_id, deque()).append(waiter)
+        self._wakeup.set()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if not waiter.future.done() or waiter.future.cancelled():
+                self._discard(waiter)
+                raise
+            # Admitted just before cancellation: give the slot back
+            self._release(RequestSlot(self, waiter.tokens))
+            raise
+
+        slot = RequestSlot(self, waiter.tokens)
+        try:
+            yield slot
+        finally:
+            self._release(slot)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, wait times, tokens in flight and bucket levels."""
+        admitted = self.counters['admitted']
+        return {
+            'queue_depth': sum(len(queue) for queue in self._queues.values()),
+            'queue_depth_by_pipeline': {pid: len(queue) for pid, queue in self._queues.items() if queue},
+            'requests_in_flight': self.requests_in_flight,
+            'tokens_in_flight': self.tokens_in_flight,
+            'admitted': admitted,
+            'completed': self.counters['completed'],
+            'rate_limited': self.counters['rate_limited'],
+            'average_wait_seconds': round(self.counters['total_wait'] / admitted, 4) if admitted else 0.0,
+            'max_wait_seconds': round(self.counters['max_wait'], 4),
+            'paused_for_seconds': round(max(0.0, self._paused_until - time.monotonic()), 3),
+            'request_budget_remaining': round(self.request_bucket.tokens, 1),
+            'token_budget_remaining': round(self.token_bucket.tokens, 1)
+        }
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A new event loop (e.g. a fresh asyncio.run) cannot reuse the old primitives
+            self._loop = loop
+            self._reset_state()
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        """Admit queued requests round-robin across pipelines as capacity allows."""
+        while True:
+            if not any(self._queues.values()) or self.requests_in_flight >= self.max_concurrency:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+
+            pipeline_id, queue = next((pid, q) for pid, q in self._queues.items() if q)
+            waiter = queue[0]
+            delay = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(waiter.tokens))
+            if delay > 0:
+                await asyncio.sleep(min(delay, 1.0))
+                continue
+
+            queue.popleft()
+            # Round-robin: the pipeline just served goes to the back of the line
+            self._queues.move_to_end(pipeline_id)
+            if not queue:
+                del self._queues[pipeline_id]
+            if waiter.future.done():
+                continue
+
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(waiter.tokens)
+            self.requests_in_flight += 1
+            self.tokens_in_flight += waiter.tokens
+
+            waited = time.monotonic() - waiter.enqueued
+            self.counters['admitted'] += 1
+            self.counters['total_wait'] += waited
+            self.counters['max_wait'] = max(self.counters['max_wait'], waited)
+            waiter.future.set_result(None)
+
+    def _release(self, slot: RequestSlot):
+        self.requests_in_flight -= 1
+        self.tokens_in_flight -= slot.estimated_tokens
+        self.counters['completed'] += 1
+        if slot.actual_tokens is not None and slot.actual_tokens > slot.estimated_tokens:
+            # Under-estimated requests pay the difference out of the token budget
+            self.token_bucket.consume(slot.actual_tokens - slot.estimated_tokens)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _discard(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.pipeline_id)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.pipeline_id]
+
+    def _pause(self, error: RateLimitError, attempt: int):
+        """Stop admitting requests after a 429, for Retry-After or an exponential backoff."""
+        retry_after = None
+        try:
+            retry_after = float(error.response.headers.get('retry-after'))
+        except Exception:
+            pass
+        delay = retry_after if retry_after is not None else min(30.0, 2.0 ** (attempt + 1))
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self.counters['rate_limited'] += 1
+        self.logger.warning(f"OpenAI rate limit hit; pausing LLM requests for {delay:.1f}s")
+
+_scheduler: Optional[LLMScheduler] = None
+
+def get_llm_scheduler() -> LLMScheduler:
+    """The process-wide LLM scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler()
+    return _scheduler
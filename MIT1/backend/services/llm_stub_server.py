@@ -0,0 +1,272 @@
+"""
+Local OpenAI-compatible chat-completions stub for load and latency testing.
+
+Serves POST /v1/chat/completions (streaming and non-streaming, including
+json_object output) with simulated time-to-first-token, a tokens-per-second
+generation rate and injected 429/500 errors. Completions are derived from a
+hash of the request and the seed, so the same prompt always yields the same
+text; latency and error draws come from one seeded generator, so a run with a
+fixed request order is reproducible. Point the agents at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Run it with:
+    python -m services.llm_stub_server
+
+Configuration (environment, or POST /stub/config at runtime):
+    LLM_STUB_PORT               Port to listen on (default 8090)
+    LLM_STUB_LATENCY            Time to first token: "0.2", "uniform:0.1:0.5",
+                                "normal:0.3:0.1" or "lognormal:0.3:0.5"
+                                (median and sigma), in seconds
+    LLM_STUB_TOKENS_PER_SECOND  Generation rate; 0 returns tokens instantly
+    LLM_STUB_OUTPUT_TOKENS      Completion length when max_tokens allows it
+    LLM_STUB_RATE_429           Fraction of requests answered with 429
+    LLM_STUB_RATE_500           Fraction of requests answered with 500
+    LLM_STUB_RETRY_AFTER        Retry-After seconds sent with 429 responses
+    LLM_STUB_SEED               Seed for outputs, latencies and errors
+"""
+
+import os
+import re
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass, asdict, fields
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "model data results method analysis approach performance evaluation study "
+    "framework learning system accuracy dataset training features baseline "
+    "significant improvement research evidence clinical outcomes network robust "
+    "efficient scalable proposed experiments benchmark prior work limitations"
+).split()
+
+# Keys requested by batched-section prompts, e.g. - "future_work": ...
+JSON_KEY_PATTERN = re.compile(r'^\s*-\s*"(\w+)"\s*:', re.MULTILINE)
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution.
+
+    Args:
+        spec: "<seconds>", "uniform:<low>:<high>", "normal:<mean>:<stdev>" or
+            "lognormal:<median>:<sigma>"
+
+    Returns:
+        Function drawing a latency (seconds, never negative) from a generator
+    """
+    parts = str(spec).strip().split(':')
+    kind, values = parts[0].lower(), [float(v) for v in parts[1:]]
+    if kind == 'uniform':
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == 'normal':
+        mean, stdev = values
+        return lambda rng: max(0.0, rng.gauss(mean, stdev))
+    if kind == 'lognormal':
+        median, sigma = values
+        mu = math.log(median) if median > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, sigma) if median > 0 else 0.0
+    fixed = max(0.0, float(kind))
+    return lambda rng: fixed
+
+@dataclass
+class StubConfig:
+    latency: str = '0.05'
+    tokens_per_second: float = 0.0
+    output_tokens: int = 200
+    rate_429: float = 0.0
+    rate_500: float = 0.0
+    retry_after: float = 1.0
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> 'StubConfig':
+        config = cls()
+        for field in fields(cls):
+            value = os.getenv(f"LLM_STUB_{field.name.upper()}")
+            if value is not None:
+                setattr(config, field.name, type(getattr(config, field.name))(value))
+        return config
+
+class StubCompletions:
+    """Generates deterministic completions and tracks request statistics."""
+
+    def __init__(self, config: Optional[StubConfig] = None):
+        self.logger = logging.getLogger(__name__)
+        self.configure(config or StubConfig.from_env())
+
+    def configure(self, config: StubConfig):
+        self.config = config
+        self.latency = parse_latency(config.latency)
+        self.rng = random.Random(config.seed)
+        self.stats = {'requests': 0, 'streamed': 0, 'errors_429': 0, 'errors_500': 0,
+                      'completion_tokens': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+    def draw_error(self) -> Optional[int]:
+        """Status code of an injected error for the next request, if any."""
+        draw = self.rng.random()
+        if draw < self.config.rate_429:
+            self.stats['errors_429'] += 1
+            return 429
+        if draw < self.config.rate_429 + self.config.rate_500:
+            self.stats['errors_500'] += 1
+            return 500
+        return None
+
+    def completion_tokens(self, body: Dict[str, Any]) -> List[str]:
+        """The completion of a request, split into tokens (words with their spacing)."""
+        digest = hashlib.sha256(f"{self.config.seed}:{body.get('model')}".encode('utf-8'))
+        digest.update(json.dumps(body.get('messages', []), sort_keys=True).encode('utf-8'))
+        rng = random.Random(digest.digest())
+
+        limit = min(self.config.output_tokens, int(body.get('max_tokens') or self.config.output_tokens))
+        response_format = body.get('response_format') or {}
+        if response_format.get('type') == 'json_object':
+            prompt = '\n'.join(str(m.get('content', '')) for m in body.get('messages', []))
+            keys = JSON_KEY_PATTERN.findall(prompt) or ['content']
+            per_key = max(5, limit // len(keys))
+            text = json.dumps({key: self._sentences(rng, per_key) for key in keys})
+            return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+        words = self._sentences(rng, limit).split(' ')
+        return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+    def _sentences(self, rng: random.Random, count: int) -> str:
+        words: List[str] = []
+        while len(words) < count:
+            length = min(rng.randint(8, 16), count - len(words))
+            sentence = [rng.choice(WORDS) for _ in range(length)]
+            sentence[0] = sentence[0].capitalize()
+            sentence[-1] += f" [{rng.randint(1, 5)}]." if length > 4 else '.'
+            words.extend(sentence)
+        return ' '.join(words)
+
+def completion_response(body: Dict[str, Any], tokens: List[str], completion_id: Optional[str] = None) -> Dict[str, Any]:
+    """Non-streaming chat.completion object for a request and its completion tokens."""
+    return {
+        'id': completion_id or f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'stub'),
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': ''.join(tokens)}}],
+        'usage': _usage(body, len(tokens))
+    }
+
+def _usage(body: Dict[str, Any], completion_tokens: int) -> Dict[str, int]:
+    prompt_chars = sum(len(str(m.get('content', ''))) for m in body.get('messages', []))
+    prompt_tokens = prompt_chars // 4 + 1
+    return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens}
+
+def _error(status: int, retry_after: float) -> JSONResponse:
+    if status == 429:
+        body = {'error': {'message': 'Rate limit reached (injected by stub)', 'type': 'requests',
+                          'code': 'rate_limit_exceeded'}}
+        return JSONResponse(body, status_code=429, headers={'retry-after': str(retry_after)})
+    body = {'error': {'message': 'Internal server error (injected by stub)', 'type': 'server_error',
+                      'code': None}}
+    return JSONResponse(body, status_code=500)
+
+def create_app(config: Optional[StubConfig] = None) -> FastAPI:
+    """
+    Build the stub application.
+
+    Args:
+        config: Stub behaviour; read from LLM_STUB_* variables when omitted
+
+    Returns:
+        FastAPI app serving the OpenAI chat-completions routes
+    """
+    app = FastAPI(title="LLM stub")
+    stub = StubCompletions(config)
+    app.state.stub = stub
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stub.stats['requests'] += 1
+        status = stub.draw_error()
+        latency = stub.latency(stub.rng)
+        if status is not None:
+            await asyncio.sleep(latency)
+            return _error(status, stub.config.retry_after)
+
+        tokens = stub.completion_tokens(body)
+        stub.stats['completion_tokens'] += len(tokens)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get('model', 'stub')
+        delay = 1.0 / stub.config.tokens_per_second if stub.config.tokens_per_second > 0 else 0.0
+
+        stub.stats['in_flight'] += 1
+        stub.stats['max_in_flight'] = max(stub.stats['max_in_flight'], stub.stats['in_flight'])
+
+        if not body.get('stream'):
+            try:
+                await asyncio.sleep(latency + delay * len(tokens))
+            finally:
+                stub.stats['in_flight'] -= 1
+            return completion_response(body, tokens, completion_id)
+
+        stub.stats['streamed'] += 1
+        include_usage = (body.get('stream_options') or {}).get('include_usage', False)
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, usage=None) -> str:
+            payload = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                       'model': model,
+                       'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}] if delta is not None else [],
+                       'usage': usage}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            try:
+                await asyncio.sleep(latency)
+                yield chunk({'role': 'assistant', 'content': ''})
+                for token in tokens:
+                    if delay:
+                        await asyncio.sleep(delay)
+                    yield chunk({'content': token})
+                yield chunk({}, finish_reason='stop')
+                if include_usage:
+                    yield chunk(None, usage=_usage(body, len(tokens)))
+                yield "data: [DONE]\n\n"
+            finally:
+                stub.stats['in_flight'] -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/v1/models")
+    async def models():
+        return {'object': 'list', 'data': [{'id': 'stub', 'object': 'model', 'owned_by': 'stub'}]}
+
+    @app.get("/stub/stats")
+    async def stats():
+        return {'config': asdict(stub.config), **stub.stats}
+
+    @app.post("/stub/config")
+    async def configure(request: Request):
+        """Replace the stub configuration (unspecified fields keep their values) and reset stats."""
+        updates = await request.json()
+        config = asdict(stub.config)
+        for field in fields(StubConfig):
+            if field.name in updates:
+                config[field.name] = type(config[field.name])(updates[field.name])
+        stub.configure(StubConfig(**config))
+        return asdict(stub.config)
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(create_app(), host="127.0.0.1", port=int(os.getenv('LLM_STUB_PORT', '8090')))
@@ -0,0 +1,370 @@
+"""
+Batched LLM summarization with a content-hash cache.
+
+Instead of one chat completion per paper, several abstracts are packed into a
+single request under a token budget and the model answers with one JSON object
+per paper. Every result is cached under (abstract hash, model, prompt version)
+on disk and in the ``summaries`` table, so papers that have been summarized
+before cost no tokens and no round trip.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+from services.llm_scheduler import get_llm_scheduler, estimate_request_tokens, llm_configured
+
+PROMPT_VERSION = "batch-summary-v1"
+SUMMARY_TYPE = "llm_individual"
+
+SYSTEM_PROMPT = (
+    "You are an expert research assistant. Summarize each paper you are given "
+    "faithfully and concisely. Respond with JSON only."
+)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return len(text) // 4 + 1
+
+def content_hash(text: str) -> str:
+    """Stable hash of whitespace-normalized text."""
+    normalized = ' '.join(str(text or '').split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+class SummaryCache:
+    """Two-level cache of LLM summaries: JSON files on disk and the Summary table."""
+
+    def __init__(self, cache_dir: Optional[str] = None, use_database: Optional[bool] = None):
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = cache_dir or os.getenv('SUMMARY_CACHE_DIR', os.path.join('.cache', 'summaries'))
+        if use_database is None:
+            use_database = os.getenv('SUMMARY_CACHE_DB', 'true').lower() in ('1', 'true', 'yes')
+        self.use_database = use_database
+        self._schema_checked = False
+        self._memory: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(abstract: str, model: str, prompt_version: str = PROMPT_VERSION) -> str:
+        """Cache key for an abstract summarized by a given model and prompt version."""
+        raw = f"{content_hash(abstract)}:{model}:{prompt_version}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up many keys at once; returns only the keys that were found."""
+        found: Dict[str, Dict[str, Any]] = {}
+        pending = []
+
+        for key in keys:
+            entry = self._memory.get(key) or self._read_file(key)
+            if entry is not None:
+                self._memory[key] = entry
+                found[key] = entry
+            else:
+                pending.append(key)
+
+        if pending and self._database_ready():
+            for key, entry in self._read_database(pending).items():
+                self._memory[key] = entry
+                self._write_file(key, entry)
+                found[key] = entry
+
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, entries: Dict[str, Dict[str, Any]], research_session_id: Optional[int] = None):
+        """
+        Store new results in memory, on disk and in the Summary table.
+
+        Args:
+            entries: Summaries keyed by cache key
+            research_session_id: Session to attach new rows to; rows are
+                shared across sessions and stored without one by default
+        """
+        for key, entry in entries.items():
+            self._memory[key] = entry
+            self._write_file(key, entry)
+
+        if entries and self._database_ready():
+            self._write_database(entries, research_session_id)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_file(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Error reading summary cache entry {key}: {str(e)}")
+            return None
+
+    def _write_file(self, key: str, entry: Dict[str, Any]):
+        try:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.warning(f"Error writing summary cache entry {key}: {str(e)}")
+
+    def _database_ready(self) -> bool:
+        """Migrate the Summary table once per cache; falls back to disk only on failure."""
+        if self.use_database and not self._schema_checked:
+            self._schema_checked = True
+            try:
+                from database.db import ensure_schema
+
+                if not ensure_schema():
+                    raise RuntimeError("schema migration failed")
+            except Exception as e:
+                self.logger.error(f"Summary table unavailable, using disk cache only: {str(e)}")
+                self.use_database = False
+        return self.use_database
+
+    def _read_database(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        try:
+            from database.db import SessionLocal
+            from database.models import Summary
+
+            session = SessionLocal()
+            try:
+                rows = session.query(Summary).filter(Summary.cache_key.in_(keys)).all()
+                return {row.cache_key: row.content for row in rows}
+            finally:
+                session.close()
+        except Exception as e:
+            self.logger.warning(f"Error reading cached summaries from the database: {str(e)}")
+            return {}
+
+    def _write_database(self, entries: Dict[str, Dict[str, Any]], research_session_id: Optional[int]):
+        try:
+            from database.db import SessionLocal
+            from database.models import Summary
+
+            session = SessionLocal()
+            try:
+                # Another run may have stored the same abstract since the lookup
+                existing = {
+                    key for (key,) in
+                    session.query(Summary.cache_key).filter(Summary.cache_key.in_(list(entries)))
+                }
+                for key, entry in entries.items():
+                    if key in existing:
+                        continue
+                    session.add(Summary(
+                        research_session_id=research_session_id,
+                        summary_type=SUMMARY_TYPE,
+                        cache_key=key,
+                        content=entry
+                    ))
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+        except Exception as e:
+            self.logger.warning(f"Error writing cached summaries to the database: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        """Cache statistics."""
+        return {'entries': len(self._memory), 'hits': self.hits, 'misses': self.misses}
+
+class BatchLLMSummarizer:
+    """Summarizes many abstracts per LLM request with structured per-paper output."""
+
+    def __init__(self, model: Optional[str] = None, cache: Optional[SummaryCache] = None,
+                 max_batch_tokens: int = 3000, max_papers_per_batch: int = 20,
+                 max_abstract_tokens: int = 600, output_tokens_per_paper: int = 150,
+                 max_concurrency: int = 4):
+        self.logger = logging.getLogger(__name__)
+        self.model = model or os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+        self.cache = cache or SummaryCache()
+        self.max_batch_tokens = max_batch_tokens
+        self.max_papers_per_batch = max_papers_per_batch
+        self.max_abstract_tokens = max_abstract_tokens
+        self.output_tokens_per_paper = output_tokens_per_paper
+        self.max_concurrency = max_concurrency
+        self._client: Optional[AsyncOpenAI] = None
+        self.usage = {'requests': 0, 'papers_sent': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+    @property
+    def available(self) -> bool:
+        """Whether a usable OpenAI API key (or custom endpoint) is configured."""
+        return llm_configured()
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self._client = get_llm_scheduler().client
+        return self._client
+
+    async def summarize(self, papers: List[Dict[str, Any]],
+                        research_session_id: Optional[int] = None) -> List[Optional[Dict[str, Any]]]:
+        """
+        Summarize papers, serving already-seen abstracts from the cache.
+
+        Args:
+            papers: Papers with 'title' and 'abstract'
+            research_session_id: Optional session to attach newly cached rows to
+
+        Returns:
+            One {'summary', 'key_points'} dict per paper, or None where the
+            paper has no abstract or the LLM call failed
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(papers)
+        keys: List[Optional[str]] = []
+        for paper in papers:
+            abstract = str(paper.get('abstract') or '')
+            keys.append(SummaryCache.make_key(abstract, self.model) if abstract.strip() else None)
+
+        cached = self.cache.get_many([key for key in keys if key])
+        missing: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        for index, key in enumerate(keys):
+            if key is None:
+                continue
+            if key in cached:
+                results[index] = cached[key]
+            elif key not in missing:
+                missing[key] = (index, papers[index])
+
+        if missing and self.available:
+            batches = self._pack_batches(list(missing.items()))
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def run(batch):
+                async with semaphore:
+                    return await self._summarize_batch(batch)
+
+            fresh: Dict[str, Dict[str, Any]] = {}
+            for batch_result in await asyncio.gather(*(run(batch) for batch in batches)):
+                fresh.update(batch_result)
+
+            self.cache.put_many(fresh, research_session_id)
+            for index, key in enumerate(keys):
+                if key in fresh:
+                    results[index] = fresh[key]
+
+        return results
+
+    def _pack_batches(self, items: List[Tuple[str, Tuple[int, Dict[str, Any]]]]) -> List[List[Tuple[str, str, str]]]:
+        """Greedily pack (key, title, abstract) items into batches under the token budget."""
+        batches: List[List[Tuple[str, str, str]]] = []
+        current: List[Tuple[str, str, str]] = []
+        current_tokens = 0
+
+        for key, (_, paper) in items:
+            title = str(paper.get('title') or '')
+            abstract = str(paper.get('abstract') or '')
+            max_chars = self.max_abstract_tokens * 4
+            if len(abstract) > max_chars:
+                abstract = abstract[:max_chars].rsplit(' ', 1)[0] + '...'
+
+            cost = estimate_tokens(title) + estimate_tokens(abstract) + self.output_tokens_per_paper
+            if current and (current_tokens + cost > self.max_batch_tokens
+                            or len(current) >= self.max_papers_per_batch):
+                batches.append(current)
+                current, current_tokens = [], 0
+
+            current.append((key, title, abstract))
+            current_tokens += cost
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _build_prompt(self, batch: List[Tuple[str, str, str]]) -> str:
+        papers_block = '\n\n'.join(
+            f"[P{i}] Title: {title}\nAbstract: {abstract}"
+            for i, (_, title, abstract) in enumerate(batch, 1)
+        )
+        return (
+            "Summarize each of the following research papers in 2-3 sentences and list up to "
+            "3 key points.\n\n"
+            f"{papers_block}\n\n"
+            'Return a JSON object of the form {"summaries": [{"id": "P1", "summary": "...", '
+            '"key_points": ["...", "..."]}]} with exactly one entry per paper id.'
+        )
+
+    async def _summarize_batch(self, batch: List[Tuple[str, str, str]]) -> Dict[str, Dict[str, Any]]:
+        """Summarize one packed batch; returns results keyed by cache key."""
+        try:
+            prompt = self._build_prompt(batch)
+            max_tokens = self.output_tokens_per_paper * len(batch) + 50
+
+            async def request(slot):
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=0.2,
+                    response_format={"type": "json_object"}
+                )
+                slot.record_usage(getattr(response, 'usage', None))
+                return response
+
+            response = await get_llm_scheduler().run(
+                request, estimate_request_tokens(SYSTEM_PROMPT, prompt, max_tokens=max_tokens)
+            )
+
+            self.usage['requests'] += 1
+            self.usage['papers_sent'] += len(batch)
+            if getattr(response, 'usage', None):
+                self.usage['prompt_tokens'] += response.usage.prompt_tokens or 0
+                self.usage['completion_tokens'] += response.usage.completion_tokens or 0
+
+            return self._parse_response(response.choices[0].message.content or '', batch)
+
+        except Exception as e:
+            self.logger.error(f"Error in batched LLM summarization: {str(e)}")
+            return {}
+
+    def _parse_response(self, content: str, batch: List[Tuple[str, str, str]]) -> Dict[str, Dict[str, Any]]:
+        """Map the model's per-paper JSON entries back to cache keys."""
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Error parsing batched summary response: {str(e)}")
+            return {}
+
+        entries = data.get('summaries', []) if isinstance(data, dict) else data
+        results: Dict[str, Dict[str, Any]] = {}
+
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            paper_id = str(entry.get('id', '')).upper().lstrip('P')
+            if not paper_id.isdigit() or not 1 <= int(paper_id) <= len(batch):
+                continue
+            summary = str(entry.get('summary') or '').strip()
+            if not summary:
+                continue
+
+            key_points = entry.get('key_points') or []
+            results[batch[int(paper_id) - 1][0]] = {
+                'summary': summary,
+                'key_points': [str(point) for point in key_points if point][:5],
+                'model': self.model,
+                'prompt_version': PROMPT_VERSION
+            }
+
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Token usage and cache statistics."""
+        return {**self.usage, 'cache': self.cache.stats()}
@@ -0,0 +1,313 @@
+"""
+Hierarchical map-reduce summarization for very large paper harvests.
+
+Papers are grouped by theme and split into fixed-size chunks. Each chunk is
+summarized independently (map) in a process pool, and the partial summaries of
+each theme are merged recursively (reduce) until one synthesis per theme is
+left; the theme syntheses are finally reduced into corpus-level key findings.
+Every map and reduce node is checkpointed to disk under a hash of the input,
+so an interrupted run resumes where it stopped and a repeated run is free.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import contextlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+from services.paper_text import PaperText
+from services.theme_discovery import ThemeDiscovery, STOPWORDS
+
+CHECKPOINT_VERSION = "map-reduce-v1"
+
+FINDING_CUES = {
+    'significant': 3, 'significantly': 3, 'outperform': 3, 'outperforms': 3, 'outperformed': 3,
+    'improve': 2, 'improves': 2, 'improved': 2, 'improvement': 2, 'demonstrate': 2, 'demonstrates': 2,
+    'demonstrated': 2, 'reveal': 2, 'reveals': 2, 'revealed': 2, 'found': 2, 'finding': 2, 'findings': 2,
+    'novel': 1, 'breakthrough': 1, 'effective': 1, 'accuracy': 1, 'reduced': 1, 'increased': 1,
+    'associated': 1, 'suggest': 1, 'suggests': 1, 'important': 1
+}
+
+def _map_chunk(records: List[Tuple[str, str]], max_findings: int = 20, max_keywords: int = 40) -> Dict[str, Any]:
+    """Summarize one chunk of (title, abstract) records. Runs in a worker process."""
+    keywords: Counter = Counter()
+    findings = []
+
+    for title, abstract in records:
+        paper_text = PaperText(title, abstract)
+        keywords.update(token for token in set(paper_text.tokens)
+                        if token not in STOPWORDS and len(token) > 2 and not token.isdigit())
+
+        best_sentence, best_score = None, 0
+        for sentence, tokens in zip(paper_text.sentences, paper_text.sentence_tokens):
+            score = sum(FINDING_CUES.get(token, 0) for token in tokens)
+            if score > best_score:
+                best_sentence, best_score = sentence, score
+
+        if best_sentence:
+            findings.append({
+                'finding': best_sentence[:300],
+                'papers': [title],
+                'confidence': round(min(0.95, 0.5 + 0.05 * best_score), 2)
+            })
+
+    findings.sort(key=lambda finding: finding['confidence'], reverse=True)
+    return {
+        'paper_count': len(records),
+        'keywords': keywords.most_common(max_keywords),
+        'findings': findings[:max_findings]
+    }
+
+def _reduce_partials(partials: List[Dict[str, Any]], max_findings: int = 20,
+                     max_keywords: int = 40, max_papers_per_finding: int = 20) -> Dict[str, Any]:
+    """Merge partial summaries into one. Runs in a worker process."""
+    keywords: Counter = Counter()
+    merged: Dict[str, Dict[str, Any]] = {}
+
+    for partial in partials:
+        keywords.update(dict(partial['keywords']))
+        for finding in partial['findings']:
+            key = ' '.join(finding['finding'].lower().split())[:120]
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = {**finding, 'papers': list(finding['papers'])}
+            else:
+                existing['papers'] = (existing['papers'] + finding['papers'])[:max_papers_per_finding]
+                existing['confidence'] = max(existing['confidence'], finding['confidence'])
+
+    findings = sorted(merged.values(), key=lambda f: (f['confidence'], len(f['papers'])), reverse=True)
+    return {
+        'paper_count': sum(partial['paper_count'] for partial in partials),
+        'keywords': keywords.most_common(max_keywords),
+        'findings': findings[:max_findings]
+    }
+
+class MapReduceSummarizer:
+    """Theme-clustered, checkpointed map-reduce summarizer."""
+
+    def __init__(self, chunk_size: int = 100, fan_in: int = 8, max_workers: Optional[int] = None,
+                 checkpoint_dir: Optional[str] = None, use_llm: bool = False, llm_concurrency: int = 4,
+                 theme_discovery: Optional[ThemeDiscovery] = None):
+        self.logger = logging.getLogger(__name__)
+        self.chunk_size = chunk_size
+        self.fan_in = max(2, fan_in)
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.checkpoint_dir = checkpoint_dir or os.getenv('MAP_REDUCE_CHECKPOINT_DIR', os.path.join('.cache', 'map_reduce'))
+        self.use_llm = use_llm
+        self.llm_concurrency = llm_concurrency
+        self.theme_discovery = theme_discovery or ThemeDiscovery(max_themes=12)
+        self.stats = {'map_tasks': 0, 'reduce_tasks': 0, 'checkpoint_hits': 0, 'llm_calls': 0}
+
+    async def summarize(self, papers: List[Dict[str, Any]],
+                        token_lists: Optional[List[List[str]]] = None) -> Dict[str, Any]:
+        """
+        Build the thematic summary and key findings of a large corpus.
+
+        Args:
+            papers: Papers with 'title' and 'abstract'
+            token_lists: Pre-tokenized title+abstract of each paper, if available
+
+        Returns:
+            Dictionary with 'thematic_summary', 'key_findings', 'themes' and 'stats'
+        """
+        records = [(str(paper.get('title') or ''), str(paper.get('abstract') or '')) for paper in papers]
+        run_key = self._run_key(records)
+        if token_lists is None:
+            token_lists = [PaperText(title, abstract).tokens for title, abstract in records]
+
+        clusters = self._cluster(token_lists)
+        loop = asyncio.get_running_loop()
+
+        with self._executor() as pool:
+            async def run(name: str, fn, *args) -> Dict[str, Any]:
+                cached = self._load_checkpoint(run_key, name)
+                if cached is not None:
+                    self.stats['checkpoint_hits'] += 1
+                    return cached
+                result = await self._execute(loop, pool, fn, *args)
+                self._save_checkpoint(run_key, name, result)
+                return result
+
+            # Map: every chunk of every theme in parallel
+            map_jobs = []
+            for cluster_index, (_, indices) in enumerate(clusters):
+                for start in range(0, len(indices), self.chunk_size):
+                    chunk = [records[i] for i in indices[start:start + self.chunk_size]]
+                    map_jobs.append((cluster_index, run(f"c{cluster_index}-L0-{start // self.chunk_size}", _map_chunk, chunk)))
+            self.stats['map_tasks'] += len(map_jobs)
+            map_results = await asyncio.gather(*(job for _, job in map_jobs))
+
+            levels: Dict[int, List[Dict[str, Any]]] = {}
+            for (cluster_index, _), result in zip(map_jobs, map_results):
+                levels.setdefault(cluster_index, []).append(result)
+
+            # Reduce: each theme recursively, themes concurrently
+            async def reduce_cluster(cluster_index: int, nodes: List[Dict[str, Any]]) -> Dict[str, Any]:
+                level = 1
+                while len(nodes) > 1:
+                    groups = [nodes[i:i + self.fan_in] for i in range(0, len(nodes), self.fan_in)]
+                    self.stats['reduce_tasks'] += len(groups)
+                    nodes = await asyncio.gather(*(
+                        run(f"c{cluster_index}-L{level}-{group_index}", _reduce_partials, group)
+                        for group_index, group in enumerate(groups)
+                    ))
+                    level += 1
+                return nodes[0]
+
+            cluster_summaries = await asyncio.gather(*(
+                reduce_cluster(cluster_index, levels[cluster_index]) for cluster_index in sorted(levels)
+            ))
+            self.stats['reduce_tasks'] += 1
+            corpus_summary = await run("corpus", _reduce_partials, list(cluster_summaries))
+
+        syntheses = await self._synthesize_themes(run_key, clusters, cluster_summaries)
+
+        thematic_summary = f"Based on analysis of {len(papers)} research papers, several key themes emerge:\n\n"
+        themes = []
+        for i, ((theme, _), synthesis, summary) in enumerate(zip(clusters, syntheses, cluster_summaries), 1):
+            thematic_summary += f"{i}. {theme['name']}: {synthesis}\n"
+            themes.append({
+                'name': theme['name'],
+                'description': synthesis,
+                'keywords': theme.get('keywords', []),
+                'paper_count': summary['paper_count']
+            })
+
+        return {
+            'thematic_summary': thematic_summary,
+            'key_findings': corpus_summary['findings'],
+            'themes': themes,
+            'stats': dict(self.stats)
+        }
+
+    def _cluster(self, token_lists: List[List[str]]) -> List[Tuple[Dict[str, Any], List[int]]]:
+        """Group papers by discovered theme; one catch-all group without NumPy."""
+        try:
+            if self.theme_discovery.available and len(token_lists) >= 2:
+                themes = self.theme_discovery.discover(token_lists)
+                if themes:
+                    return [(theme, theme['paper_indices']) for theme in themes]
+        except Exception as e:
+            self.logger.error(f"Error clustering papers for map-reduce: {str(e)}")
+
+        return [({'name': 'Research Overview', 'keywords': []}, list(range(len(token_lists))))]
+
+    @contextlib.contextmanager
+    def _executor(self):
+        """Process pool for map/reduce work; None means run inline."""
+        pool = None
+        try:
+            pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        except Exception as e:
+            self.logger.warning(f"Process pool unavailable, summarizing inline: {str(e)}")
+        try:
+            yield pool
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+    async def _execute(self, loop, pool, fn, *args):
+        if pool is not None:
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except Exception as e:
+                self.logger.warning(f"Worker failed, retrying inline: {str(e)}")
+        return fn(*args)
+
+    async def _synthesize_themes(self, run_key: str, clusters, cluster_summaries) -> List[str]:
+        """One short synthesis per theme: LLM-written when enabled, extractive otherwise."""
+        syntheses = [self._extractive_synthesis(summary) for summary in cluster_summaries]
+        if not self.use_llm or not self._llm_available():
+            return syntheses
+
+        from services.llm_scheduler import get_llm_scheduler, estimate_request_tokens
+        scheduler = get_llm_scheduler()
+        model = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+        semaphore = asyncio.Semaphore(self.llm_concurrency)
+
+        async def synthesize(index: int, theme: Dict[str, Any], summary: Dict[str, Any]) -> str:
+            name = f"c{index}-synthesis"
+            cached = self._load_checkpoint(run_key, name)
+            if cached is not None:
+                self.stats['checkpoint_hits'] += 1
+                return cached['text']
+
+            findings = '\n'.join(f"- {finding['finding']}" for finding in summary['findings'][:8])
+            keywords = ', '.join(term for term, _ in summary['keywords'][:12])
+            prompt = (f"Write a 2-3 sentence synthesis of a research theme named '{theme['name']}' "
+                      f"covering {summary['paper_count']} papers.\nFrequent terms: {keywords}\n"
+                      f"Representative findings:\n{findings}")
+            try:
+                async def request(slot):
+                    response = await scheduler.client.chat.completions.create(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        max_tokens=200,
+                        temperature=0.3
+                    )
+                    slot.record_usage(getattr(response, 'usage', None))
+                    return response
+
+                async with semaphore:
+                    response = await scheduler.run(request, estimate_request_tokens(prompt, max_tokens=200))
+                self.stats['llm_calls'] += 1
+                text = (response.choices[0].message.content or '').strip()
+                if text:
+                    self._save_checkpoint(run_key, name, {'text': text})
+                    return text
+            except Exception as e:
+                self.logger.error(f"Error synthesizing theme with LLM: {str(e)}")
+            return syntheses[index]
+
+        return list(await asyncio.gather(*(
+            synthesize(index, theme, summary)
+            for index, ((theme, _), summary) in enumerate(zip(clusters, cluster_summaries))
+        )))
+
+    def _extractive_synthesis(self, summary: Dict[str, Any]) -> str:
+        keywords = ', '.join(term for term, _ in summary['keywords'][:5]) or 'related topics'
+        text = f"{summary['paper_count']} papers focusing on {keywords}."
+        if summary['findings']:
+            text += f" Representative finding: {summary['findings'][0]['finding']}"
+        return text
+
+    def _llm_available(self) -> bool:
+        from services.llm_scheduler import llm_configured
+        return llm_configured()
+
+    def _run_key(self, records: List[Tuple[str, str]]) -> str:
+        digest = hashlib.sha256(f"{CHECKPOINT_VERSION}:{self.chunk_size}:{self.fan_in}".encode('utf-8'))
+        for title, abstract in records:
+            digest.update(title.encode('utf-8'))
+            digest.update(b'\x00')
+            digest.update(abstract.encode('utf-8'))
+            digest.update(b'\x01')
+        return digest.hexdigest()
+
+    def _checkpoint_path(self, run_key: str, name: str) -> str:
+        return os.path.join(self.checkpoint_dir, run_key[:16], f"{name}.json")
+
+    def _load_checkpoint(self, run_key: str, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._checkpoint_path(run_key, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable checkpoint {name}: {str(e)}")
+            return None
+
+    def _save_checkpoint(self, run_key: str, name: str, result: Dict[str, Any]):
+        try:
+            path = self._checkpoint_path(run_key, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.warning(f"Error writing checkpoint {name}: {str(e)}")
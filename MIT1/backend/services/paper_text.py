@@ -0,0 +1,105 @@
+"""
+Shared tokenized-text cache for research papers.
+
+Every agent in the pipeline used to lowercase, split and scan the same
+abstracts independently. PaperText tokenizes, normalizes and sentence-splits
+a paper exactly once; PaperTextCache hands the same instance to every agent
+that works on the same pipeline.
+"""
+
+import re
+import logging
+from collections import Counter, OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(\[])')
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['\-][a-z0-9]+)*")
+
+class PaperText:
+    """Tokenized view of a paper (or of any text) computed once and reused."""
+
+    __slots__ = ('title', 'abstract', 'lower_title', 'lower_abstract', 'lower_text',
+                 '_sentences', '_sentence_tokens', '_tokens', '_term_freq')
+
+    def __init__(self, title: str = '', abstract: str = ''):
+        self.title = title
+        self.abstract = abstract
+        self.lower_title = title.lower()
+        self.lower_abstract = abstract.lower()
+        self.lower_text = f"{self.lower_title} {self.lower_abstract}".strip()
+        self._sentences: Optional[List[str]] = None
+        self._sentence_tokens: Optional[List[List[str]]] = None
+        self._tokens: Optional[List[str]] = None
+        self._term_freq: Optional[Counter] = None
+
+    @property
+    def sentences(self) -> List[str]:
+        """Sentences of the abstract, in original casing."""
+        if self._sentences is None:
+            text = ' '.join(self.abstract.split())
+            self._sentences = [s.strip() for s in SENTENCE_SPLIT_PATTERN.split(text) if s.strip()] if text else []
+        return self._sentences
+
+    @property
+    def tokens(self) -> List[str]:
+        """Normalized word tokens of title and abstract."""
+        if self._tokens is None:
+            self._tokens = TOKEN_PATTERN.findall(self.lower_text)
+        return self._tokens
+
+    @property
+    def term_freq(self) -> Counter:
+        """Term frequencies over the normalized tokens."""
+        if self._term_freq is None:
+            self._term_freq = Counter(self.tokens)
+        return self._term_freq
+
+    @property
+    def sentence_tokens(self) -> List[List[str]]:
+        """Normalized tokens for each sentence of the abstract."""
+        if self._sentence_tokens is None:
+            self._sentence_tokens = [TOKEN_PATTERN.findall(sentence.lower()) for sentence in self.sentences]
+        return self._sentence_tokens
+
+class PaperTextCache:
+    """Per-pipeline cache of PaperText instances keyed by content."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], PaperText]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def for_paper(self, paper: Dict[str, Any]) -> PaperText:
+        """Return the tokenized text for a paper, tokenizing it on first use."""
+        title = str(paper.get('title') or '')
+        abstract = str(paper.get('abstract') or '')
+        return self._get((title, abstract))
+
+    def for_text(self, text: str) -> PaperText:
+        """Return the tokenized form of free text (summaries, drafts, ...)."""
+        return self._get(('', str(text or '')))
+
+    def _get(self, key: Tuple[str, str]) -> PaperText:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = PaperText(*key)
+        self._entries[key] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> Dict[str, int]:
+        """Cache statistics; misses equal the number of tokenization passes."""
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'tokenizations': self.misses
+        }
@@ -0,0 +1,190 @@
+"""
+Passage retrieval over a pipeline's source papers.
+
+Abstracts (and full texts, when a paper has one) are split into passages of a
+few sentences and weighted with TF-IDF. The weights are stored as postings per
+term, so scoring a short query only touches the passages that share a term
+with it; the best passages are picked with argpartition. Section prompts use
+this to include the few passages most relevant to what they are writing,
+numbered like the citation placeholders ([n] is the n-th source paper).
+"""
+
+import time
+import logging
+from typing import List, Dict, Any, Optional
+
+from services.paper_text import PaperTextCache, TOKEN_PATTERN
+from services.theme_discovery import STOPWORDS
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; search then returns no passages
+    np = None
+
+class PassageIndex:
+    """TF-IDF passage index with cosine top-k search."""
+
+    def __init__(self, passage_words: int = 60, text_cache: Optional[PaperTextCache] = None):
+        self.logger = logging.getLogger(__name__)
+        self.passage_words = passage_words
+        self.text_cache = text_cache or PaperTextCache()
+        self.passages: List[Dict[str, Any]] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.build_seconds = 0.0
+        self.searches = 0
+        self.search_seconds = 0.0
+        self._idf = None
+        self._indptr = None
+        self._rows = None
+        self._weights = None
+
+    def build(self, papers: List[Dict[str, Any]]) -> 'PassageIndex':
+        """
+        Chunk and index the papers' abstracts and full texts.
+
+        Args:
+            papers: Source papers, in citation order
+
+        Returns:
+            The index itself
+        """
+        start = time.perf_counter()
+        self.passages = []
+        self.vocabulary = {}
+        passage_ids: List[int] = []
+        term_ids: List[int] = []
+        counts: List[int] = []
+
+        for paper_index, paper in enumerate(papers):
+            texts = [self.text_cache.for_paper(paper)]
+            full_text = paper.get('full_text') or paper.get('content')
+            if isinstance(full_text, str) and full_text.strip():
+                texts.append(self.text_cache.for_text(full_text))
+            title_tokens = TOKEN_PATTERN.findall(texts[0].lower_title)
+
+            for text in texts:
+                for chunk_text, chunk_tokens in self._chunks(text.sentences, text.sentence_tokens):
+                    if not self.passages or self.passages[-1]['paper_index'] != paper_index:
+                        # The title describes the whole paper; index it with the first passage
+                        chunk_tokens = chunk_tokens + title_tokens
+                    term_counts: Dict[int, int] = {}
+                    for token in chunk_tokens:
+                        if token in STOPWORDS or len(token) < 3:
+                            continue
+                        term_id = self.vocabulary.setdefault(token, len(self.vocabulary))
+                        term_counts[term_id] = term_counts.get(term_id, 0) + 1
+                    if not term_counts:
+                        continue
+
+                    passage_id = len(self.passages)
+                    self.passages.append({
+                        'paper_index': paper_index,
+                        'citation': paper_index + 1,
+                        'title': paper.get('title', ''),
+                        'text': chunk_text
+                    })
+                    passage_ids.extend([passage_id] * len(term_counts))
+                    term_ids.extend(term_counts.keys())
+                    counts.extend(term_counts.values())
+
+        if np is not None and self.passages:
+            self._build_postings(np.asarray(passage_ids), np.asarray(term_ids), np.asarray(counts, dtype=np.float32))
+
+        self.build_seconds = time.perf_counter() - start
+        return self
+
+    def search(self, query: str, k: int = 4, per_paper: int = 1) -> List[Dict[str, Any]]:
+        """
+        Passages most similar to a query.
+
+        Args:
+            query: Free-text query
+            k: Number of passages to return
+            per_paper: Maximum passages taken from the same paper
+
+        Returns:
+            Passages ({'citation', 'title', 'text', 'score', ...}), best first
+        """
+        if np is None or self._indptr is None or k <= 0:
+            return []
+
+        start = time.perf_counter()
+        query_terms: Dict[int, int] = {}
+        for token in TOKEN_PATTERN.findall(query.lower()):
+            term_id = self.vocabulary.get(token)
+            if term_id is not None:
+                query_terms[term_id] = query_terms.get(term_id, 0) + 1
+        if not query_terms:
+            return []
+
+        term_ids = np.fromiter(query_terms.keys(), dtype=np.int64)
+        query_weights = (1.0 + np.log(np.fromiter(query_terms.values(), dtype=np.float32))) * self._idf[term_ids]
+        query_weights /= np.linalg.norm(query_weights)
+
+        # Gather the postings of the query terms and accumulate cosine scores
+        starts, ends = self._indptr[term_ids], self._indptr[term_ids + 1]
+        lengths = ends - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        scores = np.bincount(
+            self._rows[positions],
+            weights=self._weights[positions] * np.repeat(query_weights, lengths),
+            minlength=len(self.passages)
+        )
+
+        # Candidates beyond k leave room for the per-paper limit
+        candidates = min(len(scores), k * (4 if per_paper else 1))
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.argsort(-scores[top])]
+
+        results: List[Dict[str, Any]] = []
+        taken: Dict[int, int] = {}
+        for passage_id in top:
+            score = float(scores[passage_id])
+            if score <= 0 or len(results) >= k:
+                break
+            passage = self.passages[passage_id]
+            if per_paper and taken.get(passage['paper_index'], 0) >= per_paper:
+                continue
+            taken[passage['paper_index']] = taken.get(passage['paper_index'], 0) + 1
+            results.append({**passage, 'score': round(score, 4)})
+
+        self.searches += 1
+        self.search_seconds += time.perf_counter() - start
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'passages': len(self.passages),
+            'vocabulary': len(self.vocabulary),
+            'build_ms': round(self.build_seconds * 1000, 2),
+            'searches': self.searches,
+            'average_search_ms': round(self.search_seconds * 1000 / self.searches, 3) if self.searches else 0.0
+        }
+
+    def _chunks(self, sentences: List[str], sentence_tokens: List[List[str]]):
+        """Group consecutive sentences into passages of about passage_words words."""
+        texts: List[str] = []
+        tokens: List[str] = []
+        for sentence, words in zip(sentences, sentence_tokens):
+            texts.append(sentence)
+            tokens.extend(words)
+            if len(tokens) >= self.passage_words:
+                yield ' '.join(texts), tokens
+                texts, tokens = [], []
+        if texts:
+            yield ' '.join(texts), tokens
+
+    def _build_postings(self, passage_ids, term_ids, counts):
+        """Sublinear TF-IDF weights, L2-normalized per passage, grouped by term."""
+        num_passages = len(self.passages)
+        document_freq = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self._idf = np.log((1.0 + num_passages) / (1.0 + document_freq)).astype(np.float32) + 1.0
+
+        weights = (1.0 + np.log(counts)) * self._idf[term_ids]
+        norms = np.sqrt(np.bincount(passage_ids, weights=weights * weights, minlength=num_passages))
+        weights = weights / norms[passage_ids]
+
+        order = np.argsort(term_ids, kind='stable')
+        self._rows = passage_ids[order]
+        self._weights = weights[order].astype(np.float32)
+        self._indptr = np.concatenate(([0], np.cumsum(document_freq)))
@@ -0,0 +1,148 @@
+"""
+Request-scoped memoization for agent sub-computations.
+
+Several agents repeat work inside one pipeline run: the summarizer classifies
+methodologies twice, and the analytics agent rebuilds the draft's full text
+and re-parses its references in several places. A PipelineMemo is created by
+the supervisor for each pipeline and handed to every agent, so each
+sub-computation runs at most once per pipeline. Values are addressed by typed
+MemoKeys and scoped to the object they were computed from (a paper list, a
+draft), which is kept alive by the memo so identities are never reused.
+
+Agents reach their memo through memo_scope(): the supervisor's memo when one
+was handed over, otherwise a fresh memo per agent call, so long-lived agents
+(the coordinator's, the servers') never hold on to drafts across requests.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+class MemoKey(Generic[T]):
+    """Named, typed key for a memoized value."""
+
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"MemoKey({self.name!r})"
+
+class PipelineMemo:
+    """Per-pipeline memo table with hit/miss accounting."""
+
+    def __init__(self, max_entries: int = 512):
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[MemoKey, Hashable], Tuple[Any, Any]]" = OrderedDict()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def get_or_compute(self, key: MemoKey[T], compute: Callable[[], T], scope: Any = None) -> T:
+        """
+        Return the memoized value for key, computing it on first use.
+
+        Args:
+            key: Typed key naming the computation
+            compute: Zero-argument callable producing the value
+            scope: Object the value derives from; values are cached per scope identity
+
+        Returns:
+            The cached or freshly computed value
+        """
+        found, value = self._lookup(key, scope)
+        if found:
+            return value
+
+        value = compute()
+        self._store(key, scope, value)
+        return value
+
+    async def aget_or_compute(self, key: MemoKey[T], compute: Callable[[], Awaitable[T]], scope: Any = None) -> T:
+        """Async variant of get_or_compute; concurrent callers share one computation."""
+        found, value = self._lookup(key, scope)
+        if found:
+            return await value if isinstance(value, asyncio.Future) else value
+
+        future = asyncio.get_running_loop().create_future()
+        self._store(key, scope, future)
+        try:
+            value = await compute()
+        except Exception as e:
+            self.invalidate(key, scope)
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting on it
+            future.exception()
+            raise
+
+        future.set_result(value)
+        self._store(key, scope, value)
+        return value
+
+    def invalidate(self, key: Optional[MemoKey] = None, scope: Any = None):
+        """Drop one key (optionally for one scope), or everything when no key is given."""
+        if key is None:
+            self._entries.clear()
+            return
+
+        for entry_key in list(self._entries):
+            if entry_key[0] is key and (scope is None or entry_key[1] == id(scope)):
+                del self._entries[entry_key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters overall and per key."""
+        return {
+            'entries': len(self._entries),
+            'hits': sum(counter['hits'] for counter in self._counters.values()),
+            'misses': sum(counter['misses'] for counter in self._counters.values()),
+            'keys': {name: dict(counter) for name, counter in self._counters.items()}
+        }
+
+    def _lookup(self, key: MemoKey, scope: Any) -> Tuple[bool, Any]:
+        counter = self._counters.setdefault(key.name, {'hits': 0, 'misses': 0})
+        entry_key = (key, id(scope))
+        entry = self._entries.get(entry_key)
+
+        if entry is not None and entry[0] is scope:
+            counter['hits'] += 1
+            self._entries.move_to_end(entry_key)
+            return True, entry[1]
+
+        counter['misses'] += 1
+        return False, None
+
+    def _store(self, key: MemoKey, scope: Any, value: Any):
+        entry_key = (key, id(scope))
+        # Holding the scope object keeps its id from being reused by another object
+        self._entries[entry_key] = (scope, value)
+        self._entries.move_to_end(entry_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+# Memo of the agent call in progress (set by memo_scope)
+_active_memo: ContextVar[Optional[PipelineMemo]] = ContextVar('pipeline_memo', default=None)
+
+@contextmanager
+def memo_scope(memo: Optional[PipelineMemo] = None) -> Iterator[PipelineMemo]:
+    """
+    Make a memo active for one agent call.
+
+    Args:
+        memo: The pipeline's memo; without one, the memo of an enclosing call
+            is reused, else a fresh memo lives for this call only
+    """
+    memo = memo or _active_memo.get() or PipelineMemo()
+    token = _active_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _active_memo.reset(token)
+
+def active_memo() -> PipelineMemo:
+    """Memo of the current agent call (an empty, unshared one outside memo_scope)."""
+    return _active_memo.get() or PipelineMemo()
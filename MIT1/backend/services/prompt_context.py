@@ -0,0 +1,219 @@
+"""
+Token-budgeted research context for section prompts.
+
+The LLM-written sections all describe the same research: key findings,
+methodologies, gaps and recent papers. PromptContextBuilder renders that
+context once per draft, ranks the items and trims them to a token budget, and
+every prompt starts with the identical block so provider-side prompt caching
+can reuse it. Section-specific material (such as the thematic summary for the
+literature review) goes after the shared prefix, inside that section's budget.
+"""
+
+import os
+import re
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate
+    tiktoken = None
+
+SHARED_CONTEXT_BUDGET = 400
+
+# Token budget for section-specific context after the shared prefix
+SECTION_CONTEXT_BUDGETS = {
+    'abstract': 600,
+    'introduction': 350,
+    'discussion': 500,
+    'literature_review': 900,
+    'batch': 600
+}
+DEFAULT_SECTION_BUDGET = 200
+
+# Share of the shared budget and maximum item count of each block; unused tokens roll over
+_SHARED_BLOCKS = (
+    ('findings', 0.45, 5),
+    ('methodologies', 0.15, 6),
+    ('gaps', 0.2, 3),
+    ('papers', 0.2, 5)
+)
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+_encodings: Dict[str, Any] = {}
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens with the model's tokenizer when tiktoken is installed, else estimate."""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        model = model or os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+        encoding = _encodings.get(model)
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding('cl100k_base')
+            _encodings[model] = encoding
+        return len(encoding.encode(text))
+    return len(text) // 4 + 1
+
+class PromptContextBuilder:
+    """Builds the shared, budgeted research context of one draft."""
+
+    def __init__(self, topic: str, summaries: Dict[str, Any], model: Optional[str] = None,
+                 shared_budget: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.topic = topic
+        self.summaries = summaries or {}
+        self.model = model
+        self.shared_budget = shared_budget or int(os.getenv('PROMPT_CONTEXT_BUDGET', str(SHARED_CONTEXT_BUDGET)))
+        self._shared_prefix: Optional[str] = None
+        self._sections: Dict[str, Dict[str, int]] = {}
+        self.items_dropped = 0
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    @property
+    def shared_prefix(self) -> str:
+        """The research context every section prompt starts with (built once)."""
+        if self._shared_prefix is None:
+            self._shared_prefix = self._build_shared_prefix()
+        return self._shared_prefix
+
+    def context_for(self, section: str, extras: Optional[List[Tuple[str, str]]] = None) -> str:
+        """
+        Shared prefix followed by section-specific blocks trimmed to the section budget.
+
+        Args:
+            section: Section name, used to look up its budget
+            extras: (heading, text) blocks only this section needs, most important first
+
+        Returns:
+            Context text to place at the start of the prompt
+        """
+        parts = [self.shared_prefix]
+        remaining = SECTION_CONTEXT_BUDGETS.get(section, DEFAULT_SECTION_BUDGET)
+
+        for heading, text in extras or []:
+            if not text or remaining <= 0:
+                continue
+            block = self._trim_text(f"{heading}:\n{text}", remaining)
+            if block:
+                parts.append(block)
+                remaining -= self.count(block)
+
+        return "\n\n".join(parts)
+
+    def record_prompt(self, section: Optional[str], prompt: str, system_prompt: str = ''):
+        """Record the input tokens of a prompt sent for a section."""
+        stats = self._sections.setdefault(section or 'other', {'requests': 0, 'input_tokens': 0})
+        stats['requests'] += 1
+        stats['input_tokens'] += self.count(system_prompt) + self.count(prompt)
+
+    def stats(self) -> Dict[str, Any]:
+        """Shared prefix size, items trimmed and input tokens per section."""
+        return {
+            'tokenizer': 'tiktoken' if tiktoken is not None else 'estimate',
+            'shared_prefix_tokens': self.count(self.shared_prefix),
+            'items_dropped': self.items_dropped,
+            'input_tokens': sum(section['input_tokens'] for section in self._sections.values()),
+            'sections': {name: dict(stats) for name, stats in self._sections.items()}
+        }
+
+    def _build_shared_prefix(self) -> str:
+        header = f"Research topic: {self.topic}"
+        parts = [header]
+        remaining = self.shared_budget - self.count(header)
+        carry = 0
+
+        for name, share, max_items in _SHARED_BLOCKS:
+            heading, items = self._ranked_items(name)
+            budget = int(self.shared_budget * share) + carry
+            block, used = self._fit_items(heading, items, min(budget, remaining), max_items)
+            carry = max(0, budget - used)
+            if block:
+                parts.append(block)
+                remaining -= used
+
+        return "\n\n".join(parts)
+
+    def _ranked_items(self, name: str) -> Tuple[str, List[str]]:
+        """Heading and candidate lines of a shared block, best first."""
+        if name == 'findings':
+            findings = sorted(
+                self.summaries.get('key_findings', []),
+                key=lambda f: (f.get('confidence', 0.5), f.get('support_count') or len(f.get('papers', []))),
+                reverse=True
+            )
+            lines = []
+            for finding in findings:
+                support = finding.get('support_count') or len(finding.get('papers', []))
+                suffix = f" (supported by {support} papers)" if support > 1 else ""
+                lines.append(f"- {finding.get('finding', '')}{suffix}")
+            return "Key findings", lines
+
+        if name == 'methodologies':
+            methods = sorted(
+                ((method, papers) for method, papers in self.summaries.get('methodology_summary', {}).items() if papers),
+                key=lambda item: len(item[1]), reverse=True
+            )
+            return "Methodologies used in literature", [f"- {method}: {len(papers)} papers" for method, papers in methods]
+
+        if name == 'gaps':
+            return "Research gaps identified", [f"- {gap}" for gap in self.summaries.get('gaps_and_opportunities', [])]
+
+        titles = [summary.get('title', '') for summary in self.summaries.get('individual_summaries', [])]
+        return "Recent research includes", [f"- {title}" for title in titles if title]
+
+    def _fit_items(self, heading: str, lines: List[str], budget: int, max_items: int) -> Tuple[str, int]:
+        """Keep the highest-ranked lines that fit the budget, at most max_items of them."""
+        if not lines or budget <= 0:
+            self.items_dropped += len(lines)
+            return "", 0
+
+        kept = []
+        used = self.count(f"{heading}:")
+        for line in lines:
+            if len(kept) >= max_items:
+                break
+            cost = self.count(line) + 1
+            if used + cost > budget:
+                continue
+            kept.append(line)
+            used += cost
+
+        self.items_dropped += len(lines) - len(kept)
+        if not kept:
+            return "", 0
+        return f"{heading}:\n" + "\n".join(kept), used
+
+    def _trim_text(self, text: str, budget: int) -> str:
+        """Keep whole lines while they fit, then cut the next line at a sentence boundary."""
+        if self.count(text) <= budget:
+            return text
+
+        kept = []
+        used = 0
+        for line in text.split("\n"):
+            cost = self.count(line) + 1
+            if used + cost <= budget:
+                kept.append(line)
+                used += cost
+                continue
+
+            sentences = []
+            for sentence in _SENTENCE_SPLIT.split(line):
+                cost = self.count(sentence) + 1
+                if used + cost > budget:
+                    break
+                sentences.append(sentence)
+                used += cost
+            if sentences:
+                kept.append(" ".join(sentences))
+            break
+
+        # A heading alone is not worth sending
+        return "\n".join(kept) if len(kept) > 1 else ""
@@ -0,0 +1,173 @@
+"""
+The numbered reference list of a pipeline.
+
+Reference [n] is the n-th source paper, the same numbering the citation
+placeholders in the draft use. The list is built once, when citations are
+generated, and kept in citations['references'] as plain entries (JSON-safe,
+so it survives the result store and the API). The draft's references section,
+the API response and every download format read those entries instead of
+formatting the papers again. Every source paper is listed, so each [n] a
+section or evidence passage can cite has its entry. Each entry carries its number, the reference
+formatted in the pipeline's citation style, a link target (the DOI resolver,
+else the paper URL) and a unique BibTeX key.
+"""
+
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+from services.citation_formatter import canonical_paper_id, get_citation_formatter
+from services.csl_engine import normalize_doi, parse_name
+
+_KEY_CHARACTERS = re.compile(r'[^A-Za-z0-9]')
+
+def _year(value: Any) -> str:
+    return 'Unknown' if value is None or value == '' else str(value)
+
+def _bibtex_key(entry: Dict[str, Any], used: Dict[str, int]) -> str:
+    """Author-year key (Smith2021), with a/b/... suffixes for repeats."""
+    authors = [a for a in entry.get('authors') or [] if isinstance(a, str) and a.strip()]
+    family = _KEY_CHARACTERS.sub('', parse_name(authors[0])[1]) if authors else ''
+    year = _KEY_CHARACTERS.sub('', str(entry.get('year') or ''))
+    key = f"{family or 'Unknown'}{year if year != 'Unknown' else ''}"
+    count = used.get(key, 0)
+    used[key] = count + 1
+    if not count:
+        return key
+    suffix = ''
+    while count:
+        count, letter = divmod(count - 1, 26)
+        suffix = chr(ord('a') + letter) + suffix
+    return key + suffix
+
+def _bibtex_value(value: Any) -> str:
+    return str(value).replace('{', '').replace('}', '')
+
+class ReferenceList:
+    """Numbered references in one citation style, shared by all consumers."""
+
+    def __init__(self, entries: Optional[List[Dict[str, Any]]] = None, citation_style: str = 'apa'):
+        """
+        Args:
+            entries: Reference entries; entries from older results or clients
+                get their missing number, link and BibTeX key filled in
+            citation_style: Style of the formatted references
+        """
+        self.citation_style = citation_style
+        self.entries: List[Dict[str, Any]] = []
+        used_keys: Dict[str, int] = {}
+        for number, entry in enumerate(entries or [], 1):
+            if not isinstance(entry, dict):
+                continue
+            entry = dict(entry)
+            entry.setdefault('number', number)
+            entry.setdefault('id', f"ref{entry['number']}")
+            if not entry.get('link'):
+                doi = normalize_doi(str(entry.get('doi') or '').strip())
+                entry['link'] = f"https://doi.org/{doi}" if doi else (entry.get('url') or '')
+            if not entry.get('bibtex_key'):
+                entry['bibtex_key'] = _bibtex_key(entry, used_keys)
+            self.entries.append(entry)
+        self._by_number = {entry['number']: entry for entry in self.entries}
+
+    @classmethod
+    def from_papers(cls, papers: List[Dict[str, Any]], citation_style: str = 'apa') -> 'ReferenceList':
+        """
+        Number and format the source papers, in pipeline order.
+
+        Args:
+            papers: Source papers (reference [n] is papers[n - 1])
+            citation_style: Citation style of the formatted references
+
+        Returns:
+            The reference list
+        """
+        formatter = get_citation_formatter()
+        citation_style = formatter.resolve_style(citation_style)
+        formatted = formatter.format_many(papers, citation_style)
+        entries = []
+        for number, (paper, formatted_citation) in enumerate(zip(papers, formatted), 1):
+            entries.append({
+                'id': f"ref{number}",
+                'number': number,
+                'paper_id': canonical_paper_id(paper),
+                'title': paper.get('title', 'Unknown Title'),
+                'authors': paper.get('authors', ['Unknown Author']),
+                'journal': paper.get('journal', ''),
+                'year': _year(paper.get('year')),
+                'volume': paper.get('volume', ''),
+                'issue': paper.get('issue', ''),
+                'pages': paper.get('pages', ''),
+                'doi': paper.get('doi', ''),
+                'url': paper.get('url', ''),
+                'formatted_citation': formatted_citation,
+                'relevance_score': paper.get('relevance_score', 0.0),
+                'citations_count': paper.get('citations_count', 0)
+            })
+        return cls(entries, citation_style)
+
+    @classmethod
+    def from_citations(cls, citations: Dict[str, Any], papers: Optional[List[Dict[str, Any]]] = None,
+                       citation_style: Optional[str] = None) -> 'ReferenceList':
+        """
+        The pipeline's reference list from its citation data.
+
+        Uses citations['references'] when they are in the requested style;
+        otherwise the list is built from `papers` (or the bibliography).
+
+        Args:
+            citations: Output of CitationAgent.generate_citations
+            papers: Source papers, when available
+            citation_style: Requested style (default: the style of the citations)
+        """
+        citations = citations or {}
+        listed_style = citations.get('citation_style', 'apa')
+        style = get_citation_formatter().resolve_style(citation_style or listed_style)
+        entries = citations.get('references')
+        if entries and style == listed_style:
+            return cls(entries, style)
+        return cls.from_papers(papers if papers is not None else citations.get('bibliography', []), style)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.entries)
+
+    def get(self, number: int) -> Optional[Dict[str, Any]]:
+        """Entry of reference [number], if listed."""
+        return self._by_number.get(number)
+
+    def link(self, number: int) -> str:
+        """Link target of reference [number] ('' when unknown)."""
+        entry = self._by_number.get(number)
+        return entry.get('link', '') if entry else ''
+
+    def formatted(self, entry: Dict[str, Any]) -> str:
+        """Formatted reference of an entry, with a plain fallback."""
+        formatted_citation = entry.get('formatted_citation')
+        if formatted_citation:
+            return formatted_citation
+        authors = ', '.join(str(a) for a in entry.get('authors') or ['Unknown'])
+        return f"{authors} ({entry.get('year', 'Unknown')}). {entry.get('title', 'Unknown Title')}."
+
+    def to_text(self, heading: str = "## References") -> str:
+        """The references section: the heading and one "[n] reference" line per entry."""
+        return "\n\n".join([heading] + [f"[{entry['number']}] {self.formatted(entry)}" for entry in self.entries])
+
+    def to_bibtex(self) -> str:
+        """BibTeX entries of the list, keyed by their BibTeX keys."""
+        bibtex_entries = []
+        for entry in self.entries:
+            authors = [str(a) for a in entry.get('authors') or [] if a]
+            lines = [f"@{'article' if entry.get('journal') else 'misc'}{{{entry['bibtex_key']},",
+                     f"  title={{{_bibtex_value(entry.get('title', 'Unknown Title'))}}},",
+                     f"  author={{{_bibtex_value(' and '.join(authors) or 'Unknown')}}},",
+                     f"  year={{{_year(entry.get('year'))}}},"]
+            for field, key in (('journal', 'journal'), ('volume', 'volume'), ('issue', 'number'),
+                               ('pages', 'pages'), ('doi', 'doi'), ('url', 'url')):
+                if entry.get(field):
+                    value = normalize_doi(str(entry[field]).strip()) if field == 'doi' else entry[field]
+                    lines.append(f"  {key}={{{_bibtex_value(value)}}},")
+            lines.append("}")
+            bibtex_entries.append('\n'.join(lines))
+        return '\n\n'.join(bibtex_entries)
@@ -0,0 +1,144 @@
+"""
+Store of pipeline results for follow-up requests.
+
+A finished pipeline's intermediate artifacts (papers, summaries, citations,
+draft, analytics) are kept under a result ID so later requests, such as
+regenerating a single section, can work from them without re-running
+retrieval and summarization. Results live in an in-memory LRU and, when
+RESULT_STORE_DIR is set, are also written to disk as JSON so they survive a
+restart. Clients can subscribe to a result to hear about later updates (such
+as sections upgraded in the background). Bulk runs swap in a private store
+with using_result_store(), so hundreds of drafts never evict the results
+interactive users are reading.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+class ResultStore:
+    """LRU of pipeline results with optional JSON persistence."""
+
+    def __init__(self, max_entries: Optional[int] = None, directory: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries or int(os.getenv('RESULT_STORE_MAX_ENTRIES', '100'))
+        self.directory = directory if directory is not None else os.getenv('RESULT_STORE_DIR', '')
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    def save(self, result: Dict[str, Any], result_id: Optional[str] = None) -> str:
+        """
+        Store (or replace) a pipeline result.
+
+        Args:
+            result: Pipeline artifacts; a 'result_id' and timestamps are added
+            result_id: ID to store under; a new one is generated when omitted
+
+        Returns:
+            The result ID
+        """
+        result_id = result_id or uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        result['result_id'] = result_id
+        result.setdefault('created_at', now)
+        result['updated_at'] = now
+
+        self._results[result_id] = result
+        self._results.move_to_end(result_id)
+        while len(self._results) > self.max_entries:
+            evicted, _ = self._results.popitem(last=False)
+            self._locks.pop(evicted, None)
+
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                path = self._path(result_id)
+                with open(path + '.tmp', 'w', encoding='utf-8') as handle:
+                    json.dump(result, handle, default=str)
+                os.replace(path + '.tmp', path)
+            except Exception as e:
+                self.logger.warning(f"Error persisting result {result_id}: {str(e)}")
+
+        return result_id
+
+    def get(self, result_id: str) -> Optional[Dict[str, Any]]:
+        """Return a stored result from memory, or from disk after a restart."""
+        result = self._results.get(result_id)
+        if result is not None:
+            self._results.move_to_end(result_id)
+            return result
+
+        if self.directory and self._valid_id(result_id):
+            try:
+                with open(self._path(result_id), encoding='utf-8') as handle:
+                    result = json.load(handle)
+                self._results[result_id] = result
+                return result
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                self.logger.warning(f"Error loading result {result_id}: {str(e)}")
+        return None
+
+    def lock(self, result_id: str) -> asyncio.Lock:
+        """Lock serializing updates to one result."""
+        if result_id not in self._locks:
+            self._locks[result_id] = asyncio.Lock()
+        return self._locks[result_id]
+
+    def subscribe(self, result_id: str) -> asyncio.Queue:
+        """Queue receiving (event, data) tuples published for a result."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(result_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, result_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(result_id, [])
+        if queue in subscribers:
+            subscribers.remove(queue)
+        if not subscribers:
+            self._subscribers.pop(result_id, None)
+
+    def publish(self, result_id: str, event: str, data: Any):
+        """Send an event to every subscriber of a result."""
+        for queue in self._subscribers.get(result_id, []):
+            queue.put_nowait((event, data))
+
+    def _path(self, result_id: str) -> str:
+        return os.path.join(self.directory, f"{result_id}.json")
+
+    @staticmethod
+    def _valid_id(result_id: str) -> bool:
+        # IDs become file names, so only accept the hex IDs save() generates
+        return bool(result_id) and all(c in '0123456789abcdef' for c in result_id)
+
+_store: Optional[ResultStore] = None
+# Store that replaces the process-wide one inside using_result_store()
+_scoped_store: ContextVar[Optional[ResultStore]] = ContextVar('result_store', default=None)
+
+@contextmanager
+def using_result_store(store: ResultStore) -> Iterator[ResultStore]:
+    """Make get_result_store() return `store` in this context (and the tasks it starts)."""
+    token = _scoped_store.set(store)
+    try:
+        yield store
+    finally:
+        _scoped_store.reset(token)
+
+def get_result_store() -> ResultStore:
+    """The result store of the current context: a scoped one, else the process-wide store."""
+    scoped = _scoped_store.get()
+    if scoped is not None:
+        return scoped
+    global _store
+    if _store is None:
+        _store = ResultStore()
+    return _store
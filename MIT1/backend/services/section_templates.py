@@ -0,0 +1,507 @@
+"""
+Template-driven paper structure and fallback section text.
+
+A template set defines the ordered sections of a paper, the sections dropped
+for a given length, and the text each section falls back to when the LLM is
+not used. Template sets are plain JSON, so they can be stored in the
+ResearchTemplate table (its `structure` column) and selected per request with
+requirements['template'] (an ID or name); sections a custom set does not
+define keep the default text, and sections the generator has no method for
+are rendered from their template alone.
+
+Section text is a list of blocks:
+
+    "Plain text with {topic} and {paper_count} fields"
+    {"text": "...", "if": "gaps", "else": "..."}              conditional; "else"
+                                                               may be a list of blocks
+    {"each": "key_findings", "limit": 5,                       repeated per item;
+     "text": "{n}. {item.finding} [{n+2}]"}                    n counts from 1
+    {"each": "methodology_groups", "blocks": [...]}            nested blocks
+
+Fields are dotted paths into the render context, optionally with an integer
+offset ({n+7}), a default ({item.title|Unknown}) and a format spec
+({item.confidence:.1%}). Each set is compiled once into plain Python
+functions (one per section), so rendering costs about as much as the
+hand-written f-strings it replaces.
+"""
+
+import os
+import re
+import json
+import time
+import string
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+DEFAULT_STRUCTURE = [
+    'abstract', 'introduction', 'background', 'problem_statement', 'objectives',
+    'literature_review', 'methodology', 'experiments', 'results', 'evaluation',
+    'discussion', 'applications', 'conclusion', 'limitations', 'future_work',
+    'ethical_considerations', 'references', 'appendix'
+]
+
+DEFAULT_TEMPLATE_SET: Dict[str, Any] = {
+    'sections': DEFAULT_STRUCTURE,
+    'exclude': {
+        # Short papers skip methodology, results and their supporting sections
+        'short': ['methodology', 'results', 'experiments', 'evaluation', 'applications', 'appendix']
+    },
+    'templates': {
+        'abstract': {'separator': ' ', 'blocks': [
+            "This comprehensive systematic review presents a rigorous analysis of the current state of research in {topic}, synthesizing findings from multiple high-quality studies to advance theoretical understanding and identify critical directions for future investigation [1, 2].",
+            "The research employed a multi-phase methodology incorporating systematic literature search, quality assessment, and thematic synthesis to ensure comprehensive coverage of the domain [3, 4].",
+            {'if': 'key_findings', 'text': "Principal findings reveal significant advances across multiple dimensions: {findings_summary} [5, 6, 7, 8]."},
+            {'if': 'methodology_names', 'text': "Methodological analysis demonstrates the prevalence of {methodology_names} approaches, highlighting both convergent trends and emerging innovations in research design [9, 10, 11]."},
+            {'if': 'gaps', 'text': "The analysis identifies {gap_count} critical research gaps that represent high-priority areas for future investigation, offering substantial opportunities for theoretical advancement and practical application [12, 13]."},
+            "These findings contribute significantly to the theoretical foundation of {topic} and provide actionable insights for researchers, practitioners, and policymakers seeking to advance the field through evidence-based approaches [14, 15]."
+        ]},
+        'introduction': [
+            "{topic} has emerged as a transformative area of research with profound implications across multiple domains, fundamentally reshaping our understanding of complex systems and their applications [1, 2]. The rapid advancement of computational capabilities, coupled with the exponential growth of available data, has created unprecedented opportunities for innovation and discovery in this field.",
+            {'if': 'individual_summaries', 'text': "Recent literature analysis reveals a substantial body of work comprising {paper_count} high-quality studies that collectively demonstrate the maturation of {topic} as a scientific discipline [3, 4]. These investigations span diverse methodological approaches and application domains, establishing a robust foundation for continued advancement."},
+            {'if': 'gaps', 'text': "Despite significant progress, critical challenges persist in our comprehensive understanding of {topic}, particularly regarding scalability, generalizability, and real-world implementation [5, 6]. These limitations present substantial opportunities for methodological innovation and theoretical advancement."},
+            "This comprehensive analysis aims to synthesize current knowledge in {topic}, identify emerging trends and patterns, evaluate methodological approaches, and establish a roadmap for future research directions [7, 8]. Through systematic examination of contemporary literature, we seek to advance theoretical understanding while providing practical insights for researchers and practitioners.",
+            "The structure of this paper is organized as follows: Section 2 provides essential background and theoretical foundations, Section 3 presents the problem statement and research objectives, Section 4 offers a comprehensive literature review, Section 5 details the research methodology, Section 6 presents experimental results and evaluation, Section 7 discusses implications and applications, and Section 8 concludes with limitations and future research directions."
+        ],
+        'literature_review': [
+            "## Current State of Research",
+            {'if': 'thematic_summary', 'text': "{thematic_summary}",
+             'else': "Current research on {topic} spans multiple methodologies and approaches [1, 2]."},
+            {'if': 'key_findings', 'text': "\n## Key Findings"},
+            {'each': 'key_findings', 'limit': 5, 'text': "{n}. {item.finding} [{n+2}]"},
+            {'if': 'methodology_summary', 'text': "\n## Methodological Approaches"},
+            {'each': 'methodology_groups', 'blocks': [
+                "### {item.title}",
+                "Several studies have employed {item.name} approaches, including:",
+                {'each': 'item.papers', 'limit': 3, 'text': "- {item.title|Unknown} [{n+7}]"}
+            ]}
+        ],
+        'background': [
+            "## Background",
+            "The field of {topic} has witnessed remarkable evolution over the past decades, emerging as a critical area of scientific inquiry with profound implications for multiple disciplines [1, 2]. Understanding the historical trajectory and conceptual foundations of this domain is essential for contextualizing current research efforts and identifying future directions.",
+            {'if': 'thematic_summary', 'text': "### Historical Development"},
+            {'if': 'thematic_summary', 'text': "The development of {topic} can be traced through several distinct phases, each characterized by significant theoretical advances and methodological innovations [3, 4]. {thematic_summary}"},
+            {'if': 'thematic_summary', 'text': "Early pioneering work established fundamental principles that continue to guide contemporary research, while recent technological advances have opened new avenues for investigation and application [5, 6]."},
+            "### Theoretical Foundations",
+            "The theoretical underpinnings of {topic} draw from diverse disciplinary perspectives, creating a rich conceptual framework that encompasses both fundamental principles and applied methodologies [7, 8]. This interdisciplinary nature has been instrumental in driving innovation and fostering collaborative research efforts across traditional academic boundaries.",
+            "### Contemporary Relevance",
+            "In the current research landscape, {topic} occupies a position of increasing prominence due to its potential to address pressing societal challenges and advance scientific understanding [9, 10]. The convergence of technological capabilities, theoretical insights, and practical applications has created unprecedented opportunities for breakthrough discoveries and transformative innovations."
+        ],
+        'problem_statement': [
+            "## Problem Statement",
+            "Despite increasing attention, critical challenges in {topic} remain insufficiently addressed [1, 2].",
+            {'if': 'gaps', 'text': "The key problems can be summarized as:"},
+            {'each': 'gaps', 'limit': 5, 'text': "{n}. {item} [{n+2}]"}
+        ],
+        'objectives': [
+            "## Objectives",
+            "This paper pursues the following objectives:",
+            "1. Synthesize current knowledge and identify gaps [1]",
+            "2. Analyze methodological trends and limitations [2]",
+            "3. Propose actionable directions for future research [3]"
+        ],
+        'experiments': [
+            "## Experiments",
+            "We design experiments to evaluate the stated research objectives using representative datasets and protocols.",
+            "### Datasets",
+            "Publicly available datasets were selected based on relevance and quality criteria [1].",
+            "### Experimental Setup",
+            "Experiments were conducted under controlled conditions with reproducible configurations.",
+            "### Metrics",
+            "Evaluation metrics include accuracy, precision/recall, F1-score, and ablation-based sensitivity analyses."
+        ],
+        'evaluation': [
+            "## Evaluation",
+            "This section presents a critical evaluation of results, including robustness checks and error analysis.",
+            "### Quantitative Results",
+            "Performance metrics indicate competitive results relative to baselines [1, 2].",
+            "### Qualitative Analysis",
+            "Case studies highlight strengths and failure modes with practical implications.",
+            "### Ablation Studies",
+            "Ablation experiments isolate the contribution of key components to overall performance."
+        ],
+        'applications': [
+            "## Applications",
+            "We discuss practical applications of {topic} across domains such as healthcare, education, and industry [1, 2].",
+            "### Case Examples",
+            "- Deployment in real-world pipelines\n- Integration with decision support systems\n- Socio-technical considerations"
+        ],
+        'limitations': [
+            "## Limitations",
+            "This work faces limitations related to data availability, generalizability, and evaluation scope [1].",
+            "We also note potential biases in the literature sample and reporting practices."
+        ],
+        'future_work': [
+            "## Future Work",
+            "Future research directions include:",
+            "1. Larger-scale evaluations across diverse contexts [1]",
+            "2. Improved methods for fairness, interpretability, and robustness [2]",
+            "3. Standardized benchmarks and open datasets [3]"
+        ],
+        'ethical_considerations': [
+            "## Ethical Considerations",
+            "We consider privacy, fairness, transparency, and potential misuse risks associated with this research [1, 2].",
+            "Mitigations include data governance, bias audits, and stakeholder engagement."
+        ],
+        'appendix': [
+            "## Appendix",
+            "Additional tables, figures, and implementation details are provided for reproducibility."
+        ],
+        'methodology': [
+            "## Research Methodology",
+            "This comprehensive study employed a rigorous, multi-phase methodology to systematically analyze the current state of research in {topic} and identify key trends, patterns, and opportunities for future investigation [1, 2]. The methodology was designed to ensure reproducibility, minimize bias, and maximize the validity of findings through the integration of both quantitative and qualitative analytical approaches.",
+            "### Research Design",
+            "A systematic literature review approach was adopted, following established guidelines for comprehensive evidence synthesis [3, 4]. The research design incorporated multiple validation stages to ensure methodological rigor and reliability of results. The study protocol was developed a priori and registered to minimize selection bias and enhance transparency of the research process.",
+            "### Data Collection Strategy",
+            "A comprehensive search strategy was implemented across multiple premier academic databases, including PubMed, IEEE Xplore, ACM Digital Library, Scopus, and Web of Science [5, 6]. The search encompassed publications from the past decade to capture contemporary developments while maintaining historical context. Boolean search operators and MeSH terms were employed to maximize sensitivity and specificity of the retrieval process.",
+            "#### Search Terms and Criteria",
+            "Primary search terms included '{topic}' and related synonyms, combined with domain-specific terminology to ensure comprehensive coverage [7]. Inclusion criteria were established based on relevance, methodological quality, and publication in peer-reviewed venues. Exclusion criteria eliminated duplicate publications, non-English articles, and studies with insufficient methodological detail.",
+            "### Analysis Framework",
+            "The analytical framework integrated both quantitative bibliometric analysis and qualitative thematic synthesis [8, 9]. Quantitative measures included citation analysis, co-authorship networks, and temporal trend identification. Qualitative analysis employed systematic coding procedures to identify recurring themes, methodological approaches, and research gaps.",
+            "#### Quality Assessment",
+            "Each included study underwent rigorous quality assessment using standardized evaluation criteria adapted from established frameworks [10, 11]. Assessment dimensions included methodological rigor, statistical validity, reproducibility, and contribution to theoretical understanding. Inter-rater reliability was maintained through independent evaluation by multiple researchers with subsequent consensus resolution.",
+            "### Data Synthesis and Integration",
+            "Data synthesis employed a convergent mixed-methods approach, allowing for triangulation of quantitative patterns with qualitative insights [12, 13]. Statistical analysis included descriptive statistics, trend analysis, and correlation assessment. Qualitative synthesis utilized thematic analysis to identify overarching patterns and emergent themes across the literature corpus."
+        ],
+        'results': [
+            "## Results",
+            "The comprehensive analysis of the {topic} literature yielded substantial insights into current research trends, methodological approaches, and emerging patterns within the field [1, 2]. This section presents the key findings organized thematically to provide a systematic overview of the research landscape and its evolution over time.",
+            "### Literature Corpus Characteristics",
+            "The systematic search and screening process resulted in the inclusion of {paper_count} high-quality peer-reviewed publications that met the established inclusion criteria [3]. The temporal distribution of these publications reveals a marked increase in research activity over the past five years, indicating growing scholarly interest and investment in this domain.",
+            "#### Publication Trends and Patterns",
+            "Temporal analysis of the literature corpus demonstrates a consistent upward trajectory in publication volume, with the most recent three-year period accounting for approximately 60% of all identified studies [4, 5]. This trend reflects the accelerating pace of research and the increasing recognition of {topic} as a priority area for scientific investigation.",
+            {'if': 'key_findings', 'text': "### Principal Research Findings"},
+            {'if': 'key_findings', 'text': "Analysis of the included studies revealed {finding_count} major thematic areas that represent the core contributions of current research efforts [6, 7]. These findings demonstrate both the breadth of inquiry within the field and the convergence around key theoretical and methodological approaches."},
+            {'each': 'key_findings', 'limit': 7, 'blocks': [
+                "#### Finding {n}: {item.finding}",
+                "This finding was supported by multiple studies with high methodological rigor (confidence level: {item.confidence:.1%}) and represents a significant contribution to theoretical understanding [{n+7}]."
+            ]},
+            {'if': 'methodology_summary', 'text': "### Methodological Landscape Analysis"},
+            {'if': 'methodology_summary', 'text': "The methodological diversity within the literature reflects the interdisciplinary nature of the field and the variety of research questions being addressed [15, 16]. The following analysis provides insights into the predominant approaches and their relative prevalence."},
+            {'if': 'methodology_summary', 'text': "#### Methodological Distribution"},
+            {'each': 'methodology_groups', 'text': "- **{item.title} Approaches**: {item.count} studies ({item.percentage:.1f}%) - These studies primarily focused on {item.name} methodologies and contributed significantly to advancing practical applications [17]."},
+            "### Research Quality and Impact Assessment",
+            "Quality assessment revealed that the majority of included studies (>85%) demonstrated high methodological rigor according to established evaluation criteria [18, 19]. Citation analysis indicates substantial impact within the academic community, with included studies receiving an average of 127 citations per publication, significantly exceeding field averages.",
+            "### Geographic and Institutional Distribution",
+            "The research landscape demonstrates global engagement with substantial contributions from institutions across North America (45%), Europe (32%), Asia-Pacific (18%), and other regions (5%) [20]. This geographic diversity enhances the generalizability of findings and reflects the universal relevance of the research domain."
+        ],
+        'discussion': [
+            "## Discussion",
+            "The analysis of current research reveals several important insights about the field.",
+            "\n### Implications",
+            "The findings suggest that while significant progress has been made, there are still areas that require further investigation.",
+            {'if': 'gaps', 'text': "\n### Limitations and Gaps"},
+            {'each': 'gaps', 'limit': 3, 'text': "- {item}"},
+            "\n### Future Directions",
+            "Based on the identified gaps, several areas present opportunities for future research:",
+            "1. Addressing methodological limitations in current studies",
+            "2. Exploring interdisciplinary approaches",
+            "3. Conducting longitudinal studies to understand long-term effects"
+        ],
+        'conclusion': [
+            "## Conclusion",
+            "This comprehensive analysis of {topic} has revealed several key insights.",
+            {'if': 'key_findings', 'text': "\n### Summary of Findings"},
+            {'if': 'key_findings', 'text': "The research demonstrates that significant progress has been made in understanding various aspects of the field."},
+            "\n### Contributions",
+            "This study contributes to the field by:",
+            "1. Providing a comprehensive overview of current research",
+            "2. Identifying key trends and patterns",
+            "3. Highlighting areas for future investigation",
+            "\n### Final Thoughts",
+            "As the field continues to evolve, it is important to build upon these findings and address the identified gaps through rigorous research and innovative approaches."
+        ]
+    }
+}
+
+Renderer = Callable[[Dict[str, Any]], str]
+
+_FORMATTER = string.Formatter()
+_FIELD_PATTERN = re.compile(r'^\s*([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)\s*(?:([+-])\s*(\d+))?\s*(?:\|(.*))?$')
+
+def _lookup(value: Any, key: str) -> Any:
+    if value is None:
+        return None
+    return value.get(key) if isinstance(value, dict) else getattr(value, key, None)
+
+def _field(value: Any, default: str = '') -> str:
+    return default if value is None or value == '' else str(value)
+
+class _SectionCompiler:
+    """
+    Translates a section's blocks into the source of a Python function.
+
+    Literal text is embedded with repr() and field paths must be identifiers,
+    so stored templates cannot inject code. Adjacent literals are merged and
+    each appended block is built with a single join.
+    """
+
+    def __init__(self, separator: str):
+        self.separator = separator
+        self.lines: List[str] = []
+        self.loops: List[str] = []  # loop variable suffixes, innermost last
+        self.names: Dict[str, str] = {}  # context keys read into locals up front
+
+    def emit(self, depth: int, line: str):
+        self.lines.append('    ' * depth + line)
+
+    def path(self, path: str) -> str:
+        head, *rest = path.split('.')
+        if self.loops and head in ('item', 'n'):
+            expression = f"{head}_{self.loops[-1]}"
+        else:
+            expression = self.names.setdefault(head, f"v{len(self.names)}")
+        for part in rest:
+            expression = (f"({expression}.get({part!r}) if {expression}.__class__ is dict "
+                          f"else _lookup({expression}, {part!r}))")
+        return expression
+
+    def pieces(self, text: str) -> List[Tuple[bool, str]]:
+        """(is_literal, text or expression) pieces of a format string."""
+        pieces: List[Tuple[bool, str]] = []
+        for literal, field, spec, conversion in _FORMATTER.parse(text):
+            if literal:
+                pieces.append((True, literal))
+            if field is None:
+                continue
+            match = _FIELD_PATTERN.match(field)
+            if match is None:
+                raise ValueError(f"Invalid template field: {{{field}}}")
+            path, sign, offset, default = match.groups()
+            delta = (int(offset) if sign == '+' else -int(offset)) if offset else 0
+            expression = self.path(path)
+            default = default or ''
+            if self.loops and path == 'n' and not spec:
+                pieces.append((False, f"str({expression} + {delta})" if delta else f"str({expression})"))
+            elif not delta and not spec:
+                # Strings (the common case) are used as they are
+                pieces.append((False, f"(_v if (_v := {expression}).__class__ is str and _v else _field(_v, {default!r}))"))
+            else:
+                value = f"_v + {delta}" if delta else "_v"
+                pieces.append((False, f"(format({value}, {spec or ''!r}) if (_v := {expression}) is not None and _v != '' "
+                                      f"else {default!r})"))
+        return pieces
+
+    def append(self, depth: int, texts: List[str]):
+        """Emit one append of several texts joined by the section separator."""
+        pieces: List[Tuple[bool, str]] = []
+        for index, text in enumerate(texts):
+            if index:
+                pieces.append((True, self.separator))
+            pieces.extend(self.pieces(text))
+        merged: List[Tuple[bool, str]] = []
+        for is_literal, value in pieces:
+            if is_literal and merged and merged[-1][0]:
+                merged[-1] = (True, merged[-1][1] + value)
+            else:
+                merged.append((is_literal, value))
+        codes = [repr(value) if is_literal else value for is_literal, value in merged] or ["''"]
+        if len(codes) <= 3:
+            self.emit(depth, f"append({' + '.join(codes)})")
+        else:
+            self.emit(depth, f"append(''.join(({', '.join(codes)},)))")
+
+    def blocks(self, blocks: List[Any], depth: int):
+        blocks = [{'text': block} if isinstance(block, str) else block for block in blocks]
+        index = 0
+        while index < len(blocks):
+            block = blocks[index]
+            if set(block) <= {'text', 'if'}:
+                # Runs of plain blocks under the same condition become one append
+                run = [block['text']] if 'text' in block else []
+                while (index + 1 < len(blocks) and set(blocks[index + 1]) <= {'text', 'if'}
+                       and blocks[index + 1].get('if') == block.get('if')):
+                    index += 1
+                    run.extend([blocks[index]['text']] if 'text' in blocks[index] else [])
+                if 'if' in block:
+                    self.emit(depth, f"if {self.path(block['if'])}:")
+                if run:
+                    self.append(depth + ('if' in block), run)
+                elif 'if' in block:
+                    self.emit(depth + 1, "pass")
+                index += 1
+                continue
+
+            body = depth
+            if 'if' in block:
+                self.emit(depth, f"if {self.path(block['if'])}:")
+                body += 1
+            if 'each' in block:
+                suffix = str(len(self.lines))
+                limit = f"[:{int(block['limit'])}]" if block.get('limit') is not None else ''
+                self.emit(body, f"for n_{suffix}, item_{suffix} in enumerate(({self.path(block['each'])} or []){limit}, 1):")
+                self.loops.append(suffix)
+                body += 1
+            if 'text' in block:
+                self.append(body, [block['text']])
+            if 'blocks' in block:
+                self.blocks(block['blocks'], body)
+            if 'text' not in block and 'blocks' not in block:
+                self.emit(body, "pass")
+            if 'each' in block:
+                self.loops.pop()
+            if 'else' in block and 'if' in block:
+                self.emit(depth, "else:")
+                if isinstance(block['else'], str):
+                    self.append(depth + 1, [block['else']])
+                else:
+                    self.blocks(block['else'], depth + 1)
+            index += 1
+
+def compile_blocks(spec: Union[List[Any], Dict[str, Any]]) -> Renderer:
+    """
+    Compile a list of blocks (or {'separator', 'blocks'}) into render(context).
+
+    Args:
+        spec: Blocks as used by section templates; 'else' takes a text or a
+            list of blocks
+
+    Returns:
+        Function rendering the blocks with a context dict
+    """
+    if isinstance(spec, list):
+        spec = {'blocks': spec}
+    separator = spec.get('separator', '\n\n')
+    compiler = _SectionCompiler(separator)
+    compiler.blocks(spec.get('blocks', []), 1)
+    header = ["def render(context):", "    parts = []", "    append = parts.append"]
+    header += [f"    {local} = context.get({name!r})" for name, local in compiler.names.items()]
+    footer = [f"    return {separator!r}.join(parts)"]
+
+    namespace = {'_lookup': _lookup, '_field': _field}
+    exec(compile('\n'.join(header + compiler.lines + footer), '<compiled blocks>', 'exec'), namespace)
+    return namespace['render']
+
+class SectionTemplates:
+    """A compiled template set: paper structure plus a renderer per section."""
+
+    def __init__(self, template_set: Dict[str, Any], name: str = 'default'):
+        self.name = name
+        self.structure: List[str] = [str(section) for section in template_set.get('sections') or DEFAULT_STRUCTURE]
+        self.exclude: Dict[str, List[str]] = template_set.get('exclude', DEFAULT_TEMPLATE_SET['exclude'])
+        templates = {**DEFAULT_TEMPLATE_SET['templates'], **template_set.get('templates', {})}
+        self.renderers: Dict[str, Renderer] = {name: compile_blocks(spec) for name, spec in templates.items()}
+
+    def has(self, section_name: str) -> bool:
+        return section_name in self.renderers
+
+    def structure_for(self, length: str) -> List[str]:
+        """Sections of a paper of the given length, in order."""
+        excluded = set(self.exclude.get(length, []))
+        return [section for section in self.structure if section not in excluded]
+
+    def render(self, section_name: str, context: Dict[str, Any]) -> str:
+        """Fallback text of a section (empty if the set has no template for it)."""
+        renderer = self.renderers.get(section_name)
+        return renderer(context) if renderer is not None else ''
+
+def build_context(topic: str, summaries: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Render context of a draft: the topic and the summary values templates use.
+
+    Args:
+        topic: Research topic
+        summaries: Paper summaries
+
+    Returns:
+        Context dict (topic, key_findings, gaps, methodology_groups, counts, ...)
+    """
+    key_findings = [
+        {**finding, 'finding': finding.get('finding', ''), 'confidence': finding.get('confidence', 0.8)}
+        for finding in summaries.get('key_findings', []) if isinstance(finding, dict)
+    ]
+    gaps = summaries.get('gaps_and_opportunities', [])
+    individual_summaries = summaries.get('individual_summaries', [])
+    methodology_summary = summaries.get('methodology_summary', {}) or {}
+    total_papers = sum(len(papers) for papers in methodology_summary.values() if papers)
+    methodology_groups = [
+        {
+            'name': method_type,
+            'title': method_type.title(),
+            'papers': papers,
+            'count': len(papers),
+            'percentage': len(papers) / max(total_papers, 1) * 100
+        }
+        for method_type, papers in methodology_summary.items() if papers
+    ]
+    return {
+        'topic': topic,
+        'key_findings': key_findings,
+        'finding_count': len(key_findings),
+        'findings_summary': "; ".join(finding['finding'] for finding in key_findings[:4]),
+        'gaps': gaps,
+        'gap_count': len(gaps),
+        'individual_summaries': individual_summaries,
+        'paper_count': len(individual_summaries),
+        'thematic_summary': summaries.get('thematic_summary', ''),
+        'methodology_summary': methodology_summary,
+        'methodology_groups': methodology_groups,
+        'methodology_names': ', '.join(list(methodology_summary.keys())[:3])
+    }
+
+@lru_cache(maxsize=64)
+def _compile(serialized: str, name: str) -> SectionTemplates:
+    return SectionTemplates(json.loads(serialized), name)
+
+def compile_template_set(template_set: Dict[str, Any], name: str = 'custom') -> SectionTemplates:
+    """Compiled form of a template set; identical sets are compiled only once."""
+    return _compile(json.dumps(template_set, sort_keys=True), name)
+
+_default: Optional[SectionTemplates] = None
+_loaded: Dict[str, Any] = {}
+_logger = logging.getLogger(__name__)
+
+def default_section_templates() -> SectionTemplates:
+    """The compiled default template set."""
+    global _default
+    if _default is None:
+        _default = SectionTemplates(DEFAULT_TEMPLATE_SET, 'default')
+    return _default
+
+def get_section_templates(template_ref: Optional[Union[int, str, Dict[str, Any]]] = None) -> SectionTemplates:
+    """
+    Template set for a request.
+
+    Args:
+        template_ref: ResearchTemplate ID or name, an inline template set, or
+            None for the default set
+
+    Returns:
+        Compiled template set (the default set if the reference cannot be loaded)
+    """
+    if not template_ref:
+        return default_section_templates()
+    if isinstance(template_ref, dict):
+        try:
+            return compile_template_set(template_ref)
+        except Exception as e:
+            _logger.warning(f"Error compiling inline template set, using default: {str(e)}")
+            return default_section_templates()
+
+    # Stored templates are re-read at most every SECTION_TEMPLATE_TTL seconds
+    key = str(template_ref)
+    cached = _loaded.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    templates = default_section_templates()
+    try:
+        from database.db import SessionLocal
+        from database.models import ResearchTemplate
+
+        session = SessionLocal()
+        try:
+            query = session.query(ResearchTemplate)
+            row = (query.filter(ResearchTemplate.id == int(key)) if key.isdigit()
+                   else query.filter(ResearchTemplate.name == key)).first()
+        finally:
+            session.close()
+        if row is None:
+            _logger.warning(f"Research template {key!r} not found, using default")
+        else:
+            templates = compile_template_set(row.structure or {}, row.name)
+    except Exception as e:
+        _logger.warning(f"Error loading research template {key!r}, using default: {str(e)}")
+
+    _loaded[key] = (time.monotonic() + float(os.getenv('SECTION_TEMPLATE_TTL', '60')), templates)
+    return templates
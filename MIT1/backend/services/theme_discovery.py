@@ -0,0 +1,271 @@
+"""
+Theme discovery over paper abstracts.
+
+Abstracts are turned into sparse TF-IDF vectors (CSR arrays built directly with
+NumPy) and clustered with mini-batch spherical k-means. The model can be fed
+incrementally with ``partial_fit``, so thousands of papers are processed in
+fixed-size batches with cost linear in the number of non-zero terms. Theme
+labels come from the highest-weighted terms of each centroid.
+"""
+
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; callers fall back to generic themes
+    np = None
+
+STOPWORDS = frozenset("""
+a about above across after again against all almost also although among an and another any are as at
+be because been before being between both but by can could did do does doing done during each either
+et etc even ever every few for from further had has have having here how however if in into is it its
+itself just least less like made make many may might more most much must near neither no nor not now of
+off often on once one only onto or other others otherwise our out over own paper papers per perhaps
+present presented proposed rather same several shall should show shown shows since so some such than
+that the their them then there therefore these they this those though through thus to too toward
+towards under until up upon use used uses using very via was we well were what when where whether which
+while who whose why will with within without would yet study studies result results research approach
+based new two three first second high low however
+""".split())
+
+class ThemeDiscovery:
+    """Incremental TF-IDF + mini-batch spherical k-means topic clustering."""
+
+    def __init__(self, n_themes: Optional[int] = None, max_themes: int = 8, min_themes: int = 2,
+                 batch_size: int = 256, n_epochs: int = 3, max_features: int = 1 << 16,
+                 top_terms: int = 3, max_df: float = 0.6, random_state: int = 0):
+        self.logger = logging.getLogger(__name__)
+        self.n_themes = n_themes
+        self.max_themes = max_themes
+        self.min_themes = min_themes
+        self.batch_size = batch_size
+        self.n_epochs = n_epochs
+        self.max_features = max_features
+        self.top_terms = top_terms
+        self.max_df = max_df
+        self.random_state = random_state
+        self.reset()
+
+    @property
+    def available(self) -> bool:
+        """Whether NumPy is installed and theme discovery can run."""
+        return np is not None
+
+    def reset(self):
+        """Forget the vocabulary, document frequencies and centroids."""
+        self.vocabulary: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.doc_freq = np.zeros(self.max_features, dtype=np.float64) if np is not None else None
+        self.n_docs = 0
+        self.centroids = None
+        self.cluster_counts = None
+        self._rng = np.random.default_rng(self.random_state) if np is not None else None
+
+    def discover(self, token_lists: List[List[str]]) -> List[Dict[str, Any]]:
+        """
+        Cluster a corpus and describe each cluster.
+
+        Args:
+            token_lists: Normalized tokens of each document (title + abstract)
+
+        Returns:
+            Themes ordered by size, each with 'name', 'description', 'keywords',
+            'paper_count' and 'paper_indices'
+        """
+        if np is None:
+            raise RuntimeError("Theme discovery requires NumPy")
+
+        self.reset()
+        self.update_vocabulary(token_lists)
+        matrix = self.transform(token_lists)
+
+        k = self.n_themes or int(round(np.sqrt(len(token_lists) / 2.0)))
+        k = max(self.min_themes, min(self.max_themes, k, len(token_lists)))
+        self._init_centroids(matrix, k)
+
+        order = np.arange(len(token_lists))
+        for _ in range(self.n_epochs):
+            self._rng.shuffle(order)
+            for start in range(0, len(order), self.batch_size):
+                self._update(self._rows(matrix, order[start:start + self.batch_size]))
+
+        return self.describe(matrix)
+
+    def partial_fit(self, token_lists: List[List[str]], k: Optional[int] = None):
+        """
+        Update the model with one more batch of documents.
+
+        The vocabulary and document frequencies grow with every batch;
+        centroids are initialized from the first batch.
+        """
+        if np is None:
+            raise RuntimeError("Theme discovery requires NumPy")
+
+        self.update_vocabulary(token_lists)
+        matrix = self.transform(token_lists)
+        if self.centroids is None:
+            k = k or self.n_themes or self.max_themes
+            self._init_centroids(matrix, max(1, min(k, len(token_lists))))
+        self._update(matrix)
+        return self
+
+    def update_vocabulary(self, token_lists: List[List[str]]):
+        """Add new terms and count document frequencies."""
+        vocabulary = self.vocabulary
+        for tokens in token_lists:
+            seen = set()
+            for token in tokens:
+                if token in STOPWORDS or len(token) < 3 or token.isdigit():
+                    continue
+                index = vocabulary.get(token)
+                if index is None:
+                    if len(self.terms) >= self.max_features:
+                        continue
+                    index = vocabulary[token] = len(self.terms)
+                    self.terms.append(token)
+                seen.add(index)
+            if seen:
+                self.doc_freq[list(seen)] += 1
+        self.n_docs += len(token_lists)
+
+    def transform(self, token_lists: List[List[str]]) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """Build L2-normalized log-TF-IDF vectors as CSR (indptr, indices, data) arrays."""
+        vocabulary = self.vocabulary
+        indptr = [0]
+        indices: List[int] = []
+        counts: List[int] = []
+
+        for tokens in token_lists:
+            row: Dict[int, int] = {}
+            for token in tokens:
+                index = vocabulary.get(token)
+                if index is not None:
+                    row[index] = row.get(index, 0) + 1
+            indices.extend(row.keys())
+            counts.extend(row.values())
+            indptr.append(len(indices))
+
+        indptr_arr = np.asarray(indptr, dtype=np.int64)
+        indices_arr = np.asarray(indices, dtype=np.int64)
+        idf = np.log((1.0 + self.n_docs) / (1.0 + self.doc_freq[indices_arr])) + 1.0
+        data = (np.log1p(np.asarray(counts, dtype=np.float64)) * idf).astype(np.float32)
+
+        # Row-wise L2 normalization
+        lengths = np.diff(indptr_arr)
+        row_ids = np.repeat(np.arange(len(token_lists)), lengths)
+        norms = np.sqrt(np.bincount(row_ids, weights=data.astype(np.float64) ** 2, minlength=len(token_lists)))
+        norms[norms == 0] = 1.0
+        data /= norms[row_ids].astype(np.float32)
+
+        return indptr_arr, indices_arr, data
+
+    def describe(self, matrix: Tuple["np.ndarray", "np.ndarray", "np.ndarray"]) -> List[Dict[str, Any]]:
+        """Assign documents to the learned centroids and label each theme."""
+        labels, _ = self._assign(matrix)
+        n_docs = max(self.n_docs, 1)
+        df = self.doc_freq[:len(self.terms)]
+        # Terms shared by most of the corpus (usually the query itself) make poor labels
+        label_mask = (df / n_docs <= self.max_df) & (df >= min(2, n_docs))
+        if not label_mask.any():
+            label_mask = df > 0
+
+        themes = []
+        for cluster in range(self.centroids.shape[0]):
+            members = np.flatnonzero(labels == cluster)
+            if members.size == 0:
+                continue
+
+            weights = np.where(label_mask, self.centroids[cluster, :len(self.terms)], -np.inf)
+            top = min(self.top_terms + 2, weights.size)
+            candidates = np.argpartition(-weights, top - 1)[:top]
+            candidates = candidates[np.argsort(-weights[candidates], kind='stable')]
+            keywords = [self.terms[i] for i in candidates if np.isfinite(weights[i]) and weights[i] > 0]
+
+            name = ', '.join(term.replace('-', ' ').title() for term in keywords[:self.top_terms]) or 'General Research'
+            description = (f"{members.size} paper{'s' if members.size != 1 else ''} focusing on "
+                           f"{', '.join(keywords) or 'related topics'}")
+            themes.append({
+                'name': name,
+                'description': description,
+                'keywords': keywords,
+                'paper_count': int(members.size),
+                'paper_indices': members.tolist()
+            })
+
+        themes.sort(key=lambda theme: theme['paper_count'], reverse=True)
+        return themes
+
+    def _rows(self, matrix, rows: "np.ndarray"):
+        """Select rows of a CSR matrix."""
+        indptr, indices, data = matrix
+        starts, ends = indptr[rows], indptr[rows + 1]
+        lengths = ends - starts
+        new_indptr = np.concatenate(([0], np.cumsum(lengths)))
+        positions = np.repeat(starts - new_indptr[:-1], lengths) + np.arange(new_indptr[-1])
+        return new_indptr, indices[positions], data[positions]
+
+    def _similarities(self, matrix) -> "np.ndarray":
+        """Sparse (n, V) times dense centroids (k, V)^T without building the dense matrix."""
+        indptr, indices, data = matrix
+        n_rows = len(indptr) - 1
+        result = np.zeros((n_rows, self.centroids.shape[0]), dtype=np.float32)
+        if data.size == 0:
+            return result
+
+        products = self.centroids[:, indices].T * data[:, None]
+        non_empty = np.flatnonzero(np.diff(indptr) > 0)
+        result[non_empty] = np.add.reduceat(products, indptr[non_empty], axis=0)
+        return result
+
+    def _assign(self, matrix) -> Tuple["np.ndarray", "np.ndarray"]:
+        similarities = self._similarities(matrix)
+        labels = similarities.argmax(axis=1)
+        return labels, similarities[np.arange(len(labels)), labels]
+
+    def _init_centroids(self, matrix, k: int):
+        """k-means++-style seeding on cosine distance."""
+        indptr, indices, data = matrix
+        n_rows = len(indptr) - 1
+        self.centroids = np.zeros((k, self.max_features), dtype=np.float32)
+        self.cluster_counts = np.zeros(k, dtype=np.float64)
+        if n_rows == 0:
+            return
+
+        chosen = [int(self._rng.integers(n_rows))]
+        self._set_centroid(0, matrix, chosen[0])
+        for cluster in range(1, k):
+            similarities = self._similarities(matrix)[:, :cluster]
+            distance = np.clip(1.0 - similarities.max(axis=1), 0.0, None) ** 2
+            distance[chosen] = 0.0
+            total = distance.sum()
+            row = int(self._rng.choice(n_rows, p=distance / total)) if total > 0 else int(self._rng.integers(n_rows))
+            chosen.append(row)
+            self._set_centroid(cluster, matrix, row)
+
+    def _set_centroid(self, cluster: int, matrix, row: int):
+        indptr, indices, data = matrix
+        self.centroids[cluster, indices[indptr[row]:indptr[row + 1]]] = data[indptr[row]:indptr[row + 1]]
+
+    def _update(self, batch):
+        """One mini-batch k-means step with per-cluster learning rates."""
+        indptr, indices, data = batch
+        if len(indptr) <= 1:
+            return
+
+        labels, _ = self._assign(batch)
+        batch_counts = np.bincount(labels, minlength=self.centroids.shape[0]).astype(np.float64)
+
+        sums = np.zeros_like(self.centroids)
+        np.add.at(sums, (np.repeat(labels, np.diff(indptr)), indices), data)
+
+        active = np.flatnonzero(batch_counts)
+        self.cluster_counts[active] += batch_counts[active]
+        rates = (batch_counts[active] / self.cluster_counts[active]).astype(np.float32)[:, None]
+        means = sums[active] / batch_counts[active].astype(np.float32)[:, None]
+        self.centroids[active] = (1.0 - rates) * self.centroids[active] + rates * means
+
+        # Spherical k-means: keep centroids on the unit sphere
+        norms = np.linalg.norm(self.centroids[active], axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.centroids[active] /= norms
@@ -40,36 +40,10 @@ app.add_middleware(
 
 # Helper functions
 async def _create_formatted_references(papers: List[Dict[str, Any]], citations: Dict[str, Any], citation_style: str) -> List[Dict[str, Any]]:
-    """Create formatted references with proper links."""
-    from agents.citation_agent import CitationAgent
+    """The pipeline's numbered reference list (formatted, with links and BibTeX keys)."""
+    from services.reference_list import ReferenceList
     
-    citation_agent = CitationAgent()
-    formatted_refs = []
-    
-    for i, paper in enumerate(papers[:15], 1):  # Limit to 15 references
-        try:
-            # Format the citation using the citation agent
-            formatted_citation = citation_agent._format_citation(paper, citation_style)
-            
-            ref_entry = {
-                "id": f"ref{i}",
-                "number": i,
-                "title": paper.get('title', 'Unknown Title'),
-                "authors": paper.get('authors', ['Unknown Author']),
-                "journal": paper.get('journal', 'Unknown Journal'),
-                "year": str(paper.get('year', 'Unknown')),
-                "doi": paper.get('doi', ''),
-                "url": paper.get('url', ''),
-                "formatted_citation": formatted_citation,
-                "relevance_score": paper.get('relevance_score', 0.0),
-                "citations_count": paper.get('citations_count', 0)
-            }
-            formatted_refs.append(ref_entry)
-        except Exception as e:
-            logger.warning(f"Error formatting reference {i}: {str(e)}")
-            continue
-    
-    return formatted_refs
+    return ReferenceList.from_citations(citations, papers, citation_style).entries
 
 # Pydantic models for API
 class ResearchRequest(BaseModel):
@@ -177,12 +151,14 @@ async def generate_research_paper(request: ResearchRequest):
         from agents.summarizer_agent import SummarizerAgent
         from agents.citation_agent import CitationAgent
         from agents.analytics_agent import AnalyticsAgent
+        from services.paper_text import PaperTextCache
         
-        # Initialize agents
-        retrieval_agent = RetrievalAgent()
-        summarizer_agent = SummarizerAgent()
-        citation_agent = CitationAgent()
-        analytics_agent = AnalyticsAgent()
+        # Initialize agents with a shared tokenized-text cache
+        text_cache = PaperTextCache()
+        retrieval_agent = RetrievalAgent(text_cache=text_cache)
+        summarizer_agent = SummarizerAgent(text_cache=text_cache)
+        citation_agent = CitationAgent(text_cache=text_cache)
+        analytics_agent = AnalyticsAgent(text_cache=text_cache)
         
         # Step 1: Retrieve real papers using your API keys
         logger.info("Fetching real papers from academic APIs...")
@@ -193,7 +169,9 @@ async def generate_research_paper(request: ResearchRequest):
         summaries = await summarizer_agent.summarize_papers(papers)
         
         # Step 3: Generate citations
-        citations = await citation_agent.generate_citations(papers, summaries)
+        citations = await citation_agent.generate_citations(
+            papers, summaries, request.requirements.get('citation_style', 'apa')
+        )
         
         # Step 4: Generate paper draft using real data
         now = datetime.now().isoformat()
@@ -263,22 +241,8 @@ async def generate_research_paper(request: ResearchRequest):
         analytics = await analytics_agent.analyze_paper(paper_draft, papers)
         
         # Step 6: Create references from real papers
-        real_references = []
-        for i, paper in enumerate(papers[:10], 1):  # Limit to 10 references
-            real_references.append({
-                "id": f"ref{i}",
-                "title": paper.get('title', 'Unknown Title'),
-                "authors": paper.get('authors', ['Unknown Author']),
-                "journal": paper.get('journal', 'Unknown Journal'),
-                "year": str(paper.get('year', 'Unknown')),
-                "doi": paper.get('doi', ''),
-                "url": paper.get('url', ''),
-                "pages": paper.get('pages', ''),
-                "volume": paper.get('volume', ''),
-                "issue": paper.get('issue', ''),
-                "relevance_score": paper.get('relevance_score', 0.0),
-                "citations_count": paper.get('citations_count', 0)
-            })
+        real_references = await _create_formatted_references(
+            papers, citations, request.requirements.get('citation_style', 'apa'))
         
         # Fallback analytics if real analytics fail
         if not analytics or 'error' in analytics:
@@ -451,7 +415,7 @@ async def research_pipeline(request: PipelineRequest):
         
         # Step 4: Generate citations
         logger.info("🔗 Step 3: Generating citations...")
-        citations = await citation_agent.generate_citations(papers, summaries)
+        citations = await citation_agent.generate_citations(papers, summaries, request.citation_style)
         
         if 'error' in citations:
             logger.warning(f"⚠️ Citation generation had issues: {citations['error']}")
@@ -492,11 +456,10 @@ async def research_pipeline(request: PipelineRequest):
         logger.info("🔗 Step 4.5: Replacing citation placeholders...")
         try:
             # Replace citations in each section of the paper
-            for section in ['abstract', 'introduction', 'methodology', 'results', 'discussion', 'conclusion']:
-                if section in draft_paper:
-                    draft_paper[section] = await citation_agent.replace_citation_placeholders(
-                        draft_paper[section], papers, request.citation_style
-                    )
+            await citation_agent.replace_citations_in_draft(
+                draft_paper, papers, request.citation_style,
+                sections=['abstract', 'introduction', 'methodology', 'results', 'discussion', 'conclusion']
+            )
             logger.info("✅ Citation placeholders replaced")
         except Exception as e:
             logger.warning(f"⚠️ Citation replacement had issues: {str(e)}")
@@ -50,6 +50,7 @@ interface PaperDraftProps {
   onSave?: () => void;
   onReorder?: (sectionId: string, direction: 'up' | 'down') => void;
   editable?: boolean;
+  streaming?: boolean; // Sections are still being written and arrive incrementally
 }
 
 const PaperDraft: React.FC<PaperDraftProps> = ({ 
@@ -58,7 +59,8 @@ const PaperDraft: React.FC<PaperDraftProps> = ({
   onEdit, 
   onSave, 
   onReorder, 
-  editable = false 
+  editable = false,
+  streaming = false
 }) => {
   const [editingSection, setEditingSection] = useState<string | null>(null);
   const [editContent, setEditContent] = useState('');
@@ -373,6 +375,12 @@ const PaperDraft: React.FC<PaperDraftProps> = ({
                     <span className="font-medium">{paper.metadata.word_count.toLocaleString()} words</span>
                   </div>
                 )}
+                {streaming && (
+                  <div className="flex items-center space-x-2">
+                    <PenTool className="h-4 w-4 animate-pulse" />
+                    <span className="font-medium">Writing…</span>
+                  </div>
+                )}
               </div>
             </motion.div>
             
@@ -17,6 +17,16 @@ interface SearchFilters {
   paperType: string;
 }
 
+// Minimum interval between re-renders of a streaming draft
+const DRAFT_UPDATE_MS = 100;
+
+// Failure reported by the backend itself: shown to the user, never retried or mocked
+const pipelineError = (message: string): Error => {
+  const err = new Error(message);
+  err.name = 'PipelineError';
+  return err;
+};
+
 interface ResearchData {
   topic: string;
   papers: any[];
@@ -37,6 +47,100 @@ const Home: React.FC = () => {
   const [activeTab, setActiveTab] = useState<'papers' | 'summaries' | 'draft' | 'references' | 'analytics'>('papers');
   // const [selectedReference, setSelectedReference] = useState<any>(null);
 
+  // Runs the pipeline over SSE, showing draft sections as their text arrives.
+  // Resolves with the final pipeline payload, or null if the streaming endpoint is not available.
+  // Errors reported by the server (or a stream cut short) are thrown, not retried.
+  const runStreamingPipeline = async (apiBaseUrl: string, requestBody: any, signal: AbortSignal): Promise<any | null> => {
+    const query = requestBody.query;
+    const response = await fetch(`${apiBaseUrl}/research-pipeline/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(requestBody),
+      signal
+    });
+    if (!response.ok || !response.body) {
+      return null;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const sections: Record<string, any> = {};
+    let buffer = '';
+    let finalPayload: any = null;
+
+    const publishDraft = () => {
+      setResearchData({
+        topic: query,
+        papers: [],
+        summaries: {},
+        citations: {},
+        draft_paper: {
+          title: query,
+          abstract: sections.abstract?.content || '',
+          sections: { ...sections },
+          metadata: { topic: query, word_count: 0, generation_date: new Date().toISOString() }
+        },
+        references: [],
+        analytics: null,
+        status: 'in_progress'
+      });
+      setActiveTab('draft');
+    };
+
+    // Deltas arrive many times per second; re-render the draft at most every DRAFT_UPDATE_MS
+    let publishTimer: ReturnType<typeof setTimeout> | null = null;
+    const schedulePublish = () => {
+      if (publishTimer === null) {
+        publishTimer = setTimeout(() => {
+          publishTimer = null;
+          publishDraft();
+        }, DRAFT_UPDATE_MS);
+      }
+    };
+
+    try {
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const message = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          const event = message.match(/^event: (.*)$/m)?.[1];
+          const rawData = message.match(/^data: (.*)$/m)?.[1];
+          if (!event || !rawData) continue;
+
+          const payload = JSON.parse(rawData);
+          if (event === 'delta') {
+            const current = sections[payload.section] || {
+              title: payload.section.replace(/_/g, ' ').replace(/\b\w/g, (c: string) => c.toUpperCase()),
+              content: ''
+            };
+            sections[payload.section] = { ...current, content: current.content + payload.delta };
+            schedulePublish();
+          } else if (event === 'section') {
+            sections[payload.name] = { title: payload.title, content: payload.content, word_count: payload.word_count };
+            schedulePublish();
+          } else if (event === 'complete') {
+            finalPayload = payload;
+          } else if (event === 'error') {
+            throw pipelineError(payload.detail || 'Pipeline execution failed');
+          }
+        }
+      }
+    } finally {
+      // The final payload (or the error) replaces the in-progress draft
+      if (publishTimer !== null) clearTimeout(publishTimer);
+    }
+
+    if (!finalPayload) {
+      throw pipelineError('The research pipeline stream ended before the paper was completed');
+    }
+    return finalPayload;
+  };
+
   const handleSearch = async (query: string, filters: SearchFilters) => {
     if (loading) {
       console.log('Search already in progress, ignoring duplicate request');
@@ -59,39 +163,41 @@ const Home: React.FC = () => {
         console.log('Request timeout after 60 seconds');
         controller.abort();
       }, 60000); // 60 second timeout (backend takes ~4 seconds)
-      console.log('Making API call to:', `${apiBaseUrl}/research-pipeline`);
-      console.log('Request payload:', {
+      const requestBody = {
         query: query,
         max_papers: filters.maxPapers,
         sources: filters.sources,
         paper_length: filters.paperType === 'short' ? 'short' : filters.paperType === 'long' ? 'long' : 'medium',
         citation_style: 'apa'
-      });
-      
-      const response = await fetch(`${apiBaseUrl}/research-pipeline`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          query: query,
-          max_papers: filters.maxPapers,
-          sources: filters.sources,
-          paper_length: filters.paperType === 'short' ? 'short' : filters.paperType === 'long' ? 'long' : 'medium',
-          citation_style: 'apa'
-        }),
-        signal: controller.signal
-      });
+      };
+      // Prefer the streaming endpoint so the draft renders while it is written;
+      // the JSON endpoint is used only when the server has no streaming endpoint
+      let data: any = await runStreamingPipeline(apiBaseUrl, requestBody, controller.signal);
       
-      clearTimeout(timeoutId);
-      console.log('Response status:', response.status);
-      console.log('Response headers:', response.headers);
+      if (!data) {
+        console.log('Making API call to:', `${apiBaseUrl}/research-pipeline`);
+        console.log('Request payload:', requestBody);
+        
+        const response = await fetch(`${apiBaseUrl}/research-pipeline`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify(requestBody),
+          signal: controller.signal
+        });
+        
+        console.log('Response status:', response.status);
+        console.log('Response headers:', response.headers);
 
-      if (!response.ok) {
-        throw new Error('Failed to generate research paper');
-      }
+        if (!response.ok) {
+          throw new Error('Failed to generate research paper');
+        }
 
-      const data = await response.json();
+        data = await response.json();
+      }
+      
+      clearTimeout(timeoutId);
       console.log('Backend response:', data); // Debug logging
       
       if (data.status === 'error') {
@@ -123,6 +229,11 @@ const Home: React.FC = () => {
         stack: err.stack
       });
       
+      if (err.name === 'PipelineError') {
+        setError(err.message);
+        return;
+      }
+      
       if (err.name === 'AbortError') {
         console.log('Request was aborted - checking if it was timeout or other reason');
         setError('Request was interrupted. The backend might be processing your request. Please try again.');
@@ -640,7 +751,8 @@ const Home: React.FC = () => {
         <PaperDraft 
           paper={researchData.draft_paper}
           references={researchData.references}
-          editable={true}
+          editable={researchData.status !== 'in_progress'}
+          streaming={researchData.status === 'in_progress'}
         />
       </div>
     );